@@ -1,28 +1,91 @@
+import asyncio
+import hmac
 import json
+import logging
+import os
 import random
-from fastapi import FastAPI, HTTPException
-from typing import Dict, Any
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from typing import Dict, Any, List, Optional
 from fastapi.middleware.cors import CORSMiddleware
 
 from models.question_models import (
     ProblemRequest,
     TestRequest,
+    TestStreamRequest,
     GradeRequest,
     GradeResponse,
+    BulkGradeRequest,
+    BulkGradeResponse,
     QuestionDefinition,
     ComputedResult,
-    GeneratedProblemLatex
+    GeneratedProblemLatex,
+    BatchProblemRequest,
+    BatchProblemResponse,
+    BatchComputedResult,
+    TruelConfig,
+    TruelExactResponse,
+    TruelSimulationRequest,
+    TruelSimulationResponse,
+    TruelSweepRequest,
+    TruelSweepResponse,
 )
 
 from solvers import SOLVER_REGISTRY  # (si no lo usas aún, lo puedes quitar)
-from utils.clean_params import clean_params_for_question
-from utils.render import render_template, render_math_result
+from utils.catalog import cached_json_response
+from utils.clean_params import CleaningPlan, clean_params_for_question, cleaning_report, compile_cleaning_plan
+from utils.render import QuestionTemplates, compile_question_templates, format_numeric, optimization_report
+from utils.vectorized import (
+    rows_to_columns,
+    columns_to_rows,
+    eval_symbolic_batch,
+    format_numeric_batch,
+)
+from utils.problem_pool import ProblemPool
+from utils.executor import EvaluationExecutor, EvaluationTimeout, EvaluationUnavailable, render_results
+from utils.expr_compiler import EvaluationBudgetExceeded
+from utils.result_cache import ResultCache
+from utils.grading import (
+    BulkGrader,
+    add_stream,
+    aiter_lines,
+    question_tolerance,
+    question_tolerances,
+    rows_from_submissions,
+)
+from utils.metrics import METRICS, MetricsMiddleware
+from utils.param_sampler import ParamSampler
+from utils.test_store import TestStore, default_test_store_path
+from truel import TruelParams, TruelSimulator, solve_exact
+from truel.sweep import ALL_PROFILES, SweepCache, SweepSpec, axis_values, default_cache_dir, run_sweep
+from utils.question_bank import QuestionBank, ReloadReport, default_questions_path, solver_is_numeric
+
+logger = logging.getLogger(__name__)
 
 
 # ======================================
 # FASTAPI INIT
 # ======================================
-app = FastAPI(title="API Probabilidad LaTeX", version="2.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    BANK.on_reload = _on_bank_reload
+    BANK.start_watching(float(os.getenv("QUESTIONS_WATCH_INTERVAL_SECONDS", "2")))
+    PROBLEM_POOL.sync_questions(BANK.questions.keys())
+    PROBLEM_POOL.start()
+    TEST_STORE.start()
+    yield
+    await BANK.stop_watching()
+    await PROBLEM_POOL.stop()
+    await TEST_STORE.stop()
+    TEST_STORE.close()
+    EVALUATOR.shutdown()
+    TRUEL_SIMULATOR.shutdown()
+
+
+app = FastAPI(title="API Probabilidad LaTeX", version="2.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,48 +95,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia y conteo de requests/errores por endpoint (ver /metrics)
+app.add_middleware(MetricsMiddleware)
+
 
 # ======================================
-# CARGAR QUESTIONS JSON
+# CARGAR QUESTIONS JSON (recargable en caliente)
 # ======================================
-with open("questions.json", "r") as f:
-    raw = json.load(f)
+def _on_bank_reload(bank: QuestionBank, report: ReloadReport):
+    # Los problemas pregenerados y resultados cacheados de preguntas
+    # modificadas o eliminadas dejan de ser válidos
+    PROBLEM_POOL.sync_questions(bank.questions.keys())
+    for qid in report.touched:
+        PROBLEM_POOL.invalidate(qid)
+        RESULT_CACHE.invalidate_question(qid)
+
 
-QUESTIONS: Dict[str, QuestionDefinition] = {
-    q["id"]: QuestionDefinition.model_validate(q) for q in raw
-}
+# La validación y precompilación (expression_symbolic + templates) ocurren
+# al cargar: los errores se reportan al arrancar, no en la primera petición.
+BANK = QuestionBank(default_questions_path())
+BANK.reload(strict=True)
+
+# Qué reglas de limpieza de params aplican a qué preguntas
+for _rule, _ids in cleaning_report(BANK.snapshot.cleaners).items():
+    logger.info("limpieza de params %s: %s", _rule, ", ".join(_ids))
+
+# Qué expresiones reescribió el optimizador (ver utils/expr_optimizer.py)
+for _pass, _ids in optimization_report(BANK.questions).items():
+    logger.info("optimizador de expresiones %s: %s", _pass, ", ".join(_ids))
 
 
 # ======================================
 # GENERACIÓN DE PARÁMETROS
 # ======================================
-def generate_params_for_question(q: QuestionDefinition) -> Dict[str, Any]:
-    params: Dict[str, Any] = {}
+def sampler_for(q: QuestionDefinition) -> ParamSampler:
+    """Sampler compilado al cargar el banco (o uno al vuelo si q no es del snapshot)."""
+    sampler = BANK.snapshot.samplers.get(q.id)
+    if sampler is None or sampler.question is not q:
+        sampler = ParamSampler(q, buffer_size=1)
+    return sampler
 
-    for name, cfg in q.params.items():
 
-        def resolve(val):
-            if isinstance(val, str) and val in params:
-                return params[val]
-            return val
+def cleaner_for(q: QuestionDefinition) -> CleaningPlan:
+    """Plan de limpieza compilado al cargar el banco (o uno al vuelo)."""
+    plan = BANK.snapshot.cleaners.get(q.id)
+    if plan is None or BANK.snapshot.questions.get(q.id) is not q:
+        plan = compile_cleaning_plan(q)
+    return plan
 
-        min_v = resolve(cfg.min)
-        max_v = resolve(cfg.max)
 
-        if cfg.type == "int":
-            params[name] = random.randint(int(min_v), int(max_v))
-        else:
-            params[name] = random.uniform(float(min_v), float(max_v))
+def templates_for(q: QuestionDefinition) -> QuestionTemplates:
+    """Templates tokenizados al cargar el banco (o al vuelo si q no es del snapshot)."""
+    templates = BANK.snapshot.templates.get(q.id)
+    if templates is None or BANK.snapshot.questions.get(q.id) is not q:
+        templates, _ = compile_question_templates(q)
+    return templates
 
-    return params
 
-
-# ======================================
-# CRITERIO PARA USO EN TEST
-# ======================================
-def solver_is_numeric(q: QuestionDefinition) -> bool:
-    """Una pregunta sirve para test si tiene UN solo resultado matemático."""
-    return len(q.math.results) == 1
+def generate_params_for_question(q: QuestionDefinition) -> Dict[str, Any]:
+    return sampler_for(q).draw()
 
 
 # ======================================
@@ -85,117 +165,413 @@ def root():
     return {"message": "Backend Probabilidad LaTeX v2 funcionando!"}
 
 
+# Catálogo: bytes + ETag precalculados por carga del banco (ver utils/catalog.py)
+CATALOG_CACHE_CONTROL = f"public, max-age={int(os.getenv('CATALOG_MAX_AGE_SECONDS', '60'))}"
+
+
 @app.get("/questions")
-def list_questions():
-    return [
-        {"id": qid, "topic": q.topic, "doc_url": q.doc_url}
-        for qid, q in QUESTIONS.items()
-    ]
+def list_questions(if_none_match: Optional[str] = Header(None)):
+    return cached_json_response(BANK.snapshot.catalog.questions, if_none_match, CATALOG_CACHE_CONTROL)
 
 
 # ✅ NUEVO: Traer pregunta completa (para ranges/params en el frontend)
 @app.get("/questions/{qid}")
-def get_full_question(qid: str):
-    q = QUESTIONS.get(qid)
-    if not q:
+def get_full_question(qid: str, if_none_match: Optional[str] = Header(None)):
+    cached = BANK.snapshot.catalog.by_id.get(qid)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Question not found")
-    return q.model_dump()
+    return cached_json_response(cached, if_none_match, CATALOG_CACHE_CONTROL)
 
 
 # ======================================
 # GENERATE PROBLEM
 # ======================================
+def prepare_params(q: QuestionDefinition, params_override: Dict[str, Any] = None) -> Dict[str, Any]:
+    params = params_override
+    if not params:
+        t0 = time.perf_counter()
+        params = generate_params_for_question(q)
+        METRICS.observe_stage("generate_params_for_question", q.id, time.perf_counter() - t0)
+        # El sampler ya respeta límites, referencias, restricciones y type:
+        # solo los overrides del cliente pasan por la limpieza
+        return params
+
+    t0 = time.perf_counter()
+    params = clean_params_for_question(q, params, cleaner_for(q))
+    METRICS.observe_stage("clean_params_for_question", q.id, time.perf_counter() - t0)
+    return params
+
+
+def render_statement(q: QuestionDefinition, params: Dict[str, Any]) -> str:
+    t0 = time.perf_counter()
+    statement = templates_for(q).statement.render(params)
+    METRICS.observe_stage("render_template", q.id, time.perf_counter() - t0)
+    return statement
+
+
+def assemble_generated_problem(
+    q: QuestionDefinition, params: Dict[str, Any], rendered_results: List[Dict[str, Any]]
+) -> GeneratedProblemLatex:
+
+    # 2. enunciado
+    statement = render_statement(q, params)
+
+    # 3. Resultados matemáticos ya evaluados
+    results_output = [
+        ComputedResult(
+            result_id=rendered["id"],
+            label=rendered["label"],
+            general_formula_latex=rendered["general_formula_latex"],
+            instantiated_expression_latex=rendered["expression_latex"],
+            numeric_result=rendered["raw_numeric"],
+            numeric_result_formatted=rendered["numeric_value"],
+        )
+        for rendered in rendered_results
+    ]
+
+    return GeneratedProblemLatex(
+        id=q.id,
+        topic=q.topic,
+        statement=statement,
+        doc_url=q.doc_url,
+        doc_summary=q.doc_summary,
+        params=params,
+        results=results_output
+    )
+
+
+# Cache LRU de resultados evaluados: (id, version, params limpios) -> resultados
+RESULT_CACHE = ResultCache(
+    maxsize=int(os.getenv("RESULT_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600")),
+)
+
+
+# Presupuesto de costo por evaluación (unidades ~0.1 µs, ver utils/expr_compiler.py)
+EVAL_COST_BUDGET = float(os.getenv("EVAL_COST_BUDGET", "10000000"))
+
+
+def render_question_results(
+    q: QuestionDefinition, params: Dict[str, Any], cache: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    render_math_result de todos los resultados. Con cache=True pasa por
+    RESULT_CACHE: solo para params explícitos (params_override), que sí se
+    repiten; los muestreados al azar casi nunca vuelven y desplazarían a
+    los que sí.
+    """
+    key = RESULT_CACHE.make_key(q, params) if cache else None
+    rendered = RESULT_CACHE.get(key)
+    if rendered is None:
+        rendered = render_results(
+            [r.model_dump() for r in q.math.results], params, q, EVAL_COST_BUDGET, templates_for(q)
+        )
+        RESULT_CACHE.put(key, rendered)
+    return rendered
+
+
+def build_generated_problem(q: QuestionDefinition, params_override: Dict[str, Any] = None) -> GeneratedProblemLatex:
+    # 1. parámetros
+    params = prepare_params(q, params_override)
+    rendered = render_question_results(q, params, cache=params_override is not None)
+    return assemble_generated_problem(q, params, rendered)
+
+
+# Pool de problemas pregenerados (solo para peticiones sin params_override)
+PROBLEM_POOL = ProblemPool(
+    build=lambda qid: build_generated_problem(BANK.questions[qid]),
+    low_watermark=int(os.getenv("POOL_LOW_WATERMARK", "16")),
+    high_watermark=int(os.getenv("POOL_HIGH_WATERMARK", "64")),
+)
+
+
+# Evaluación: preguntas baratas en proceso, pesadas en un proceso propio cada una
+EVALUATOR = EvaluationExecutor(
+    max_workers=int(os.getenv("EVAL_MAX_WORKERS", "0")) or None,
+    timeout=float(os.getenv("EVAL_TIMEOUT_SECONDS", "2.0")),
+    heavy_cost_units=float(os.getenv("EVAL_HEAVY_COST_UNITS", "50000")),
+    heavy_cost_ms=float(os.getenv("EVAL_HEAVY_COST_MS", "50")),
+    cost_budget=EVAL_COST_BUDGET,
+)
+
+
 @app.post("/generate-problem")
-def generate_problem(req: ProblemRequest):
+async def generate_problem(req: ProblemRequest):
 
-    q = QUESTIONS.get(req.id)
+    q = BANK.questions.get(req.id)
     if not q:
         raise HTTPException(status_code=404, detail="Question not found")
 
-    # 1. parámetros
-    params = req.params_override or generate_params_for_question(q)
-    params = clean_params_for_question(q, params)
+    if not req.params_override:
+        pooled = PROBLEM_POOL.pop(q.id)
+        if pooled is not None:
+            return pooled
 
-    # 2. enunciado
-    statement = render_template(q.template, params)
+    # Muestreo, limpieza y armado corren en un hilo: no bloquean el event loop
+    params = await asyncio.to_thread(prepare_params, q, req.params_override)
+
+    # Solo se cachean params explícitos (ver render_question_results)
+    key = RESULT_CACHE.make_key(q, params) if req.params_override else None
+    rendered = RESULT_CACHE.get(key)
+    if rendered is None:
+        try:
+            rendered = await EVALUATOR.render(q, params, templates_for(q))
+        except EvaluationTimeout:
+            raise HTTPException(status_code=504, detail="La evaluación excedió el tiempo límite.")
+        except EvaluationUnavailable:
+            raise HTTPException(status_code=503, detail="Evaluador no disponible, reintente.")
+        except EvaluationBudgetExceeded as e:
+            raise HTTPException(status_code=400, detail=f"Parámetros demasiado costosos de evaluar ({e}).")
+        RESULT_CACHE.put(key, rendered)
+
+    return await asyncio.to_thread(assemble_generated_problem, q, params, rendered)
+
+
+@app.get("/pool/stats")
+def pool_stats():
+    return PROBLEM_POOL.stats()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return RESULT_CACHE.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Formato de exposición de Prometheus (text/plain; version=0.0.4)
+    return PlainTextResponse(
+        METRICS.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# ======================================
+# GENERATE PROBLEMS BATCH (vectorizado)
+# ======================================
+MAX_BATCH_SIZE = 10000
+
+
+@app.post("/generate-problems-batch", response_model=BatchProblemResponse)
+def generate_problems_batch(req: BatchProblemRequest):
+
+    q = BANK.questions.get(req.id)
+    if not q:
+        raise HTTPException(status_code=404, detail="Question not found")
 
-    # 3. Procesar resultados matemáticos
+    # 1. parámetros en columnas (overrides explícitos o generados)
+    if req.params_overrides:
+        if len(req.params_overrides) > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_SIZE} variantes por lote.")
+        # Las claves deben ser exactamente los params de la pregunta: una que
+        # falte o sobre terminaría en NameError al evaluar
+        expected = set(q.params)
+        for i, p in enumerate(req.params_overrides):
+            if set(p) != expected:
+                missing, unknown = sorted(expected - set(p)), sorted(set(p) - expected)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"params_overrides[{i}]: faltan {missing}, desconocidos {unknown}.",
+                )
+        plan = cleaner_for(q)
+        rows = [plan.apply(p) for p in req.params_overrides]
+        columns = rows_to_columns(rows)
+    else:
+        if not 1 <= req.count <= MAX_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"count debe estar entre 1 y {MAX_BATCH_SIZE}.")
+        try:
+            columns = sampler_for(q).sample(req.count)
+        except ValueError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    count = len(next(iter(columns.values())))
+
+    # 2. resultados: una pasada vectorizada por expression_symbolic
     results_output = []
     for r in q.math.results:
-        rendered = render_math_result(r.model_dump(), params, q)
+        try:
+            values = eval_symbolic_batch(r.expression_symbolic, columns, q, EVAL_COST_BUDGET)
+        except EvaluationBudgetExceeded as e:
+            raise HTTPException(status_code=400, detail=f"Parámetros demasiado costosos de evaluar ({e}).")
+        except ValueError as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
         results_output.append(
-            ComputedResult(
-                result_id=rendered["id"],
-                label=rendered["label"],
-                general_formula_latex=rendered["general_formula_latex"],
-                instantiated_expression_latex=rendered["expression_latex"],
-                numeric_result=rendered["raw_numeric"],
-                numeric_result_formatted=rendered["numeric_value"],
+            BatchComputedResult(
+                result_id=r.id,
+                label=r.label,
+                numeric_results=[None if v != v else v for v in values.tolist()],
+                numeric_results_formatted=format_numeric_batch(values, r.numeric_format.model_dump()),
             )
         )
 
-    return GeneratedProblemLatex(
+    # 3. enunciados (opcional, fila a fila)
+    statements = None
+    if req.include_statements:
+        statement = templates_for(q).statement
+        statements = [statement.render(row) for row in columns_to_rows(columns)]
+
+    return BatchProblemResponse(
         id=q.id,
         topic=q.topic,
-        statement=statement,
-        doc_url=q.doc_url,
-        doc_summary=q.doc_summary,
-        params=params,
-        results=results_output
+        count=count,
+        params={k: v.tolist() for k, v in columns.items()},
+        results=results_output,
+        statements=statements,
     )
 
 
 # ======================================
 # GENERATE TEST
 # ======================================
+def _distractors(raw: float, correct_val: str, spec: Dict[str, Any], count: int = 3) -> List[str]:
+    """
+    Opciones incorrectas con los mismos decimales que la respuesta. Al ser
+    valores distintos del mismo formato quedan a una unidad del último
+    decimal o más entre sí, fuera de la tolerancia de calificación.
+    Se compara por valor ("-0.0000" es lo mismo que "0.0000").
+    """
+    unit = 10.0 ** (-spec.get("decimals", 4))
+    spread = max(abs(raw) * 0.2, 4 * unit)
+
+    seen = {float(correct_val)}
+    options: List[str] = []
+    for _ in range(20 * count):
+        if len(options) == count:
+            return options
+        candidate = format_numeric(raw + random.uniform(-spread, spread), spec)
+        if float(candidate) not in seen:
+            seen.add(float(candidate))
+            options.append(candidate)
+
+    # Respaldo determinista: pasos de una unidad alrededor de la respuesta
+    step = 1
+    while len(options) < count:
+        for sign in (1, -1):
+            candidate = format_numeric(float(correct_val) + sign * step * unit, spec)
+            if float(candidate) not in seen and len(options) < count:
+                seen.add(float(candidate))
+                options.append(candidate)
+        step += 1
+    return options
+
+
+def build_test_question(q: QuestionDefinition) -> Dict[str, Any]:
+    """Genera una pregunta de selección múltiple (params nuevos + 4 opciones)."""
+    params = prepare_params(q)
+
+    statement = render_statement(q, params)
+
+    # Solo 1 resultado
+    rendered = render_question_results(q, params)[0]
+
+    correct_val = rendered["numeric_value"]
+    raw = rendered["raw_numeric"]
+
+    options = [correct_val] + _distractors(raw, correct_val, q.math.results[0].numeric_format.model_dump())
+
+    random.shuffle(options)
+
+    return {
+        "id": q.id,
+        "topic": q.topic,
+        "statement": statement,
+        "params": params,
+        "options": options,
+        "correct": correct_val,
+    }
+
+
+# Tests emitidos + clave de respuestas (SQLite WAL, escritura diferida en lotes).
+# La base se abre en el lifespan. TEST_STORE_RETENTION_DAYS=0 guarda para siempre.
+_TEST_RETENTION_DAYS = float(os.getenv("TEST_STORE_RETENTION_DAYS", "30"))
+TEST_STORE = TestStore(
+    default_test_store_path(),
+    batch_size=int(os.getenv("TEST_STORE_BATCH_SIZE", "256")),
+    flush_interval=float(os.getenv("TEST_STORE_FLUSH_INTERVAL_MS", "50")) / 1000,
+    max_pending=int(os.getenv("TEST_STORE_MAX_PENDING", "10000")),
+    retention=_TEST_RETENTION_DAYS * 86400 if _TEST_RETENTION_DAYS > 0 else None,
+)
+
+
 @app.post("/generate-test")
 def generate_test(req: TestRequest):
 
-    valid_ids = [qid for qid, q in QUESTIONS.items() if solver_is_numeric(q)]
+    snapshot = BANK.snapshot
+    valid_ids = snapshot.indexes.eligible_ids(req.topics, req.solvers)
 
     if req.num_questions > len(valid_ids):
         raise HTTPException(status_code=400, detail="No hay suficientes preguntas numéricas para test.")
 
     selected = random.sample(valid_ids, req.num_questions)
-    output = []
+    output = [build_test_question(snapshot.questions[qid]) for qid in selected]
 
-    for qid in selected:
-        q = QUESTIONS[qid]
+    test_id = uuid.uuid4().hex
+    TEST_STORE.put(test_id, output, {qid: snapshot.questions[qid].version for qid in selected})
 
-        params = generate_params_for_question(q)
-        params = clean_params_for_question(q, params)
+    return {"test_id": test_id, "questions": output}
 
-        statement = render_template(q.template, params)
 
-        # Solo 1 resultado
-        r = q.math.results[0]
-        rendered = render_math_result(r.model_dump(), params, q)
+@app.get("/test-store/stats")
+def test_store_stats():
+    return TEST_STORE.stats()
 
-        correct_val = rendered["numeric_value"]
-        raw = rendered["raw_numeric"]
 
-        spread = abs(raw) * 0.2 if raw != 0 else 0.1
+# ======================================
+# GENERATE TEST (STREAMING NDJSON)
+# ======================================
+MAX_STREAM_STUDENTS = 5000
+MAX_STREAM_QUESTIONS = 100
+
+
+@app.post("/generate-test-stream")
+def generate_test_stream(req: TestStreamRequest):
+    """
+    Igual que /generate-test pero para un curso completo: un test por
+    estudiante, una pregunta por línea (NDJSON). Cada test se genera al
+    enviarse, así que la memoria no depende del tamaño del examen.
+    Cada test se guarda en TEST_STORE y sus líneas llevan su test_id.
+    """
+    snapshot = BANK.snapshot
+    questions = snapshot.questions
+
+    if req.question_ids:
+        missing = [qid for qid in req.question_ids if qid not in questions]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Questions not found: {missing}")
+        valid_ids = [qid for qid in req.question_ids if solver_is_numeric(questions[qid])]
+        if req.topics or req.solvers:
+            allowed = set(snapshot.indexes.eligible_ids(req.topics, req.solvers))
+            valid_ids = [qid for qid in valid_ids if qid in allowed]
+    else:
+        valid_ids = snapshot.indexes.eligible_ids(req.topics, req.solvers)
+
+    if not 1 <= req.num_students <= MAX_STREAM_STUDENTS:
+        raise HTTPException(status_code=400, detail=f"num_students debe estar entre 1 y {MAX_STREAM_STUDENTS}.")
+    if not 1 <= req.num_questions <= MAX_STREAM_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"num_questions debe estar entre 1 y {MAX_STREAM_QUESTIONS}.")
+    if not valid_ids or (not req.allow_repeats and req.num_questions > len(valid_ids)):
+        raise HTTPException(status_code=400, detail="No hay suficientes preguntas numéricas para test.")
 
-        options = [
-            correct_val,
-            f"{raw + random.uniform(-spread, spread):.5f}",
-            f"{raw + random.uniform(-spread, spread):.5f}",
-            f"{raw + random.uniform(-spread, spread):.5f}",
-        ]
+    questions = {qid: questions[qid] for qid in valid_ids}
+    versions = {qid: q.version for qid, q in questions.items()}
 
-        random.shuffle(options)
+    def lines():
+        for student in range(req.num_students):
+            if req.allow_repeats:
+                selected = random.choices(valid_ids, k=req.num_questions)
+            else:
+                selected = random.sample(valid_ids, req.num_questions)
 
-        output.append({
-            "id": qid,
-            "topic": q.topic,
-            "statement": statement,
-            "params": params,
-            "options": options,
-            "correct": correct_val,
-        })
+            # Se guarda antes de enviar la primera línea: el test ya se puede calificar
+            test_id = uuid.uuid4().hex
+            output = [build_test_question(questions[qid]) for qid in selected]
+            TEST_STORE.put(test_id, output, versions)
 
-    return {"questions": output}
+            for index, item in enumerate(output):
+                line = {"student": student, "test_id": test_id, "index": index, **item}
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 # ======================================
@@ -204,15 +580,22 @@ def generate_test(req: TestRequest):
 @app.post("/grade-test", response_model=GradeResponse)
 def grade_test(req: GradeRequest):
 
+    if req.test_id is not None:
+        return _grade_stored_test(req)
+
     total = len(req.answers)
     if total == 0:
         raise HTTPException(status_code=400, detail="No hay respuestas para calificar.")
 
+    missing = [a.id for a in req.answers if a.correct is None]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Falta 'correct' (o test_id) para: {missing}")
+
     correct = 0
     details = []
 
     for a in req.answers:
-        is_ok = abs(a.selected - a.correct) < 1e-6
+        is_ok = abs(a.selected - a.correct) < question_tolerance(BANK.questions, a.id)
         if is_ok:
             correct += 1
 
@@ -228,9 +611,235 @@ def grade_test(req: GradeRequest):
     return GradeResponse(score=score, details=details)
 
 
+def _grade_stored_test(req: GradeRequest) -> GradeResponse:
+    """
+    Califica contra el test guardado: la clave sale del servidor, el total es
+    el número de ítems del test y los ítems sin respuesta cuentan como error.
+    Una pregunta repetida en el test (allow_repeats) se responde tantas veces
+    como aparece, en orden.
+    """
+    test = TEST_STORE.get(req.test_id)
+    if test is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    slots: Dict[str, List[Any]] = {}
+    for item in test.items:
+        slots.setdefault(item.question_id, []).append(item)
+
+    answers: Dict[int, float] = {}
+    unknown, duplicated = [], []
+    for a in req.answers:
+        free = slots.get(a.id)
+        if free is None:
+            unknown.append(a.id)
+        elif not free:
+            duplicated.append(a.id)
+        else:
+            answers[free.pop(0).index] = a.selected
+
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Preguntas que no son del test: {unknown}")
+    if duplicated:
+        raise HTTPException(status_code=400, detail=f"Respuestas duplicadas para: {duplicated}")
+
+    correct = 0
+    details = []
+    questions = BANK.questions
+
+    for item in test.items:
+        expected = float(item.correct)
+        selected = answers.get(item.index)
+        is_ok = selected is not None and abs(selected - expected) < question_tolerance(questions, item.question_id)
+        if is_ok:
+            correct += 1
+
+        details.append({
+            "id": item.question_id,
+            "selected": selected,
+            "correct": expected,
+            "is_correct": is_ok
+        })
+
+    score = round(correct / len(test.items) * 100, 2) if test.items else 0.0
+
+    return GradeResponse(score=score, details=details)
+
+
+# ======================================
+# GRADE TESTS BULK (curso completo, vectorizado)
+# ======================================
+@app.post("/grade-tests-bulk", response_model=BulkGradeResponse)
+async def grade_tests_bulk(request: Request):
+    """
+    Califica muchas hojas de respuesta en una pasada NumPy.
+
+    Acepta:
+      - application/json: {"submissions": [{"student_id", "answers": [GradeItem]}]}
+      - text/csv (stream): student_id,id,selected,correct
+      - application/x-ndjson (stream): una respuesta o un estudiante por línea
+
+    La tolerancia de cada pregunta sale de numeric_format.decimals.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    grader = BulkGrader(question_tolerances(BANK.questions))
+
+    try:
+        if content_type in ("text/csv", "application/x-ndjson"):
+            fmt = "csv" if content_type == "text/csv" else "ndjson"
+            await add_stream(grader, aiter_lines(request.stream()), fmt)
+        else:
+            req = BulkGradeRequest.model_validate_json(await request.body())
+            grader.add_rows(rows_from_submissions(req.submissions))
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Formato de respuestas inválido: {e}")
+
+    if len(grader) == 0:
+        raise HTTPException(status_code=400, detail="No hay respuestas para calificar.")
+
+    return grader.grade()
+
+
+# ======================================
+# TRUEL (Monte Carlo del simulador SimuladorDef)
+# ======================================
+MAX_TRUEL_GAMES = 10_000_000
+
+TRUEL_SIMULATOR = TruelSimulator(
+    max_workers=int(os.getenv("TRUEL_MAX_WORKERS", "0")) or None,
+)
+
+
+@app.post("/truel/simulate", response_model=TruelSimulationResponse)
+async def truel_simulate(req: TruelSimulationRequest):
+    if not 1 <= req.num_games <= MAX_TRUEL_GAMES:
+        raise HTTPException(status_code=400, detail=f"num_games debe estar entre 1 y {MAX_TRUEL_GAMES}.")
+    try:
+        params = TruelParams.from_config(req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    start = time.perf_counter()
+    stats = await TRUEL_SIMULATOR.simulate(params, req.num_games, req.seed)
+    return {**stats.to_dict(), "duration_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+
+@app.post("/truel/exact", response_model=TruelExactResponse)
+def truel_exact(cfg: TruelConfig):
+    # Solución exacta (cadena de Markov absorbente): sin error de muestreo
+    try:
+        params = TruelParams.from_config(cfg)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    start = time.perf_counter()
+    result = solve_exact(params)
+    return {**result, "duration_ms": round((time.perf_counter() - start) * 1000, 4)}
+
+
+MAX_SWEEP_AXIS = 101
+# ~8 µs de CPU por punto: 1M puntos ~8 s repartidos entre los workers
+MAX_SWEEP_POINTS = 1_000_000
+
+# TRUEL_SWEEP_CACHE_MAX_MB=0 desactiva el límite del directorio
+_SWEEP_CACHE_MAX_MB = float(os.getenv("TRUEL_SWEEP_CACHE_MAX_MB", "512"))
+TRUEL_SWEEP_CACHE = SweepCache(
+    default_cache_dir(),
+    max_bytes=int(_SWEEP_CACHE_MAX_MB * 1024 * 1024) if _SWEEP_CACHE_MAX_MB > 0 else None,
+)
+
+
+@app.post("/truel/sweep", response_model=TruelSweepResponse)
+async def truel_sweep(req: TruelSweepRequest):
+    axes = {}
+    for name in ("p_a", "p_b", "p_c"):
+        ax = getattr(req, name)
+        if not (0.0 <= ax.start <= 1.0 and 0.0 <= ax.stop <= 1.0 and 1 <= ax.num <= MAX_SWEEP_AXIS):
+            raise HTTPException(
+                status_code=400, detail=f"{name}: start/stop en [0, 1] y num entre 1 y {MAX_SWEEP_AXIS}."
+            )
+        axes[name] = axis_values(ax.start, ax.stop, ax.num)
+
+    profiles = ALL_PROFILES
+    if req.profiles:
+        if any(set(p) != {"A", "B", "C"} for p in req.profiles):
+            raise HTTPException(status_code=400, detail="Cada perfil debe definir la estrategia de A, B y C.")
+        profiles = tuple(dict.fromkeys((p["A"], p["B"], p["C"]) for p in req.profiles))
+
+    # Valida orden/forzado con las mismas reglas que /truel/exact
+    try:
+        base = TruelParams.from_config(TruelConfig(
+            probs={"A": 0.5, "B": 0.5, "C": 0.5},
+            strategies=dict(zip("ABC", profiles[0])),
+            turn_mode=req.turn_mode,
+            fixed_order=req.fixed_order,
+            forced_shooter=req.forced_shooter,
+            forced_target=req.forced_target,
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    spec = SweepSpec(
+        profiles=profiles,
+        turn_mode=base.turn_mode,
+        fixed_order=base.fixed_order,
+        forced_shooter=base.forced_shooter,
+        forced_target=base.forced_target,
+        **axes,
+    )
+    n_profiles, na, nb, nc = spec.shape
+    if n_profiles * na * nb * nc > MAX_SWEEP_POINTS:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_SWEEP_POINTS} puntos por barrido.")
+
+    start = time.perf_counter()
+    body, cache_status = await run_sweep(spec, TRUEL_SIMULATOR.get_pool(), TRUEL_SWEEP_CACHE)
+
+    # Cuerpo ya serializado (y cacheado en disco); el estado de cache y el
+    # tiempo van en headers para que el cuerpo sea idéntico entre requests
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={
+            "X-Cache": cache_status,
+            "Server-Timing": f"sweep;dur={(time.perf_counter() - start) * 1000:.3f}",
+        },
+    )
+
+
 # ======================================
 # TOPICS
 # ======================================
 @app.get("/topics")
-def list_topics():
-    return {"topics": sorted({q.topic for q in QUESTIONS.values()})}
\ No newline at end of file
+def list_topics(if_none_match: Optional[str] = Header(None)):
+    return cached_json_response(BANK.snapshot.catalog.topics, if_none_match, CATALOG_CACHE_CONTROL)
+
+
+# ======================================
+# ADMIN
+# ======================================
+# Con ADMIN_TOKEN se exige el header X-Admin-Token; sin él, solo loopback
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
+_LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def require_admin(request: Request, token: Optional[str]):
+    if ADMIN_TOKEN is not None:
+        if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=401, detail="X-Admin-Token inválido.")
+    elif request.client is None or request.client.host not in _LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Solo desde localhost (o configurar ADMIN_TOKEN).")
+
+
+@app.post("/admin/reload")
+def admin_reload(request: Request, x_admin_token: Optional[str] = Header(None)):
+    require_admin(request, x_admin_token)
+    report = BANK.reload()
+    return {
+        "duration_ms": report.duration_ms,
+        "added": report.added,
+        "changed": report.changed,
+        "removed": report.removed,
+        "unchanged": report.unchanged,
+        "errors": report.errors,
+        "kept": report.kept,
+        "total": len(BANK.questions),
+    }
\ No newline at end of file
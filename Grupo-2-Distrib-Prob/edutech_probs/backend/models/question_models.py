@@ -21,6 +21,17 @@ class GeneratedProblem(BaseModel):
 
 class TestRequest(BaseModel):
     num_questions: int = 5
+    topics: Optional[List[str]] = None
+    solvers: Optional[List[str]] = None
+
+
+class TestStreamRequest(BaseModel):
+    num_questions: int = 5
+    num_students: int = 1
+    question_ids: Optional[List[str]] = None
+    topics: Optional[List[str]] = None
+    solvers: Optional[List[str]] = None
+    allow_repeats: bool = False
 
 
 class TestQuestion(BaseModel):
@@ -32,11 +43,12 @@ class TestQuestion(BaseModel):
 class GradeItem(BaseModel):
     id: str
     selected: float
-    correct: float
+    correct: Optional[float] = None  # solo sin test_id (se confía en el cliente)
 
 
 class GradeRequest(BaseModel):
     answers: List[GradeItem]
+    test_id: Optional[str] = None  # clave de respuestas guardada por /generate-test
 
 
 class GradeResponse(BaseModel):
@@ -44,6 +56,21 @@ class GradeResponse(BaseModel):
     details: List[Dict[str, Any]]
 
 
+class BulkGradeSubmission(BaseModel):
+    student_id: str
+    answers: List[GradeItem]
+
+
+class BulkGradeRequest(BaseModel):
+    submissions: List[BulkGradeSubmission]
+
+
+class BulkGradeResponse(BaseModel):
+    total_answers: int
+    students: List[Dict[str, Any]]
+    questions: List[Dict[str, Any]]
+
+
 # ============================================================
 # 2. MODELOS NUEVOS (estructura del questions.json)
 # ============================================================
@@ -54,6 +81,18 @@ class ParamConfig(BaseModel):
     type: Literal["int", "float"] = "float"
 
 
+class ParamConstraint(BaseModel):
+    """
+    Restricción entre parámetros (la respeta el muestreador):
+    - "simplex": los params suman `total` (probabilidades de categorías).
+    - "order": los params quedan en orden no decreciente.
+    Para "x <= y" basta con "max": "y" en la ParamConfig de x.
+    """
+    type: Literal["order", "simplex"]
+    params: List[str]
+    total: float = 1.0
+
+
 class VariableMeta(BaseModel):
     latex: str
     description: str
@@ -89,6 +128,7 @@ class QuestionDefinition(BaseModel):
     params: Dict[str, ParamConfig]
     variables: Dict[str, VariableMeta]
     math: MathConfig
+    constraints: List[ParamConstraint] = []
 
 
 # ============================================================
@@ -111,4 +151,103 @@ class GeneratedProblemLatex(BaseModel):
     doc_url: Optional[str]
     doc_summary: Optional[str]
     params: Dict[str, Any]
-    results: List[ComputedResult]
\ No newline at end of file
+    results: List[ComputedResult]
+
+
+# ============================================================
+# 4. GENERACIÓN EN LOTE (para /generate-problems-batch)
+# ============================================================
+
+class BatchProblemRequest(BaseModel):
+    id: str
+    count: int = 100
+    params_overrides: Optional[List[Dict[str, Any]]] = None
+    include_statements: bool = False
+
+
+class BatchComputedResult(BaseModel):
+    result_id: str
+    label: str
+    numeric_results: List[Optional[float]]
+    numeric_results_formatted: List[Optional[str]]
+
+
+class BatchProblemResponse(BaseModel):
+    id: str
+    topic: str
+    count: int
+    params: Dict[str, List[Any]]
+    results: List[BatchComputedResult]
+    statements: Optional[List[str]] = None
+
+
+# ============================================================
+# 5. TRUEL (simulador del duelo a tres)
+# ============================================================
+
+TruelPlayer = Literal["A", "B", "C"]
+TruelStrategy = Literal["strongest", "weakest", "random", "skip"]
+
+
+class TruelConfig(BaseModel):
+    # Mismos campos que createGameState en SimuladorDef/engine.js
+    probs: Dict[TruelPlayer, float]
+    strategies: Dict[TruelPlayer, TruelStrategy]
+    turn_mode: Literal["fixed", "random"] = "fixed"
+    fixed_order: Optional[List[TruelPlayer]] = None
+    max_turns: int = 1000
+    forced_shooter: Optional[TruelPlayer] = None
+    forced_target: Optional[TruelPlayer] = None
+
+
+class TruelSimulationRequest(TruelConfig):
+    num_games: int = 100000
+    seed: Optional[int] = None
+
+
+class TruelSimulationResponse(BaseModel):
+    num_games: int
+    wins: Dict[str, int]
+    win_frequencies: Dict[str, float]
+    no_winner: int
+    no_winner_frequency: float
+    mean_turns: Optional[float]
+    turn_distribution: Dict[str, List[int]]
+    duration_ms: float
+
+
+class TruelExactResponse(BaseModel):
+    win_probabilities: Dict[str, float]
+    no_winner_probability: float
+    mean_turns: Optional[float]
+    num_states: int
+    duration_ms: float
+
+
+class TruelSweepAxis(BaseModel):
+    start: float = 0.05
+    stop: float = 0.95
+    num: int = 10
+
+
+class TruelSweepRequest(BaseModel):
+    p_a: TruelSweepAxis = TruelSweepAxis()
+    p_b: TruelSweepAxis = TruelSweepAxis()
+    p_c: TruelSweepAxis = TruelSweepAxis()
+    # None = las 64 combinaciones de estrategias
+    profiles: Optional[List[Dict[TruelPlayer, TruelStrategy]]] = None
+    turn_mode: Literal["fixed", "random"] = "fixed"
+    fixed_order: Optional[List[TruelPlayer]] = None
+    forced_shooter: Optional[TruelPlayer] = None
+    forced_target: Optional[TruelPlayer] = None
+
+
+class TruelSweepResponse(BaseModel):
+    key: str
+    # Arreglos planos en orden C; shape = [perfiles, len(p_a), len(p_b), len(p_c)]
+    shape: List[int]
+    axes: Dict[str, List[float]]
+    profiles: List[str]
+    win_probabilities: Dict[str, List[float]]
+    winner: List[int]
+    mean_turns: List[Optional[float]]
@@ -0,0 +1,35 @@
+# tests/conftest.py
+#
+# Corre desde backend/: python -m pytest -q
+# main.py se importa con las rutas de escritura (tests, barridos) en un
+# directorio temporal y sin el watcher del banco.
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+
+_TMP = tempfile.mkdtemp(prefix="edutech-tests-")
+os.environ.setdefault("TEST_STORE_PATH", os.path.join(_TMP, "tests.sqlite3"))
+os.environ.setdefault("TRUEL_SWEEP_CACHE_DIR", os.path.join(_TMP, "truel_sweeps"))
+os.environ.setdefault("QUESTIONS_WATCH_INTERVAL_SECONDS", "0")
+
+
+@pytest.fixture(scope="session")
+def app_main():
+    import main
+
+    return main
+
+
+@pytest.fixture(scope="session")
+def client(app_main):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app_main.app) as c:
+        yield c
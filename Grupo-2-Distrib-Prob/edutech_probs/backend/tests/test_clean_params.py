@@ -0,0 +1,24 @@
+# tests/test_clean_params.py
+
+import math
+
+from utils.clean_params import clean_params_for_question
+from utils.metrics import METRICS
+
+
+def test_wrapper_matches_the_snapshot_plan(app_main):
+    q = app_main.BANK.questions["multinomial_1"]
+    params = {"c1": 2.0, "c2": 1, "c3": 3, "p1": 1.0, "p2": 1.0, "p3": 2.0}
+
+    cleaned = clean_params_for_question(q, dict(params))
+    assert cleaned == app_main.cleaner_for(q).apply(dict(params))
+    assert math.isclose(cleaned["p1"] + cleaned["p2"] + cleaned["p3"], 1.0, rel_tol=1e-6)
+    assert isinstance(cleaned["c1"], int)
+
+
+def test_override_cleaning_is_reported_under_its_stage(client):
+    body = {"id": "binomial_1", "mode": "latex", "params_override": {"n": 10, "x": 25, "p": 0.2}}
+    problem = client.post("/generate-problem", json=body).json()
+
+    assert problem["params"]["x"] == 10  # acotado por "max": "n"
+    assert 'stage="clean_params_for_question",question_id="binomial_1"' in METRICS.render_prometheus()
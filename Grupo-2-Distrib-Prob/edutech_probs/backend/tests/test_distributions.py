@@ -0,0 +1,46 @@
+# tests/test_distributions.py
+
+import math
+
+import numpy as np
+import pytest
+
+from utils.distributions import BDTR_MAX_N, binom_cdf, binom_logpmf, binom_sf
+
+
+def _half_tail(n):
+    """P(X <= n/2 - 1) con p = 0.5, por simetría: (1 - P(X = n/2)) / 2."""
+    pmf_mid = math.exp(math.lgamma(n + 1) - 2 * math.lgamma(n / 2 + 1) - n * math.log(2))
+    return (1 - pmf_mid) / 2
+
+
+# bdtr (cephes) da 0.4985 / 0.1592 en estos puntos
+@pytest.mark.parametrize("n, rel_tol", [(10**7, 1e-9), (10**9, 1e-7)])
+def test_binomial_tails_are_accurate_for_huge_n(n, rel_tol):
+    k = n // 2 - 1
+    expected = _half_tail(n)
+    assert math.isclose(binom_cdf(k, n, 0.5), expected, rel_tol=rel_tol)
+    assert math.isclose(binom_sf(k, n, 0.5), 1 - expected, rel_tol=rel_tol)
+
+
+def test_binomial_tails_match_exact_sum_for_small_n():
+    n, p = 40, 0.3
+    for k in range(-1, n + 2):
+        exact = sum(math.comb(n, i) * p**i * (1 - p) ** (n - i) for i in range(0, min(k, n) + 1))
+        assert math.isclose(binom_cdf(k, n, p), exact, rel_tol=1e-12, abs_tol=1e-15)
+        assert math.isclose(binom_sf(k, n, p), 1 - exact, rel_tol=1e-9, abs_tol=1e-12)
+
+
+def test_binomial_tails_mix_small_and_large_n_in_one_batch():
+    k = np.array([3, 5 * 10**6 - 1, -1, 20])
+    n = np.array([10, 10**7, 10, 10])
+    out = binom_cdf(k, n, 0.5)
+    assert n[1] > BDTR_MAX_N
+    assert out[0] == pytest.approx(176 / 1024)
+    assert out[1] == pytest.approx(_half_tail(10**7), rel=1e-9)
+    assert out[2] == 0.0 and out[3] == 1.0
+
+
+def test_binomial_logpmf_outside_support():
+    assert binom_logpmf(-1, 10, 0.5) == -math.inf
+    assert binom_logpmf(11, 10, 0.5) == -math.inf
@@ -0,0 +1,56 @@
+# tests/test_executor.py
+
+import asyncio
+import copy
+import time
+
+import pytest
+
+from models.question_models import QuestionDefinition
+from utils.executor import EvaluationExecutor, EvaluationTimeout
+from utils.metrics import METRICS
+
+
+def _question(app_main, qid: str, expression: str) -> QuestionDefinition:
+    data = copy.deepcopy(app_main.BANK.questions["binomial_1"].model_dump())
+    data["id"] = qid
+    data["math"]["results"][0]["expression_symbolic"] = expression
+    return QuestionDefinition.model_validate(data)
+
+
+def test_timeout_kills_only_its_own_worker(app_main):
+    # heavy_cost_units=0: todo va a un proceso aparte
+    executor = EvaluationExecutor(max_workers=2, timeout=1.0, heavy_cost_units=0, cost_budget=None, grace=0.5)
+    # factorial de C no se interrumpe con SIGALRM: el padre tiene que matar el proceso
+    hung = _question(app_main, "exec_hung", "factorial(n * 10**7) * 0 + p")
+    slow = _question(app_main, "exec_slow", "sum(i * 0 for i in range(n * 20000)) + p")
+    params = {"n": 40, "x": 1, "p": 0.25}
+
+    async def run():
+        return await asyncio.gather(
+            executor.render(hung, params), executor.render(slow, params), return_exceptions=True
+        )
+
+    try:
+        start = time.perf_counter()
+        hung_result, slow_result = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+    finally:
+        executor.shutdown()
+
+    assert isinstance(hung_result, EvaluationTimeout)
+    assert slow_result[0]["numeric_value"] == "0.2500"
+    assert elapsed < 10
+
+
+def test_worker_stage_timings_reach_the_parent(app_main):
+    executor = EvaluationExecutor(max_workers=1, heavy_cost_units=0, cost_budget=None)
+    q = _question(app_main, "exec_metrics", "p")
+    try:
+        asyncio.run(executor.render(q, {"n": 5, "x": 1, "p": 0.5}))
+    finally:
+        executor.shutdown()
+
+    text = METRICS.render_prometheus()
+    assert 'stage="eval_symbolic_expression",question_id="exec_metrics"' in text
+    assert 'question_id="unknown"' not in text
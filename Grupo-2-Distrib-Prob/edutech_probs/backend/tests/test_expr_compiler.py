@@ -0,0 +1,55 @@
+# tests/test_expr_compiler.py
+
+import math
+import time
+
+from scipy import stats
+
+from utils.expr_compiler import EXACT_COST_LIMIT, EvaluationBudgetExceeded
+from utils.render import _BASE_ENV, compile_symbolic_expression
+
+BINOMIAL_PMF = "binom(n, x) * p**x * (1-p)**(n-x)"
+
+
+def _run(expr, budget=None, **params):
+    program = compile_symbolic_expression(expr).program
+    return program.run({**_BASE_ENV, **params}, budget)
+
+
+def test_small_inputs_use_exact_program():
+    assert _run(BINOMIAL_PMF, n=10, x=3, p=0.5) == math.comb(10, 3) / 2 ** 10
+
+
+def test_large_comb_falls_back_to_log_space_without_budget():
+    # Sin presupuesto, la variante exacta calcularía comb(10**7, 5*10**6) (segundos)
+    program = compile_symbolic_expression(BINOMIAL_PMF).program
+    params = {"n": 10**7, "x": 5 * 10**6, "p": 0.5}
+    assert program.log_space is not None
+    assert program._estimate({**_BASE_ENV, **params}) > EXACT_COST_LIMIT
+
+    start = time.perf_counter()
+    value = _run(BINOMIAL_PMF, **params)
+    assert time.perf_counter() - start < 1.0
+    assert math.isclose(value, stats.binom.pmf(5 * 10**6, 10**7, 0.5), rel_tol=1e-6)
+
+
+def test_budget_still_rejects_expensive_loops():
+    program = compile_symbolic_expression("sum(binom(n, i) for i in range(n))").program
+    try:
+        program.run({**_BASE_ENV, "n": 10**6}, budget=1_000)
+    except EvaluationBudgetExceeded:
+        pass
+    else:
+        raise AssertionError("se esperaba EvaluationBudgetExceeded")
+
+
+def test_generate_problem_with_huge_binomial_override(client):
+    start = time.perf_counter()
+    r = client.post(
+        "/generate-problem",
+        json={"id": "binomial_1", "mode": "latex", "params_override": {"n": 10**7, "x": 5 * 10**6, "p": 0.5}},
+    )
+    assert r.status_code == 200
+    assert time.perf_counter() - start < 5.0
+    expected = stats.binom.pmf(5 * 10**6, 10**7, 0.5)
+    assert math.isclose(r.json()["results"][0]["numeric_result"], expected, rel_tol=1e-6)
@@ -0,0 +1,44 @@
+# tests/test_grading.py
+
+import random
+
+from utils.grading import BulkGrader, question_tolerances
+
+
+def test_distractors_are_at_least_one_unit_away(app_main):
+    random.seed(0)
+    spec = {"type": "decimal", "decimals": 4, "rounding": "half_up"}
+    for raw in (0.1234, 0.0, 1e-7, 0.99995):
+        correct = app_main.format_numeric(raw, spec)
+        options = app_main._distractors(raw, correct, spec)
+        values = sorted(float(v) for v in options + [correct])
+        assert len(options) == 3
+        assert all(len(v.split(".")[1]) == 4 for v in options)
+        assert all(b - a >= 1e-4 - 1e-12 for a, b in zip(values, values[1:]))
+
+
+def test_only_the_correct_option_grades_right(client):
+    random.seed(1)
+    test = client.post("/generate-test", json={"num_questions": 5}).json()
+
+    for q in test["questions"]:
+        for option in q["options"]:
+            expected = option == q["correct"]
+            answer = {"id": q["id"], "selected": float(option)}
+
+            stored = client.post("/grade-test", json={"test_id": test["test_id"], "answers": [answer]}).json()
+            item = next(d for d in stored["details"] if d["id"] == q["id"])
+            assert item["is_correct"] is expected
+
+            trusted = client.post(
+                "/grade-test", json={"answers": [{**answer, "correct": float(q["correct"])}]}
+            ).json()
+            assert trusted["details"][0]["is_correct"] is expected
+
+
+def test_bulk_uses_the_same_tolerance(app_main):
+    grader = BulkGrader(question_tolerances(app_main.BANK.questions))
+    grader.add("s1", "binomial_1", 0.12341, 0.1234)   # mismo valor a 4 decimales
+    grader.add("s1", "binomial_1", 0.1235, 0.1234)    # una unidad más: distractor
+    result = grader.grade()
+    assert result["students"][0]["correct"] == 1
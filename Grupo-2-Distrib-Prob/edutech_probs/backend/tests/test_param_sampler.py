@@ -0,0 +1,68 @@
+# tests/test_param_sampler.py
+
+import copy
+
+import numpy as np
+import pytest
+
+from models.question_models import QuestionDefinition
+from utils.param_sampler import ParamSampler
+
+
+def _bound(cols, value):
+    return cols[value] if isinstance(value, str) else value
+
+
+def test_bank_samples_respect_every_constraint(app_main):
+    rng = np.random.default_rng(7)
+    for q in app_main.BANK.questions.values():
+        cols = ParamSampler(q).sample(2000, rng)
+
+        for name, cfg in q.params.items():
+            col = cols[name]
+            assert len(col) == 2000
+            assert (col >= _bound(cols, cfg.min) - 1e-9).all(), (q.id, name)
+            assert (col <= np.maximum(_bound(cols, cfg.max), _bound(cols, cfg.min)) + 1e-9).all(), (q.id, name)
+            if cfg.type == "int":
+                assert np.issubdtype(col.dtype, np.integer), (q.id, name)
+
+        for c in q.constraints:
+            if c.type == "simplex":
+                total = sum(cols[p] for p in c.params)
+                assert np.allclose(total, c.total, atol=1e-4), q.id
+            else:
+                for a, b in zip(c.params, c.params[1:]):
+                    assert (cols[a] <= cols[b]).all(), q.id
+
+
+def test_simplex_is_not_repaired_after_the_fact(app_main):
+    # Rechazo (no normalización): el último del grupo cae dentro de su rango
+    q = app_main.BANK.questions["resistores_1"]
+    cols = ParamSampler(q).sample(5000, np.random.default_rng(3))
+    lo, hi = q.params["p_2"].min, q.params["p_2"].max
+    assert ((cols["p_2"] >= lo) & (cols["p_2"] <= hi)).all()
+
+
+def test_draw_returns_python_numbers(app_main):
+    q = app_main.BANK.questions["binomial_1"]
+    row = ParamSampler(q, buffer_size=8).draw()
+    assert isinstance(row["n"], int) and isinstance(row["p"], float)
+    assert 0 <= row["x"] <= row["n"]
+
+
+def _with_constraints(app_main, constraints):
+    data = copy.deepcopy(app_main.BANK.questions["resistores_1"].model_dump())
+    data["constraints"] = constraints
+    return QuestionDefinition.model_validate(data)
+
+
+def test_impossible_simplex_is_reported(app_main):
+    q = _with_constraints(app_main, [{"type": "simplex", "params": ["p_0", "p_1", "p_2"], "total": 5.0}])
+    with pytest.raises(ValueError, match="imposibles"):
+        ParamSampler(q, max_rounds=3).sample(10)
+
+
+def test_constraint_on_unknown_param_fails_at_compile(app_main):
+    q = _with_constraints(app_main, [{"type": "order", "params": ["p_0", "nope"]}])
+    with pytest.raises(ValueError, match="desconocidos"):
+        ParamSampler(q)
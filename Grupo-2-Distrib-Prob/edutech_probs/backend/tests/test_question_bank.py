@@ -0,0 +1,100 @@
+# tests/test_question_bank.py
+
+import copy
+import json
+
+from utils import render
+from utils.question_bank import QuestionBank
+
+
+def _bank_file(tmp_path, app_main, expression="binom(n, x) * p**x * (1-p)**(n-x)"):
+    data = copy.deepcopy(app_main.BANK.questions["binomial_1"].model_dump())
+    data["math"]["results"][0]["expression_symbolic"] = expression
+    path = tmp_path / "questions.json"
+    path.write_text(json.dumps([data]), encoding="utf-8")
+    return path, data
+
+
+def test_reload_forgets_programs_of_changed_questions(tmp_path, app_main):
+    path, data = _bank_file(tmp_path, app_main, "p * 3 + 0.125")
+    bank = QuestionBank(path)
+    bank.reload(strict=True)
+    assert "p * 3 + 0.125" in render._COMPILED_CACHE
+
+    data["math"]["results"][0]["expression_symbolic"] = "p * 4 + 0.125"
+    path.write_text(json.dumps([data]), encoding="utf-8")
+    report = bank.reload()
+
+    assert report.changed == ["binomial_1"]
+    assert "p * 3 + 0.125" not in render._COMPILED_CACHE
+    assert "p * 4 + 0.125" in render._COMPILED_CACHE
+
+    # Una versión que no compila tampoco se queda en el cache
+    data["math"]["results"][0]["expression_symbolic"] = "p +* 5"
+    path.write_text(json.dumps([data]), encoding="utf-8")
+    report = bank.reload()
+
+    assert report.kept == ["binomial_1"]
+    assert "p +* 5" not in render._COMPILED_CACHE
+    assert "p * 4 + 0.125" in render._COMPILED_CACHE
+
+
+def test_compiled_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(render, "COMPILED_CACHE_MAXSIZE", render.compiled_cache_size() + 2)
+    for i in range(10):
+        render.compile_symbolic_expression(f"p + {i} * 0.001")
+    assert render.compiled_cache_size() == render.COMPILED_CACHE_MAXSIZE
+    assert "p + 9 * 0.001" in render._COMPILED_CACHE
+
+
+def test_broken_file_keeps_previous_questions(tmp_path, app_main):
+    path, data = _bank_file(tmp_path, app_main)
+    bank = QuestionBank(path)
+    bank.reload(strict=True)
+    before = bank.questions["binomial_1"]
+
+    path.write_text('[{"id": "binomial_1", ', encoding="utf-8")
+    report = bank.reload()
+
+    assert len(report.errors) == 1 and report.errors[0].startswith("questions.json:")
+    assert report.removed == [] and report.unchanged == 1
+    assert bank.questions["binomial_1"] is before
+    # El watcher no vuelve a recargar (ni a loguear) hasta que el archivo cambie
+    assert bank.reload_if_changed() is None
+
+    path.write_text(json.dumps([data]), encoding="utf-8")
+    assert bank.reload().errors == []
+
+
+def test_broken_file_in_a_directory_only_affects_its_questions(tmp_path, app_main):
+    data = copy.deepcopy(app_main.BANK.questions["binomial_1"].model_dump())
+    other = copy.deepcopy(data)
+    other["id"] = "binomial_copy"
+    (tmp_path / "a.json").write_text(json.dumps([data]), encoding="utf-8")
+    (tmp_path / "b.json").write_text(json.dumps(other), encoding="utf-8")
+    bank = QuestionBank(tmp_path)
+    bank.reload(strict=True)
+
+    (tmp_path / "b.json").write_text("not json", encoding="utf-8")
+    data["version"] += 1
+    (tmp_path / "a.json").write_text(json.dumps([data]), encoding="utf-8")
+    report = bank.reload()
+
+    assert report.changed == ["binomial_1"]
+    assert sorted(bank.questions) == ["binomial_1", "binomial_copy"]
+    assert report.errors[0].startswith("b.json:")
+
+
+def test_admin_reload_reports_a_broken_bank(client, app_main, monkeypatch, tmp_path):
+    path, _ = _bank_file(tmp_path, app_main)
+    bank = QuestionBank(path)
+    bank.reload(strict=True)
+    monkeypatch.setattr(app_main, "BANK", bank)
+    monkeypatch.setattr(app_main, "ADMIN_TOKEN", "secreto")
+
+    path.write_text("{", encoding="utf-8")
+    response = client.post("/admin/reload", headers={"X-Admin-Token": "secreto"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["errors"] and body["total"] == 1
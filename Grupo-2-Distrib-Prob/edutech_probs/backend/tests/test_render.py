@@ -0,0 +1,35 @@
+# tests/test_render.py
+
+import copy
+
+from models.question_models import QuestionDefinition
+from utils.render import compile_question_templates
+
+
+def _question(app_main, **changes) -> QuestionDefinition:
+    data = copy.deepcopy(app_main.BANK.questions["binomial_1"].model_dump())
+    data["math"]["results"][0].update(changes)
+    return QuestionDefinition.model_validate(data)
+
+
+def test_single_letter_placeholders_are_checked(app_main):
+    q = _question(app_main, expression_latex_template=r"\sum_{k=0}^{{n}} {p}^{k} + {prob_exact} \text{total}")
+    templates, warnings = compile_question_templates(q)
+
+    # {k} no es param ni resultado; {prob_exact} es el id del resultado; \text{...} es LaTeX
+    assert warnings == ["binomial_1.prob_exact: {k} no es un param ni un resultado declarado"]
+    assert templates.results["prob_exact"].render({"n": 5, "p": 0.5}) == r"\sum_{k=0}^{5} 0.5^{k} + {prob_exact} \text{total}"
+
+
+def test_shipped_bank_has_no_unknown_placeholders(app_main):
+    for q in app_main.BANK.questions.values():
+        assert compile_question_templates(q)[1] == []
+
+
+def test_templates_live_in_the_snapshot(app_main):
+    q = app_main.BANK.questions["binomial_1"]
+    assert app_main.templates_for(q) is app_main.BANK.snapshot.templates["binomial_1"]
+
+    # Una pregunta fuera del snapshot se tokeniza al vuelo
+    other = _question(app_main, expression_latex_template="P = {p}")
+    assert app_main.templates_for(other).results["prob_exact"].render({"p": 0.25}) == "P = 0.25"
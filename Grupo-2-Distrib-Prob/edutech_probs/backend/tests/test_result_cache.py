@@ -0,0 +1,41 @@
+# tests/test_result_cache.py
+
+from utils.result_cache import ResultCache
+
+
+def test_lru_eviction_and_hits():
+    cache = ResultCache(maxsize=2, ttl=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" queda como el menos reciente
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_random_params_do_not_enter_the_cache(app_main):
+    cache = app_main.RESULT_CACHE
+    cache.clear()
+    before = cache.stats()
+
+    app_main.PROBLEM_POOL.sync_questions(["binomial_1"])
+    app_main.PROBLEM_POOL.invalidate("binomial_1")
+    app_main.PROBLEM_POOL.fill("binomial_1", 32)
+    for _ in range(32):
+        app_main.build_test_question(app_main.BANK.questions["binomial_1"])
+
+    after = cache.stats()
+    assert after["size"] == 0
+    assert (after["hits"], after["misses"]) == (before["hits"], before["misses"])
+
+
+def test_explicit_overrides_are_cached(client, app_main):
+    app_main.RESULT_CACHE.clear()
+    body = {"id": "binomial_1", "mode": "latex", "params_override": {"n": 12, "x": 4, "p": 0.25}}
+    hits = app_main.RESULT_CACHE.stats()["hits"]
+
+    first = client.post("/generate-problem", json=body).json()
+    second = client.post("/generate-problem", json=body).json()
+
+    assert first["results"] == second["results"]
+    assert app_main.RESULT_CACHE.stats()["hits"] == hits + 1
@@ -0,0 +1,29 @@
+# tests/test_vectorized.py
+
+import math
+
+import numpy as np
+
+from utils.render import eval_symbolic_expression
+from utils.vectorized import columns_to_rows, eval_symbolic_batch
+
+
+def test_integer_columns_do_not_wrap():
+    # En int64, 100000**4 = 1e20 desborda y da un número negativo
+    columns = {"n": np.array([10, 100_000, 3_000_000], dtype=np.int64), "x": np.array([2, 3, 4], dtype=np.int64)}
+    values = eval_symbolic_batch("n**4 * x / 1e12", columns)
+
+    expected = [r["n"] ** 4 * r["x"] / 1e12 for r in columns_to_rows(columns)]
+    assert np.allclose(values, expected, rtol=1e-12)
+    assert (values > 0).all()
+
+
+def test_batch_matches_scalar_on_the_bank(app_main):
+    for q in app_main.BANK.questions.values():
+        columns = app_main.sampler_for(q).sample(20)
+        rows = columns_to_rows(columns)
+        for r in q.math.results:
+            values = eval_symbolic_batch(r.expression_symbolic, columns, q)
+            for value, row in zip(values.tolist(), rows):
+                scalar = eval_symbolic_expression(r.expression_symbolic, row, q)
+                assert math.isclose(value, scalar, rel_tol=1e-9, abs_tol=1e-12), (q.id, r.id, row)
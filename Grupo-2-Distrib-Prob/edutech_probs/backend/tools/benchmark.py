@@ -0,0 +1,269 @@
+# tools/benchmark.py
+#
+# Benchmark reproducible del pipeline de preguntas.
+#
+# Uso (desde backend/):
+#   python -m tools.benchmark --output bench.json
+#   python -m tools.benchmark --baseline bench.json --threshold 0.2
+#
+# Con --baseline, compara contra un resultado guardado y termina con código 1
+# si alguna medición es más lenta que baseline * (1 + threshold).
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+import main
+from models.question_models import QuestionDefinition
+from utils.render import render_math_result, render_template
+
+
+# ---------------------------------------------------------
+# PARÁMETROS (típicos y peor caso)
+# ---------------------------------------------------------
+
+def typical_params(q: QuestionDefinition, count: int) -> List[Dict[str, Any]]:
+    """Parámetros como los genera /generate-problem."""
+    return [main.prepare_params(q) for _ in range(count)]
+
+
+def worst_case_params(q: QuestionDefinition) -> Dict[str, Any]:
+    """
+    Esquina superior: cada parámetro en su ParamConfig.max (resolviendo
+    referencias a otros parámetros). Es el peor caso para cotas de bucles
+    como n, n_partidos o n_muestra.
+    """
+    params: Dict[str, Any] = {}
+    for name, cfg in q.params.items():
+        max_v = params[cfg.max] if isinstance(cfg.max, str) and cfg.max in params else cfg.max
+        params[name] = int(max_v) if cfg.type == "int" else float(max_v)
+    return main.cleaner_for(q).apply(params)
+
+
+# ---------------------------------------------------------
+# MEDICIÓN
+# ---------------------------------------------------------
+
+def measure(fn: Callable[[Any], Any], inputs: Sequence[Any], repeat: int) -> Dict[str, Any]:
+    """
+    Ejecuta fn sobre todos los inputs `repeat` veces y se queda con la
+    pasada más rápida (menos ruido del sistema).
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for x in inputs:
+            fn(x)
+        best = min(best, time.perf_counter() - start)
+
+    mean_s = best / len(inputs)
+    return {
+        "calls": len(inputs),
+        "mean_us": round(mean_s * 1e6, 3),
+        "ops_per_sec": round(1.0 / mean_s, 1) if mean_s > 0 else None,
+    }
+
+
+def safe_measure(fn: Callable[[Any], Any], inputs: Sequence[Any], repeat: int) -> Dict[str, Any]:
+    try:
+        fn(inputs[0])
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return measure(fn, inputs, repeat)
+
+
+def bench_question(q: QuestionDefinition, samples: int, repeat: int) -> Dict[str, Any]:
+    typical = typical_params(q, samples)
+    worst = worst_case_params(q)
+    plan = main.cleaner_for(q)
+
+    out: Dict[str, Any] = {
+        "worst_case_params": worst,
+        "clean_params": safe_measure(plan.apply, typical, repeat),
+        "render_template": safe_measure(lambda p: render_template(q.template, p), typical, repeat),
+        "results": {},
+    }
+
+    for r in q.math.results:
+        math_def = r.model_dump()
+        out["results"][r.id] = {
+            "typical": safe_measure(lambda p: render_math_result(math_def, p, q), typical, repeat),
+            "worst": safe_measure(lambda p: render_math_result(math_def, p, q), [worst] * samples, repeat),
+        }
+    return out
+
+
+@contextmanager
+def pool_and_cache_disabled():
+    """Como POOL_HIGH_WATERMARK=0 y RESULT_CACHE_SIZE=0, sobre los objetos ya creados."""
+    pool, cache = main.PROBLEM_POOL, main.RESULT_CACHE
+    saved = pool.low_watermark, pool.high_watermark, cache.maxsize
+    pool.low_watermark = pool.high_watermark = cache.maxsize = 0
+    for qid in list(main.BANK.questions):
+        pool.invalidate(qid)
+        cache.invalidate_question(qid)
+    try:
+        yield
+    finally:
+        pool.low_watermark, pool.high_watermark, cache.maxsize = saved
+
+
+def bench_http(question_ids: List[str], samples: int, repeat: int) -> Dict[str, Any]:
+    """
+    Camino completo vía cliente ASGI en proceso. "unpooled" mide el trabajo
+    real (sin pool ni cache); "pooled" la configuración de producción, que
+    depende de cuánto alcanzó a rellenar el pool y no entra en el gate.
+    """
+    with pool_and_cache_disabled():
+        unpooled = _bench_http_run(question_ids, samples, repeat)
+    return {"unpooled": unpooled, "pooled": _bench_http_run(question_ids, samples, repeat)}
+
+
+def _bench_http_run(question_ids: List[str], samples: int, repeat: int) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+
+    out: Dict[str, Any] = {"generate_problem": {}}
+    with TestClient(main.app) as client:
+
+        def post(path: str, body: Dict[str, Any]):
+            r = client.post(path, json=body)
+            if r.status_code != 200:
+                raise RuntimeError(f"{path} -> {r.status_code}: {r.text[:200]}")
+
+        for qid in question_ids:
+            out["generate_problem"][qid] = safe_measure(
+                lambda _: post("/generate-problem", {"id": qid, "mode": "repaso"}), range(samples), repeat
+            )
+        out["generate_test"] = safe_measure(
+            lambda _: post("/generate-test", {"num_questions": 10}), range(samples), repeat
+        )
+    return out
+
+
+# ---------------------------------------------------------
+# COMPARACIÓN CONTRA BASELINE
+# ---------------------------------------------------------
+
+# Partes del reporte que no se comparan contra el baseline
+NOT_GATED = {"worst_case_params", "pooled"}
+
+
+def flatten(node: Any, prefix: str = "") -> Dict[str, float]:
+    """{"a/b/c": mean_us} para todas las mediciones del reporte."""
+    flat: Dict[str, float] = {}
+    if isinstance(node, dict):
+        if "mean_us" in node:
+            flat[prefix] = node["mean_us"]
+            return flat
+        for k, v in node.items():
+            if k in NOT_GATED:
+                continue
+            flat.update(flatten(v, f"{prefix}/{k}" if prefix else k))
+    return flat
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    cur = flatten(current["benchmarks"])
+    base = flatten(baseline["benchmarks"])
+    regressions = []
+    for name, before in sorted(base.items()):
+        after = cur.get(name)
+        if after is None or before <= 0:
+            continue
+        ratio = after / before
+        if ratio > 1 + threshold:
+            regressions.append({
+                "name": name,
+                "baseline_us": before,
+                "current_us": after,
+                "ratio": round(ratio, 3),
+            })
+    return regressions
+
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    questions = main.BANK.questions
+    ids = args.questions or list(questions)
+    unknown = [qid for qid in ids if qid not in questions]
+    if unknown:
+        raise SystemExit(f"Preguntas desconocidas: {', '.join(unknown)}")
+
+    benchmarks: Dict[str, Any] = {"questions": {}}
+    for qid in ids:
+        benchmarks["questions"][qid] = bench_question(questions[qid], args.samples, args.repeat)
+        print(f"  {qid}", file=sys.stderr)
+
+    if not args.skip_http:
+        benchmarks["http"] = bench_http(ids, args.http_samples, args.repeat)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "samples": args.samples,
+            "repeat": args.repeat,
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de evaluación y render de preguntas.")
+    parser.add_argument("--output", "-o", help="Archivo JSON de salida (por defecto stdout).")
+    parser.add_argument("--baseline", "-b", help="JSON de una corrida anterior para comparar.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Regresión si current > baseline * (1 + threshold). Default 0.2.")
+    parser.add_argument("--questions", nargs="*", help="Ids a medir (por defecto todas).")
+    parser.add_argument("--samples", type=int, default=200, help="Juegos de parámetros por medición.")
+    parser.add_argument("--http-samples", type=int, default=50, help="Requests por endpoint HTTP.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones (se reporta la mejor).")
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--skip-http", action="store_true", help="No medir los endpoints.")
+    return parser.parse_args(argv)
+
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        report["regressions"] = regressions
+        for reg in regressions:
+            print(
+                f"REGRESIÓN {reg['name']}: {reg['baseline_us']} us -> {reg['current_us']} us (x{reg['ratio']})",
+                file=sys.stderr,
+            )
+        status = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,294 @@
+# tools/loadtest.py
+#
+# Prueba de carga local que reproduce los requests de la colección Bruno.
+#
+# Uso (desde backend/):
+#   python -m tools.loadtest --in-process --concurrency 32 --duration 20
+#   python -m tools.loadtest --base-url http://127.0.0.1:8000 \
+#       --mix gen_problem=3,gen_test=1 --question-ids binomial_1=2,normal_1,hiper_1
+#
+# Cada .bru aporta método, URL y body; --question-ids reemplaza el "id" del
+# body de /generate-problem según la mezcla pedida.
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
+
+DEFAULT_COLLECTION = Path(__file__).resolve().parent.parent / "bruno_collection" / "probs_collection"
+HTTP_METHODS = ("get", "post", "put", "patch", "delete")
+
+
+# ---------------------------------------------------------
+# PARSER .bru
+# ---------------------------------------------------------
+
+@dataclass
+class BruRequest:
+    name: str
+    method: str
+    path: str
+    body: Optional[Any] = None
+
+
+def _bru_blocks(text: str) -> Dict[str, List[str]]:
+    """Bloques de primer nivel `nombre { ... }` -> líneas internas."""
+    blocks: Dict[str, List[str]] = {}
+    current: Optional[str] = None
+    for line in text.splitlines():
+        stripped = line.rstrip()
+        if current is None:
+            if stripped.endswith("{") and not line.startswith((" ", "\t")):
+                current = stripped[:-1].strip()
+                blocks[current] = []
+        elif stripped == "}":
+            current = None
+        else:
+            blocks[current].append(line)
+    return blocks
+
+
+def _bru_dict(lines: List[str]) -> Dict[str, str]:
+    out = {}
+    for line in lines:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            out[key.strip()] = value.strip()
+    return out
+
+
+def parse_bru(path: Path) -> BruRequest:
+    blocks = _bru_blocks(path.read_text(encoding="utf-8"))
+
+    method = next((m for m in HTTP_METHODS if m in blocks), None)
+    if method is None:
+        raise ValueError(f"{path.name}: no tiene bloque get/post/...")
+
+    fields = _bru_dict(blocks[method])
+    name = _bru_dict(blocks.get("meta", [])).get("name", path.stem)
+
+    body = None
+    if "body:json" in blocks:
+        raw = "\n".join(blocks["body:json"]).strip()
+        body = json.loads(raw) if raw else None
+
+    return BruRequest(name=name, method=method.upper(), path=urlsplit(fields["url"]).path, body=body)
+
+
+def load_collection(directory: Path) -> Dict[str, BruRequest]:
+    requests = [parse_bru(p) for p in sorted(directory.glob("*.bru"))]
+    if not requests:
+        raise SystemExit(f"No hay archivos .bru en {directory}")
+    return {r.name: r for r in requests}
+
+
+# ---------------------------------------------------------
+# MEZCLAS (nombre=peso,...)
+# ---------------------------------------------------------
+
+def parse_mix(spec: Optional[str]) -> List[Tuple[str, float]]:
+    """'a=3,b,c=0.5' -> [('a', 3.0), ('b', 1.0), ('c', 0.5)]"""
+    if not spec:
+        return []
+    mix = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, weight = item.partition("=")
+        mix.append((name.strip(), float(weight) if weight else 1.0))
+    return mix
+
+
+class WeightedChoice:
+    def __init__(self, mix: List[Tuple[str, float]], rng: random.Random):
+        self.names = [n for n, _ in mix]
+        self.weights = [w for _, w in mix]
+        self.rng = rng
+
+    def __call__(self) -> str:
+        return self.rng.choices(self.names, weights=self.weights)[0]
+
+
+# ---------------------------------------------------------
+# EJECUCIÓN
+# ---------------------------------------------------------
+
+@dataclass
+class EndpointStats:
+    latencies_ms: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def record(self, elapsed_ms: float, status: Optional[int]):
+        self.latencies_ms.append(elapsed_ms)
+        if status is None:
+            self.errors += 1
+        else:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status >= 500:
+                self.errors += 1
+
+    def summary(self, wall_s: float) -> Dict[str, Any]:
+        lat = np.asarray(self.latencies_ms, dtype=float)
+        if lat.size == 0:
+            return {"requests": 0}
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        return {
+            "requests": int(lat.size),
+            "throughput_rps": round(lat.size / wall_s, 1),
+            "errors": self.errors,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "mean_ms": round(float(lat.mean()), 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(lat.max()), 3),
+        }
+
+
+def build_body(req: BruRequest, pick_question: Optional[WeightedChoice]) -> Optional[Any]:
+    if pick_question is not None and isinstance(req.body, dict) and "id" in req.body:
+        return {**req.body, "id": pick_question()}
+    return req.body
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    requests: Dict[str, BruRequest],
+    pick_request: WeightedChoice,
+    pick_question: Optional[WeightedChoice],
+    deadline: float,
+    stats: Dict[str, EndpointStats],
+):
+    while time.perf_counter() < deadline:
+        req = requests[pick_request()]
+        body = build_body(req, pick_question)
+        start = time.perf_counter()
+        try:
+            resp = await client.request(req.method, req.path, json=body)
+            status = resp.status_code
+        except httpx.HTTPError:
+            status = None
+        stats[req.name].record((time.perf_counter() - start) * 1000, status)
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    requests: Dict[str, BruRequest],
+    mix: List[Tuple[str, float]],
+    question_mix: List[Tuple[str, float]],
+    concurrency: int,
+    duration: float,
+    seed: int,
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    pick_request = WeightedChoice(mix, rng)
+    pick_question = WeightedChoice(question_mix, rng) if question_mix else None
+    stats = {name: EndpointStats() for name, _ in mix}
+
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*[
+        worker(client, requests, pick_request, pick_question, deadline, stats)
+        for _ in range(concurrency)
+    ])
+    wall_s = time.perf_counter() - start
+
+    total = sum(len(s.latencies_ms) for s in stats.values())
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(wall_s, 3),
+        "total_requests": total,
+        "throughput_rps": round(total / wall_s, 1),
+        "endpoints": {
+            name: {"method": requests[name].method, "path": requests[name].path, **s.summary(wall_s)}
+            for name, s in stats.items()
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    requests = load_collection(Path(args.collection))
+
+    mix = parse_mix(args.mix) or [(name, 1.0) for name in requests]
+    unknown = [name for name, _ in mix if name not in requests]
+    if unknown:
+        raise SystemExit(f"Requests desconocidos en --mix: {', '.join(unknown)} (hay: {', '.join(requests)})")
+    question_mix = parse_mix(args.question_ids)
+
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    if args.in_process:
+        import main
+
+        # ASGITransport no ejecuta el lifespan: se abre a mano (pool, watcher)
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+                return await run_load(client, requests, mix, question_mix, args.concurrency, args.duration, args.seed)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        return await run_load(client, requests, mix, question_mix, args.concurrency, args.duration, args.seed)
+
+
+def print_table(report: Dict[str, Any]):
+    print(
+        f"{report['total_requests']} requests en {report['duration_s']} s "
+        f"({report['throughput_rps']} req/s, concurrencia {report['concurrency']})",
+        file=sys.stderr,
+    )
+    print(f"{'endpoint':<14}{'reqs':>8}{'req/s':>10}{'err':>6}{'p50':>10}{'p95':>10}{'p99':>10}", file=sys.stderr)
+    for name, s in report["endpoints"].items():
+        if not s.get("requests"):
+            print(f"{name:<14}{0:>8}", file=sys.stderr)
+            continue
+        print(
+            f"{name:<14}{s['requests']:>8}{s['throughput_rps']:>10}{s['errors']:>6}"
+            f"{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}",
+            file=sys.stderr,
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Prueba de carga con los requests de la colección Bruno.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", default="http://127.0.0.1:8000", help="Servidor uvicorn a probar.")
+    target.add_argument("--in-process", action="store_true", help="Usar la app ASGI en este proceso.")
+    parser.add_argument("--collection", default=str(DEFAULT_COLLECTION), help="Directorio con los .bru.")
+    parser.add_argument("--concurrency", "-c", type=int, default=16)
+    parser.add_argument("--duration", "-d", type=float, default=10.0, help="Segundos de carga.")
+    parser.add_argument("--mix", help="Pesos por request Bruno, p.ej. gen_problem=3,gen_test=1.")
+    parser.add_argument("--question-ids", help="Mezcla de ids para /generate-problem, p.ej. binomial_1=2,hiper_1.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por request (s).")
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--output", "-o", help="Archivo JSON de salida (por defecto stdout).")
+    return parser.parse_args(argv)
+
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    print_table(report)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,122 @@
+# tools/montecarlo_check.py
+#
+# Verificación cruzada Monte Carlo de todas las respuestas analíticas.
+#
+# Uso (desde backend/):
+#   python -m tools.montecarlo_check
+#   python -m tools.montecarlo_check --draws 4000000 --param-sets 5 --questions binomial_1 hiper_1
+#
+# Para cada pregunta genera parámetros como /generate-problem, simula el
+# modelo del enunciado con NumPy y compara contra raw_numeric. Termina con
+# código 1 si alguna comparación falla (útil antes de publicar cambios en
+# questions.json).
+
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from utils.monte_carlo import check_question_worker
+from utils.question_bank import QuestionBank, default_questions_path
+
+
+def generate_param_sets(bank: QuestionBank, ids: List[str], count: int) -> Dict[str, List[Dict[str, Any]]]:
+    # Import diferido: main levanta la app completa, solo se necesita aquí
+    from main import generate_params_for_question
+
+    return {
+        qid: [generate_params_for_question(bank.questions[qid]) for _ in range(count)]
+        for qid in ids
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    random.seed(args.seed)
+
+    bank = QuestionBank(args.questions_path or default_questions_path())
+    bank.reload(strict=True)
+
+    ids = args.questions or list(bank.questions)
+    unknown = [qid for qid in ids if qid not in bank.questions]
+    if unknown:
+        raise SystemExit(f"Preguntas desconocidas: {', '.join(unknown)}")
+
+    param_sets = generate_param_sets(bank, ids, args.param_sets)
+
+    start = time.perf_counter()
+    checks: List[Dict[str, Any]] = []
+    with ProcessPoolExecutor(
+        max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures = [
+            pool.submit(
+                check_question_worker,
+                bank.questions[qid].model_dump(),
+                param_sets[qid],
+                args.draws,
+                [args.seed, i],
+                args.z,
+            )
+            for i, qid in enumerate(ids)
+        ]
+        for f in futures:
+            checks.extend(f.result())
+
+    counts: Dict[str, int] = {}
+    for c in checks:
+        counts[c["status"]] = counts.get(c["status"], 0) + 1
+
+    return {
+        "draws": args.draws,
+        "param_sets": args.param_sets,
+        "z": args.z,
+        "seed": args.seed,
+        "duration_s": round(time.perf_counter() - start, 3),
+        "summary": counts,
+        "checks": checks,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Verificación Monte Carlo de expression_symbolic.")
+    parser.add_argument("--questions-path", help="questions.json o directorio (default: el del backend).")
+    parser.add_argument("--questions", nargs="*", help="Ids a verificar (por defecto todas).")
+    parser.add_argument("--draws", type=int, default=2_000_000, help="Simulaciones por juego de parámetros.")
+    parser.add_argument("--param-sets", type=int, default=3, help="Juegos de parámetros por pregunta.")
+    parser.add_argument("--z", type=float, default=5.0, help="Cota de confianza en errores estándar.")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: núcleos).")
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--output", "-o", help="Archivo JSON de salida (por defecto stdout).")
+    return parser.parse_args(argv)
+
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+
+    for c in report["checks"]:
+        if c["status"] in ("fail", "error"):
+            print(
+                f"{c['status'].upper()} {c['question_id']}/{c['result_id']}: analítico={c['analytic']} "
+                f"MC={c['estimate']} (z={c['z_score']}) {c['detail'] or ''} params={c['params']}",
+                file=sys.stderr,
+            )
+    print(f"{report['summary']} en {report['duration_s']} s", file=sys.stderr)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    failed = report["summary"].get("fail", 0) + report["summary"].get("error", 0)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
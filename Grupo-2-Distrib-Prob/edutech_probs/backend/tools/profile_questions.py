@@ -0,0 +1,124 @@
+# tools/profile_questions.py
+#
+# Perfil del banco de preguntas antes de publicar cambios en questions.json.
+#
+# Uso (desde backend/):
+#   python -m tools.profile_questions
+#   python -m tools.profile_questions --questions hiper_1 binomial_1 --samples 500 --max-ms 5
+#   python -m tools.profile_questions --degenerate --strict
+#
+# Para cada pregunta barre las esquinas de sus ParamConfig, el punto medio
+# y una muestra del interior (ver utils/param_sweep.py), mide
+# render_math_result en cada punto y reporta la peor latencia y los params
+# que dan inf, NaN, OverflowError, ZeroDivisionError u otro error.
+# Termina con código 1 si algún punto dentro de rango falla o supera
+# --max-ms (con --strict también cuentan los degenerados): sirve como
+# chequeo previo al deploy. Las latencias con varios workers compiten por
+# CPU; para medir tiempos finos usar --workers 1.
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from utils.param_sweep import profile_question_worker
+from utils.question_bank import QuestionBank, default_questions_path
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    bank = QuestionBank(args.questions_path or default_questions_path())
+    bank.reload(strict=True)
+
+    ids = args.questions or list(bank.questions)
+    unknown = [qid for qid in ids if qid not in bank.questions]
+    if unknown:
+        raise SystemExit(f"Preguntas desconocidas: {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures = [
+            pool.submit(
+                profile_question_worker,
+                bank.questions[qid].model_dump(),
+                args.max_corners,
+                args.samples,
+                [args.seed, i],
+                args.degenerate,
+                args.repeat,
+                args.max_failures,
+            )
+            for i, qid in enumerate(ids)
+        ]
+        questions = [f.result() for f in futures]
+
+    gate: List[str] = []
+    for p in questions:
+        for key, count in p["failure_counts"].items():
+            if args.strict or not key.startswith("degenerate:"):
+                gate.append(f"{p['question_id']}: {count} resultados {key}")
+        if args.max_ms is not None and p["worst"]["ms"] > args.max_ms:
+            gate.append(f"{p['question_id']}: peor latencia {p['worst']['ms']} ms > {args.max_ms} ms")
+
+    questions.sort(key=lambda p: p["worst"]["ms"], reverse=True)
+    return {
+        "samples": args.samples,
+        "max_corners": args.max_corners,
+        "degenerate": args.degenerate,
+        "seed": args.seed,
+        "max_ms": args.max_ms,
+        "duration_s": round(time.perf_counter() - start, 3),
+        "passed": not gate,
+        "gate": gate,
+        "questions": questions,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Barrido de parámetros: latencia y errores numéricos por pregunta.")
+    parser.add_argument("--questions-path", help="questions.json o directorio (default: el del backend).")
+    parser.add_argument("--questions", nargs="*", help="Ids a perfilar (por defecto todas).")
+    parser.add_argument("--samples", type=int, default=200, help="Puntos del interior por pregunta.")
+    parser.add_argument("--max-corners", type=int, default=256, help="Máximo de esquinas (al azar si hay más).")
+    parser.add_argument("--degenerate", action="store_true", help="Probar también params en 0/1 fuera de rango.")
+    parser.add_argument("--strict", action="store_true", help="Las fallas en puntos degenerados también fallan.")
+    parser.add_argument("--max-ms", type=float, default=None, help="Falla si algún punto tarda más (ms).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por punto (se toma la mejor).")
+    parser.add_argument("--max-failures", type=int, default=20, help="Fallas listadas por pregunta.")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: núcleos).")
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--output", "-o", help="Archivo JSON de salida (por defecto stdout).")
+    return parser.parse_args(argv)
+
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+
+    for p in report["questions"]:
+        worst = p["worst"]
+        print(
+            f"{p['question_id']:<20} peor={worst['ms']:.3f} ms ({worst['point']}) p50={p['p50_ms']:.3f} ms "
+            f"{p['failure_counts'] or ''}",
+            file=sys.stderr,
+        )
+    for line in report["gate"]:
+        print(f"FAIL {line}", file=sys.stderr)
+    print(f"{'OK' if report['passed'] else 'FAIL'} en {report['duration_s']} s", file=sys.stderr)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
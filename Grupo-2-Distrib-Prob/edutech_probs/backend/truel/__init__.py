@@ -0,0 +1,13 @@
+# truel/__init__.py
+
+from .engine import (
+    PLAYERS,
+    STRATEGIES,
+    TURN_MODES,
+    TruelParams,
+    TruelSimulator,
+    TruelStats,
+    simulate_games,
+    split_games,
+)
+from .markov import solve_exact
@@ -0,0 +1,349 @@
+# truel/engine.py
+#
+# Port vectorizado de SimuladorDef/engine.js (createGameState / stepGame /
+# chooseTarget): simula muchas partidas a la vez con arreglos NumPy.
+#
+# Semántica idéntica al motor JS:
+# - Cada paso consume un turno, aunque el tirador esté muerto (modo fixed)
+#   o decida no disparar.
+# - "strongest"/"weakest" desempatan por el primero en orden A, B, C.
+# - El disparo forzado se usa una sola vez: el primer turno del tirador
+#   forzado en que el objetivo forzado sigue vivo.
+# - Si se llega a max_turns sin ganador, la partida termina sin ganador.
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+PLAYERS: Tuple[str, ...] = ("A", "B", "C")
+STRATEGIES: Tuple[str, ...] = ("strongest", "weakest", "random", "skip")
+TURN_MODES: Tuple[str, ...] = ("fixed", "random")
+
+NO_TARGET = -1
+RANDOM_TARGET = -2
+
+# Tamaño de bloque por defecto al repartir partidas entre procesos
+DEFAULT_CHUNK = 250_000
+
+# Tope de max_turns: acota el bucle por turnos de simulate_games
+MAX_TURNS_LIMIT = 10_000
+
+
+@dataclass(frozen=True)
+class TruelParams:
+    """Configuración de una partida (índices 0..2 = A, B, C). Es picklable."""
+    probs: Tuple[float, float, float]
+    strategies: Tuple[str, str, str]
+    turn_mode: str = "fixed"
+    fixed_order: Tuple[int, int, int] = (0, 1, 2)
+    max_turns: int = 1000
+    forced_shooter: Optional[int] = None
+    forced_target: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, cfg: Any) -> "TruelParams":
+        """
+        Desde un objeto con los campos de TruelConfig (letras A/B/C).
+        Lanza ValueError si la configuración no es válida.
+        """
+        idx = {p: i for i, p in enumerate(PLAYERS)}
+
+        missing = [p for p in PLAYERS if p not in cfg.probs or p not in cfg.strategies]
+        if missing:
+            raise ValueError(f"Faltan probs/strategies para: {', '.join(missing)}")
+        if any(not 0.0 <= cfg.probs[p] <= 1.0 for p in PLAYERS):
+            raise ValueError("Las probabilidades deben estar en [0, 1].")
+        if any(cfg.strategies[p] not in STRATEGIES for p in PLAYERS):
+            raise ValueError(f"Estrategias válidas: {', '.join(STRATEGIES)}")
+        if cfg.turn_mode not in TURN_MODES:
+            raise ValueError(f"turn_mode debe ser uno de: {', '.join(TURN_MODES)}")
+
+        # Igual que createGameState: un fixedOrder inválido cae a A, B, C
+        order = tuple(cfg.fixed_order or ())
+        if sorted(order) != sorted(PLAYERS):
+            order = PLAYERS
+
+        forced_shooter = forced_target = None
+        if cfg.forced_shooter:
+            if not cfg.forced_target or cfg.forced_target == cfg.forced_shooter:
+                raise ValueError("forced_target debe ser un jugador distinto de forced_shooter.")
+            forced_shooter, forced_target = idx[cfg.forced_shooter], idx[cfg.forced_target]
+
+        if not 1 <= cfg.max_turns <= MAX_TURNS_LIMIT:
+            raise ValueError(f"max_turns debe estar entre 1 y {MAX_TURNS_LIMIT}.")
+
+        return cls(
+            probs=tuple(float(cfg.probs[p]) for p in PLAYERS),
+            strategies=tuple(cfg.strategies[p] for p in PLAYERS),
+            turn_mode=cfg.turn_mode,
+            fixed_order=tuple(idx[p] for p in order),
+            max_turns=int(cfg.max_turns),
+            forced_shooter=forced_shooter,
+            forced_target=forced_target,
+        )
+
+
+# ---------------------------------------------------------
+# TABLAS DE OBJETIVOS (tirador x conjunto de vivos)
+# ---------------------------------------------------------
+# Conjunto de vivos como máscara de bits: A=1, B=2, C=4 (8 combinaciones).
+
+def enemies_of(shooter: int, mask: int) -> List[int]:
+    return [e for e in range(3) if e != shooter and mask & (1 << e)]
+
+
+def choose_target(shooter: int, mask: int, probs: Tuple[float, ...], strategy: str) -> int:
+    """chooseTarget de engine.js; RANDOM_TARGET si el objetivo es al azar."""
+    enemies = enemies_of(shooter, mask)
+    if not enemies:
+        return NO_TARGET
+    if strategy == "strongest":
+        best = enemies[0]
+        for e in enemies:
+            if probs[e] > probs[best]:
+                best = e
+        return best
+    if strategy == "weakest":
+        worst = enemies[0]
+        for e in enemies:
+            if probs[e] < probs[worst]:
+                worst = e
+        return worst
+    if strategy == "skip":
+        return NO_TARGET
+    return RANDOM_TARGET
+
+
+def build_target_tables(params: TruelParams) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    target[s, mask]   : objetivo fijo, NO_TARGET o RANDOM_TARGET
+    enemies[s, mask]  : hasta 2 enemigos vivos (para objetivos al azar)
+    n_enemies[s, mask]: cuántos hay
+    """
+    target = np.full((3, 8), NO_TARGET, dtype=np.int8)
+    enemies = np.zeros((3, 8, 2), dtype=np.int8)
+    n_enemies = np.zeros((3, 8), dtype=np.int8)
+    for s in range(3):
+        for mask in range(8):
+            es = enemies_of(s, mask)
+            n_enemies[s, mask] = len(es)
+            enemies[s, mask, :len(es)] = es
+            target[s, mask] = choose_target(s, mask, params.probs, params.strategies[s])
+    return target, enemies, n_enemies
+
+
+def build_can_fire_table(target: np.ndarray) -> np.ndarray:
+    """can_fire[mask]: algún vivo tiene objetivo. Si no, la partida no termina nunca."""
+    can_fire = np.zeros(8, dtype=bool)
+    for mask in range(8):
+        can_fire[mask] = any(mask & (1 << s) and target[s, mask] != NO_TARGET for s in range(3))
+    return can_fire
+
+
+# ---------------------------------------------------------
+# SIMULACIÓN VECTORIZADA
+# ---------------------------------------------------------
+
+@dataclass
+class TruelStats:
+    num_games: int = 0
+    wins: np.ndarray = field(default_factory=lambda: np.zeros(3, dtype=np.int64))
+    no_winner: int = 0
+    # turn_counts[t] = partidas que terminaron en el turno t (0 sin usar)
+    turn_counts: np.ndarray = field(default_factory=lambda: np.zeros(1, dtype=np.int64))
+
+    def merge(self, other: "TruelStats") -> "TruelStats":
+        size = max(self.turn_counts.size, other.turn_counts.size)
+        turns = np.zeros(size, dtype=np.int64)
+        turns[:self.turn_counts.size] += self.turn_counts
+        turns[:other.turn_counts.size] += other.turn_counts
+        return TruelStats(
+            num_games=self.num_games + other.num_games,
+            wins=self.wins + other.wins,
+            no_winner=self.no_winner + other.no_winner,
+            turn_counts=turns,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        n = max(self.num_games, 1)
+        finished = np.nonzero(self.turn_counts)[0]
+        n_finished = int(self.turn_counts.sum())
+        total_turns = int((np.arange(self.turn_counts.size) * self.turn_counts).sum())
+        return {
+            "num_games": self.num_games,
+            "wins": {p: int(w) for p, w in zip(PLAYERS, self.wins)},
+            "win_frequencies": {p: round(int(w) / n, 6) for p, w in zip(PLAYERS, self.wins)},
+            "no_winner": self.no_winner,
+            "no_winner_frequency": round(self.no_winner / n, 6),
+            # Solo partidas con ganador (las cortadas por max_turns van en no_winner)
+            "mean_turns": round(total_turns / n_finished, 4) if n_finished else None,
+            "turn_distribution": {
+                "turns": finished.tolist(),
+                "counts": self.turn_counts[finished].tolist(),
+            },
+        }
+
+
+def simulate_games(params: TruelParams, num_games: int, seed: Optional[Any] = None) -> TruelStats:
+    """Simula num_games partidas independientes en paralelo (vectorizado)."""
+    rng = np.random.default_rng(seed)
+    target_tbl, enemies_tbl, n_enemies_tbl = build_target_tables(params)
+    can_fire_tbl = build_can_fire_table(target_tbl)
+    probs = np.asarray(params.probs, dtype=float)
+    bits = np.array([1, 2, 4], dtype=np.int8)
+
+    # Estado de las partidas aún activas (se compacta al terminar partidas)
+    alive = np.full(num_games, 7, dtype=np.int8)
+    forced_done = np.zeros(num_games, dtype=bool)
+
+    wins = np.zeros(3, dtype=np.int64)
+    # (turno, partidas con ganador); el histograma se arma al final con el
+    # tamaño del turno más largo observado, no de max_turns
+    finished: List[Tuple[int, int]] = []
+
+    for turn in range(1, params.max_turns + 1):
+        if alive.size == 0:
+            break
+        n = alive.size
+
+        # 1. tirador
+        if params.turn_mode == "fixed":
+            s = params.fixed_order[(turn - 1) % 3]
+            shooter = np.full(n, s, dtype=np.int8)
+            can_shoot = (alive & bits[s]) != 0
+        else:
+            # choice(alive): uniforme entre los vivos
+            n_alive = (alive & 1) + ((alive >> 1) & 1) + ((alive >> 2) & 1)
+            k = (rng.random(n) * n_alive).astype(np.int8)
+            first = np.where(alive & 1, 0, np.where(alive & 2, 1, 2)).astype(np.int8)
+            rest = alive & ~bits[first]
+            second = np.where(rest & 1, 0, np.where(rest & 2, 1, 2)).astype(np.int8)
+            third = np.int8(2)
+            shooter = np.where(k == 0, first, np.where(k == 1, second, third)).astype(np.int8)
+            can_shoot = np.ones(n, dtype=bool)
+
+        # 2. objetivo según estrategia
+        target = target_tbl[shooter, alive]
+        is_random = target == RANDOM_TARGET
+        if is_random.any():
+            pick = (rng.random(n) * n_enemies_tbl[shooter, alive]).astype(np.int8)
+            target = np.where(is_random, enemies_tbl[shooter, alive, np.minimum(pick, 1)], target)
+
+        # 3. disparo forzado (una sola vez)
+        if params.forced_shooter is not None:
+            forced_now = (
+                ~forced_done
+                & (shooter == params.forced_shooter)
+                & ((alive & bits[params.forced_target]) != 0)
+                & can_shoot
+            )
+            target = np.where(forced_now, params.forced_target, target)
+            forced_done |= forced_now
+
+        # 4. resolución del disparo
+        shoots = can_shoot & (target >= 0)
+        hit = shoots & (rng.random(n) < probs[shooter])
+        if hit.any():
+            alive = np.where(hit, alive & ~bits[np.maximum(target, 0)], alive).astype(np.int8)
+
+        # 5. partidas terminadas en este turno
+        done = (alive & (alive - 1)) == 0  # a lo sumo un bit encendido
+        # Partidas trabadas (nadie vivo dispara nunca): terminarían por
+        # max_turns sin ganador, así que se descartan ya
+        stuck = ~done & ~can_fire_tbl[alive]
+        if params.forced_shooter is not None:
+            stuck &= forced_done | ((alive & bits[params.forced_shooter]) == 0) | (
+                (alive & bits[params.forced_target]) == 0
+            )
+        if done.any() or stuck.any():
+            winners = alive[done]
+            for p in range(3):
+                wins[p] += int(np.count_nonzero(winners == bits[p]))
+            n_done = int(np.count_nonzero(done))
+            if n_done:
+                finished.append((turn, n_done))
+            keep = ~(done | stuck)
+            alive = alive[keep]
+            forced_done = forced_done[keep]
+
+    turn_counts = np.zeros(finished[-1][0] + 1 if finished else 1, dtype=np.int64)
+    for turn, n_done in finished:
+        turn_counts[turn] = n_done
+
+    return TruelStats(
+        num_games=num_games,
+        wins=wins,
+        no_winner=num_games - int(wins.sum()),
+        turn_counts=turn_counts,
+    )
+
+
+def split_games(num_games: int, chunk: int = DEFAULT_CHUNK) -> List[int]:
+    """Reparte num_games en bloques de a lo más `chunk` partidas."""
+    sizes = [chunk] * (num_games // chunk)
+    if num_games % chunk:
+        sizes.append(num_games % chunk)
+    return sizes
+
+
+def _simulate_chunk(params: TruelParams, num_games: int, seed: np.random.SeedSequence) -> TruelStats:
+    return simulate_games(params, num_games, seed)
+
+
+# ---------------------------------------------------------
+# EJECUCIÓN EN PARALELO (varios núcleos)
+# ---------------------------------------------------------
+
+class TruelSimulator:
+    """
+    Reparte las partidas en bloques entre procesos (ProcessPoolExecutor con
+    spawn, creado a demanda). Corridas chicas se simulan en un hilo, sin
+    pagar el costo de levantar el pool.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, chunk: int = DEFAULT_CHUNK, inline_threshold: int = 50_000):
+        self.max_workers = max_workers
+        self.chunk = chunk
+        self.inline_threshold = inline_threshold
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    async def simulate(self, params: TruelParams, num_games: int, seed: Optional[int] = None) -> TruelStats:
+        root = np.random.SeedSequence(seed)
+
+        if num_games <= self.inline_threshold:
+            return await asyncio.to_thread(simulate_games, params, num_games, root)
+
+        sizes = split_games(num_games, self.chunk)
+        loop = asyncio.get_running_loop()
+        pool = self.get_pool()
+        parts = await asyncio.gather(*[
+            loop.run_in_executor(pool, _simulate_chunk, params, size, child)
+            for size, child in zip(sizes, root.spawn(len(sizes)))
+        ])
+
+        stats = TruelStats()
+        for part in parts:
+            stats = stats.merge(part)
+        return stats
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
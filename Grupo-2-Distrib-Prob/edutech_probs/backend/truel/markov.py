@@ -0,0 +1,267 @@
+# truel/markov.py
+#
+# Solución exacta del truel como cadena de Markov absorbente.
+#
+# Estado transitorio: (vivos, posición en fixed_order, disparo forzado pendiente).
+# En modo "random" la posición no existe (se guarda -1) y el tirador se
+# elige uniformemente entre los vivos en cada transición.
+# Estados absorbentes: gana A, gana B, gana C.
+#
+# La ESTRUCTURA de la cadena (estados y qué transición depende de qué
+# probabilidad) solo depende de las estrategias, el modo de turnos y el
+# orden de objetivos (ranking de probs), así que se cachea; por consulta
+# solo se recalculan los pesos y se resuelve (I - Q) X = R.
+#
+# Diferencia con el simulador: no se aplica el tope max_turns. Los estados
+# desde los que nadie puede ganar (todos "skip", p = 0, ...) se tratan como
+# "sin ganador", que es lo que el tope produce en la simulación.
+
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from truel.engine import NO_TARGET, PLAYERS, RANDOM_TARGET, TruelParams, choose_target, enemies_of
+
+State = Tuple[int, int, bool]  # (máscara de vivos, índice en fixed_order o -1, forzado pendiente)
+
+# Índice de "probabilidad" para transiciones que no dependen de un disparo
+NO_SHOOTER = 3
+
+
+@dataclass(frozen=True)
+class ChainStructure:
+    """
+    Transiciones como listas paralelas: P[row, col] += const + coef * p[shooter].
+    Las columnas >= n_transient son absorbentes (n_transient + ganador).
+    """
+    states: Tuple[State, ...]
+    rows: np.ndarray
+    cols: np.ndarray
+    const: np.ndarray
+    coef: np.ndarray
+    shooter: np.ndarray
+
+    @property
+    def n_transient(self) -> int:
+        return len(self.states)
+
+    @property
+    def flat_index(self) -> np.ndarray:
+        return self.rows * (self.n_transient + 3) + self.cols
+
+
+def _single_alive(mask: int) -> Optional[int]:
+    return {1: 0, 2: 1, 4: 2}.get(mask)
+
+
+@lru_cache(maxsize=256)
+def build_structure(
+    turn_mode: str,
+    fixed_order: Tuple[int, int, int],
+    forced: Optional[Tuple[int, int]],
+    targets: Tuple[Tuple[int, ...], ...],
+) -> ChainStructure:
+    """
+    Recorre los estados alcanzables desde el inicial.
+    `targets[s][mask]` es choose_target para cada tirador y conjunto de vivos.
+    """
+    start: State = (7, 0 if turn_mode == "fixed" else -1, forced is not None)
+    index: Dict[State, int] = {start: 0}
+    queue: List[State] = [start]
+    edges: List[Tuple[int, State, float, float, int]] = []  # (from, to, const, coef, shooter)
+
+    def add_shot(i: int, mask: int, nxt: int, pending: bool, s: int, t: int, w: float):
+        edges.append((i, (mask & ~(1 << t), nxt, pending), 0.0, w, s))
+        edges.append((i, (mask, nxt, pending), w, -w, s))
+
+    while queue:
+        state = queue.pop()
+        mask, pos, pending = state
+        i = index[state]
+        first_edge = len(edges)
+
+        if turn_mode == "fixed":
+            shooters = [(fixed_order[pos], 1.0)]
+            nxt = (pos + 1) % 3
+        else:
+            alive = [s for s in range(3) if mask & (1 << s)]
+            shooters = [(s, 1.0 / len(alive)) for s in alive]
+            nxt = -1
+
+        for s, w in shooters:
+            if not mask & (1 << s):
+                # Tirador muerto (modo fixed): pierde el turno
+                edges.append((i, (mask, nxt, pending), w, 0.0, NO_SHOOTER))
+                continue
+
+            if pending and s == forced[0] and mask & (1 << forced[1]):
+                add_shot(i, mask, nxt, False, s, forced[1], w)
+                continue
+
+            t = targets[s][mask]
+            if t == NO_TARGET:
+                edges.append((i, (mask, nxt, pending), w, 0.0, NO_SHOOTER))
+            elif t == RANDOM_TARGET:
+                enemies = enemies_of(s, mask)
+                for e in enemies:
+                    add_shot(i, mask, nxt, pending, s, e, w / len(enemies))
+            else:
+                add_shot(i, mask, nxt, pending, s, t, w)
+
+        for _, to, *_ in edges[first_edge:]:
+            if _single_alive(to[0]) is None and to not in index:
+                index[to] = len(index)
+                queue.append(to)
+
+    n = len(index)
+
+    def col(to: State) -> int:
+        winner = _single_alive(to[0])
+        return n + winner if winner is not None else index[to]
+
+    states = tuple(sorted(index, key=index.get))
+    return ChainStructure(
+        states=states,
+        rows=np.array([e[0] for e in edges], dtype=np.int64),
+        cols=np.array([col(e[1]) for e in edges], dtype=np.int64),
+        const=np.array([e[2] for e in edges], dtype=float),
+        coef=np.array([e[3] for e in edges], dtype=float),
+        shooter=np.array([e[4] for e in edges], dtype=np.int64),
+    )
+
+
+def structure_for(params: TruelParams) -> ChainStructure:
+    targets = tuple(
+        tuple(choose_target(s, mask, params.probs, params.strategies[s]) for mask in range(8))
+        for s in range(3)
+    )
+    forced = None
+    if params.forced_shooter is not None:
+        forced = (params.forced_shooter, params.forced_target)
+    fixed_order = params.fixed_order if params.turn_mode == "fixed" else (0, 1, 2)
+    return build_structure(params.turn_mode, fixed_order, forced, targets)
+
+
+# ---------------------------------------------------------
+# SOLUCIÓN
+# ---------------------------------------------------------
+
+def _can_win(Q: np.ndarray, R: np.ndarray) -> np.ndarray:
+    """Estados transitorios desde los que se alcanza algún ganador."""
+    live = R.sum(axis=1) > 0
+    reach = Q > 0
+    while True:
+        grown = live | reach[:, live].any(axis=1)
+        if (grown == live).all():
+            return live
+        live = grown
+
+
+def solve_exact(params: TruelParams) -> Dict[str, Any]:
+    """
+    Probabilidades exactas de victoria y turnos esperados (condicionados a
+    que haya ganador) resolviendo la cadena absorbente.
+    """
+    chain = structure_for(params)
+    n = chain.n_transient
+
+    p = np.append(np.asarray(params.probs, dtype=float), 0.0)
+    weights = chain.const + chain.coef * p[chain.shooter]
+
+    P = np.bincount(chain.flat_index, weights=weights, minlength=n * (n + 3)).reshape(n, n + 3)
+    Q, R = P[:, :n], P[:, n:]
+
+    live = _can_win(Q, R)
+    win = np.zeros(3)
+    mean_turns = None
+
+    if live[0]:
+        # Restringido a estados "vivos": lo que sale hacia estados trabados
+        # es probabilidad de terminar sin ganador
+        if not live.all():
+            Q, R = Q[np.ix_(live, live)], R[live]
+        A = np.eye(Q.shape[0]) - Q
+        B = np.linalg.solve(A, R)  # prob. de absorción en cada ganador
+        # E[T · 1{hay ganador}] = N · b, con N = (I - Q)^-1 (visitas esperadas)
+        b = B.sum(axis=1)
+        t = np.linalg.solve(A, b)
+
+        # El estado inicial es el índice 0 (y el primero de los vivos)
+        win = np.clip(B[0], 0.0, 1.0)
+        if b[0] > 0:
+            mean_turns = float(t[0] / b[0])
+
+    return {
+        "win_probabilities": {pl: float(w) for pl, w in zip(PLAYERS, win)},
+        "no_winner_probability": float(max(0.0, 1.0 - win.sum())),
+        "mean_turns": mean_turns,
+        "num_states": n,
+    }
+
+
+# ---------------------------------------------------------
+# SOLUCIÓN EN LOTE (muchas ternas de probs, mismas estrategias)
+# ---------------------------------------------------------
+
+def _ranking_key(probs: np.ndarray) -> np.ndarray:
+    """
+    Los objetivos de strongest/weakest solo dependen del signo de pA-pB,
+    pA-pC y pB-pC: 27 patrones posibles, cada uno con su estructura.
+    """
+    s = np.sign(probs[:, [0, 0, 1]] - probs[:, [1, 2, 2]]).astype(np.int64) + 1
+    return s[:, 0] * 9 + s[:, 1] * 3 + s[:, 2]
+
+
+def solve_exact_batch(base: TruelParams, probs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    solve_exact para cada fila de probs (G x 3) con las estrategias y modo
+    de `base`. Retorna (win G x 3, mean_turns G; NaN si no hay ganador).
+    Agrupa por estructura y resuelve cada grupo con un solo solve apilado.
+    """
+    probs = np.asarray(probs, dtype=float)
+    win = np.zeros((len(probs), 3))
+    mean_turns = np.full(len(probs), np.nan)
+
+    keys = _ranking_key(probs)
+    for key in np.unique(keys):
+        idx = np.flatnonzero(keys == key)
+        rep = replace(base, probs=tuple(float(x) for x in probs[idx[0]]))
+        chain = structure_for(rep)
+        n = chain.n_transient
+
+        # Matriz de dispersión aristas -> celdas de P (aristas repetidas se suman)
+        scatter = np.zeros((len(chain.rows), n * (n + 3)))
+        scatter[np.arange(len(chain.rows)), chain.flat_index] = 1.0
+
+        p_ext = np.hstack([probs[idx], np.zeros((len(idx), 1))])
+        weights = chain.const + chain.coef * p_ext[:, chain.shooter]
+        P = (weights @ scatter).reshape(len(idx), n, n + 3)
+        Q, R = P[:, :, :n], P[:, :, n:]
+
+        # Puntos con estados trabados (p = 0, skip): camino escalar
+        live = R.sum(axis=2) > 0
+        reach = Q > 0
+        while True:
+            grown = live | (reach & live[:, None, :]).any(axis=2)
+            if (grown == live).all():
+                break
+            live = grown
+        ok = live.all(axis=1)
+
+        if ok.any():
+            A = np.eye(n) - Q[ok]
+            B = np.linalg.solve(A, R[ok])
+            b = B.sum(axis=2)
+            t = np.linalg.solve(A, b[..., None])[..., 0]
+            win[idx[ok]] = np.clip(B[:, 0, :], 0.0, 1.0)
+            mean_turns[idx[ok]] = t[:, 0] / b[:, 0]
+
+        for i in idx[~ok]:
+            res = solve_exact(replace(base, probs=tuple(float(x) for x in probs[i])))
+            win[i] = [res["win_probabilities"][pl] for pl in PLAYERS]
+            if res["mean_turns"] is not None:
+                mean_turns[i] = res["mean_turns"]
+
+    return win, mean_turns
@@ -0,0 +1,256 @@
+# truel/sweep.py
+#
+# Barrido de (pA, pB, pC) x perfiles de estrategia para mapas de calor.
+#
+# Cada perfil se resuelve de forma exacta (solve_exact_batch) en bloques de
+# planos p_a (a lo sumo CHUNK_POINTS puntos, para acotar la memoria de cada
+# worker), un bloque por tarea del pool. El resultado se guarda en disco con
+# una clave derivada de la especificación del barrido: los arreglos (.npz) y
+# la respuesta JSON ya serializada (.json), así que repetir el mismo mapa de
+# calor no recalcula ni re-serializa nada. El directorio se acota por tamaño
+# (se borran los archivos usados hace más tiempo).
+
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+from concurrent.futures import Executor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from truel.engine import STRATEGIES, TruelParams
+from truel.markov import solve_exact_batch
+
+# Subir si cambia el formato guardado o la semántica del solver
+CACHE_VERSION = 1
+
+# Puntos por tarea del pool (~0.5 KB de memoria por punto en solve_exact_batch)
+CHUNK_POINTS = 65_536
+
+Profile = Tuple[str, str, str]
+ALL_PROFILES: Tuple[Profile, ...] = tuple(itertools.product(STRATEGIES, repeat=3))
+
+
+@dataclass(frozen=True)
+class SweepSpec:
+    p_a: Tuple[float, ...]
+    p_b: Tuple[float, ...]
+    p_c: Tuple[float, ...]
+    profiles: Tuple[Profile, ...]
+    turn_mode: str = "fixed"
+    fixed_order: Tuple[int, int, int] = (0, 1, 2)
+    forced_shooter: Optional[int] = None
+    forced_target: Optional[int] = None
+
+    @property
+    def shape(self) -> Tuple[int, int, int, int]:
+        return len(self.profiles), len(self.p_a), len(self.p_b), len(self.p_c)
+
+    def key(self) -> str:
+        canonical = json.dumps({"v": CACHE_VERSION, **asdict(self)}, sort_keys=True)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def base_params(self, profile: Profile) -> TruelParams:
+        return TruelParams(
+            probs=(0.5, 0.5, 0.5),
+            strategies=profile,
+            turn_mode=self.turn_mode,
+            fixed_order=self.fixed_order,
+            forced_shooter=self.forced_shooter,
+            forced_target=self.forced_target,
+        )
+
+
+def axis_values(start: float, stop: float, num: int) -> Tuple[float, ...]:
+    """linspace redondeado (claves de cache estables ante ruido de float)."""
+    return tuple(round(float(x), 10) for x in np.linspace(start, stop, num))
+
+
+# ---------------------------------------------------------
+# CÁLCULO (corre en el proceso worker)
+# ---------------------------------------------------------
+
+def sweep_chunk(spec: SweepSpec, profile: Profile, a_start: int, a_stop: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(win k x nb x nc x 3, mean_turns k x nb x nc) para p_a[a_start:a_stop] de un perfil."""
+    p_a = spec.p_a[a_start:a_stop]
+    grid = np.stack(np.meshgrid(p_a, spec.p_b, spec.p_c, indexing="ij"), axis=-1).reshape(-1, 3)
+    win, mean_turns = solve_exact_batch(spec.base_params(profile), grid)
+    _, _, nb, nc = spec.shape
+    return win.reshape(len(p_a), nb, nc, 3), mean_turns.reshape(len(p_a), nb, nc)
+
+
+def chunk_bounds(spec: SweepSpec, chunk_points: int = CHUNK_POINTS) -> List[Tuple[int, int]]:
+    """Rangos [a_start, a_stop) de planos p_a con a lo sumo chunk_points puntos (mínimo un plano)."""
+    _, na, nb, nc = spec.shape
+    rows = max(1, chunk_points // (nb * nc))
+    return [(a, min(a + rows, na)) for a in range(0, na, rows)]
+
+
+def sweep_payload(spec: SweepSpec, arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """
+    Respuesta compacta: arreglos planos en orden C con
+    shape = [perfiles, len(p_a), len(p_b), len(p_c)].
+    """
+    win = arrays["win"]
+    winner = np.where(win.sum(axis=-1) > 0, win.argmax(axis=-1), -1)
+    mean_turns = np.round(arrays["mean_turns"], 4).ravel().tolist()
+    return {
+        "key": spec.key(),
+        "shape": list(spec.shape),
+        "axes": {"p_a": list(spec.p_a), "p_b": list(spec.p_b), "p_c": list(spec.p_c)},
+        "profiles": ["/".join(p) for p in spec.profiles],
+        "win_probabilities": {
+            pl: np.round(win[..., i], 6).ravel().tolist() for i, pl in enumerate(("A", "B", "C"))
+        },
+        "winner": winner.ravel().tolist(),
+        "mean_turns": [None if t != t else t for t in mean_turns],
+    }
+
+
+# ---------------------------------------------------------
+# CACHE EN DISCO
+# ---------------------------------------------------------
+
+class SweepCache:
+    """
+    Por barrido: <key>.npz (arreglos) y <key>.json (respuesta serializada).
+    Escritura atómica (tmp + os.replace): un lector nunca ve archivos a medias.
+
+    Con `max_bytes`, cada escritura borra los archivos de uso más antiguo
+    hasta que el directorio entre en el límite. Un acierto actualiza el
+    mtime del archivo (atime no es confiable con relatime/noatime).
+    """
+
+    def __init__(self, directory: Path, max_bytes: Optional[int] = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.directory / f"{key}{suffix}"
+
+    def _write(self, path: Path, write):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self._evict(keep=path)
+
+    def _touch(self, path: Path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _evict(self, keep: Path):
+        if self.max_bytes is None:
+            return
+        entries = []
+        for path in self.directory.iterdir():
+            if path.suffix not in (".npz", ".json") or path == keep:
+                continue
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        try:
+            total += keep.stat().st_size
+        except FileNotFoundError:
+            pass
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        path = self._path(key, ".npz")
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                arrays = {k: data[k] for k in data.files}
+        except (OSError, ValueError):
+            return None  # archivo corrupto/incompleto (o borrado): se recalcula
+        self._touch(path)
+        return arrays
+
+    def put(self, key: str, arrays: Dict[str, np.ndarray]):
+        self._write(self._path(key, ".npz"), lambda f: np.savez_compressed(f, **arrays))
+
+    def get_body(self, key: str) -> Optional[bytes]:
+        path = self._path(key, ".json")
+        try:
+            body = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        self._touch(path)
+        return body
+
+    def put_body(self, key: str, body: bytes):
+        self._write(self._path(key, ".json"), lambda f: f.write(body))
+
+
+def default_cache_dir() -> Path:
+    """TRUEL_SWEEP_CACHE_DIR o .cache/truel_sweeps junto a main.py."""
+    env = os.getenv("TRUEL_SWEEP_CACHE_DIR")
+    if env:
+        return Path(env)
+    return Path(__file__).resolve().parent.parent / ".cache" / "truel_sweeps"
+
+
+async def run_sweep(spec: SweepSpec, executor: Executor, cache: SweepCache) -> Tuple[bytes, str]:
+    """
+    Retorna (cuerpo JSON, estado de cache): "hit" (respuesta ya serializada),
+    "arrays" (solo los arreglos estaban guardados) o "miss".
+    Sin cache, cada bloque de cada perfil es una tarea del pool.
+    """
+    key = spec.key()
+    body = await asyncio.to_thread(cache.get_body, key)
+    if body is not None:
+        return body, "hit"
+
+    arrays = await asyncio.to_thread(cache.get, key)
+    if arrays is not None:
+        body = await asyncio.to_thread(_serialize, spec, arrays)
+        await asyncio.to_thread(cache.put_body, key, body)
+        return body, "arrays"
+
+    loop = asyncio.get_running_loop()
+    bounds = chunk_bounds(spec)
+    parts = await asyncio.gather(*[
+        loop.run_in_executor(executor, sweep_chunk, spec, profile, a_start, a_stop)
+        for profile in spec.profiles
+        for a_start, a_stop in bounds
+    ])
+
+    # parts en orden (perfil, bloque): se concatenan los bloques de cada perfil
+    per_profile = [parts[i:i + len(bounds)] for i in range(0, len(parts), len(bounds))]
+    arrays = {
+        "win": np.stack([np.concatenate([w for w, _ in chunks]) for chunks in per_profile]),
+        "mean_turns": np.stack([np.concatenate([t for _, t in chunks]) for chunks in per_profile]),
+    }
+    await asyncio.to_thread(cache.put, key, arrays)
+    body = await asyncio.to_thread(_serialize, spec, arrays)
+    await asyncio.to_thread(cache.put_body, key, body)
+    return body, "miss"
+
+
+def _serialize(spec: SweepSpec, arrays: Dict[str, np.ndarray]) -> bytes:
+    return json.dumps(sweep_payload(spec, arrays), separators=(",", ":")).encode("utf-8")
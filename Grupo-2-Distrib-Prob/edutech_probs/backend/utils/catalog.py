@@ -0,0 +1,79 @@
+# utils/catalog.py
+#
+# Respuestas del catálogo (/questions, /questions/{qid}, /topics) ya
+# serializadas a bytes, con su ETag fuerte. Se construyen una vez por carga
+# del banco; las preguntas sin cambios reutilizan su respuesta anterior.
+
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+import orjson
+from fastapi.responses import Response
+
+from models.question_models import QuestionDefinition
+
+
+def dumps(data: Any) -> bytes:
+    return orjson.dumps(data)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str  # fuerte, con comillas: "<hash>"
+
+    @classmethod
+    def of(cls, data: Any) -> "CachedResponse":
+        body = dumps(data)
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+@dataclass(frozen=True)
+class Catalog:
+    questions: CachedResponse
+    topics: CachedResponse
+    by_id: Dict[str, CachedResponse]
+    hashes: Dict[str, str]
+
+    @classmethod
+    def build(
+        cls,
+        questions: Dict[str, QuestionDefinition],
+        hashes: Dict[str, str],
+        topics: Iterable[str],
+        previous: Optional["Catalog"] = None,
+    ) -> "Catalog":
+        by_id: Dict[str, CachedResponse] = {}
+        for qid, q in questions.items():
+            if previous is not None and previous.hashes.get(qid) == hashes.get(qid) and qid in previous.by_id:
+                by_id[qid] = previous.by_id[qid]
+            else:
+                by_id[qid] = CachedResponse.of(q.model_dump())
+
+        return cls(
+            questions=CachedResponse.of([
+                {"id": qid, "topic": q.topic, "doc_url": q.doc_url} for qid, q in questions.items()
+            ]),
+            topics=CachedResponse.of({"topics": list(topics)}),
+            by_id=by_id,
+            hashes=dict(hashes),
+        )
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match usa comparación débil: W/"x" coincide con "x"."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def cached_json_response(cached: CachedResponse, if_none_match: Optional[str], cache_control: str) -> Response:
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control}
+    if _etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
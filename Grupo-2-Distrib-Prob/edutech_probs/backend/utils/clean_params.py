@@ -1,93 +1,219 @@
 # utils/clean_params.py
-
-from typing import Dict, Union
-from models.question_models import QuestionDefinition, ParamConfig
+#
+# Limpieza de parámetros (sobre todo de params_override enviados por el
+# cliente). Las reglas que aplican a cada pregunta se deciden UNA vez, al
+# cargar el banco, a partir de su definición:
+#
+# - "simplex" declarado    -> se normalizan esos params para que sumen `total`
+# - "order" declarado      -> se ordenan esos params (no decreciente)
+# - "max"/"min": "<param>" -> se acota contra el otro param
+# - params en POSITIVE_PARAMS -> valor absoluto
+# - type int/float del JSON + redondeo de floats (siempre)
+#
+# Cada request solo corre los pasos de su plan, sin recorrer nombres.
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+from models.question_models import QuestionDefinition
 
 Number = Union[int, float]
 
+# Parámetros que deben ser positivos siempre (escala, tasa, tiempo)
+POSITIVE_PARAMS = ("alpha", "desviacion_horas", "tasa", "anos")
 
-def _normalize_probs(params: Dict[str, Number], prefix: str):
-    """Normaliza probabilidades con prefijos p_, p1, p2, etc."""
-    keys = [k for k in params if k.startswith(prefix)]
-    if len(keys) >= 2:
-        total = sum(params[k] for k in keys)
-        if total > 0:
-            for k in keys:
-                params[k] = params[k] / total
-    return params
+# Decimales del redondeo final de floats
+FLOAT_DECIMALS = 5
 
 
-def _fix_min_max_pair(params: Dict[str, Number], a: str, b: str):
-    """Garantiza params[a] <= params[b] si ambos existen."""
-    if a in params and b in params and params[a] > params[b]:
-        params[a], params[b] = params[b], params[a]
-    return params
+# ---------------------------------------------------------
+# REGLAS (cada una en versión escalar y en columnas)
+# ---------------------------------------------------------
 
+@dataclass(frozen=True)
+class _Normalize:
+    keys: Tuple[str, ...]
+    total: float
 
-def clean_params_for_question(q: QuestionDefinition, params: Dict[str, Number]) -> Dict[str, Number]:
+    def describe(self) -> str:
+        return f"simplex({', '.join(self.keys)})"
+
+    def apply(self, params: Dict[str, Number]):
+        if not all(k in params for k in self.keys):
+            return
+        s = sum(params[k] for k in self.keys)
+        if s > 0:
+            for k in self.keys:
+                params[k] = params[k] / s * self.total
+
+    def apply_columns(self, columns: Dict[str, np.ndarray]):
+        if not all(k in columns for k in self.keys):
+            return
+        s = sum(columns[k] for k in self.keys)
+        ok = s > 0
+        safe = np.where(ok, s, 1.0)
+        for k in self.keys:
+            columns[k] = np.where(ok, columns[k] / safe * self.total, columns[k])
+
+
+@dataclass(frozen=True)
+class _Order:
+    keys: Tuple[str, ...]
+
+    def describe(self) -> str:
+        return f"order({' <= '.join(self.keys)})"
+
+    def apply(self, params: Dict[str, Number]):
+        if all(k in params for k in self.keys):
+            for k, v in zip(self.keys, sorted(params[k] for k in self.keys)):
+                params[k] = v
+
+    def apply_columns(self, columns: Dict[str, np.ndarray]):
+        if all(k in columns for k in self.keys):
+            ordered = np.sort(np.stack([columns[k] for k in self.keys]), axis=0)
+            for k, col in zip(self.keys, ordered):
+                columns[k] = col
+
+
+@dataclass(frozen=True)
+class _Clamp:
+    """key <= ref (upper=True) o key >= ref (upper=False)."""
+    key: str
+    ref: str
+    upper: bool
+
+    def describe(self) -> str:
+        return f"clamp({self.key} {'<=' if self.upper else '>='} {self.ref})"
+
+    def apply(self, params: Dict[str, Number]):
+        if self.key in params and self.ref in params:
+            bound = min if self.upper else max
+            params[self.key] = bound(params[self.key], params[self.ref])
+
+    def apply_columns(self, columns: Dict[str, np.ndarray]):
+        if self.key in columns and self.ref in columns:
+            bound = np.minimum if self.upper else np.maximum
+            columns[self.key] = bound(columns[self.key], columns[self.ref])
+
+
+@dataclass(frozen=True)
+class _Positive:
+    keys: Tuple[str, ...]
+
+    def describe(self) -> str:
+        return f"abs({', '.join(self.keys)})"
+
+    def apply(self, params: Dict[str, Number]):
+        for k in self.keys:
+            if k in params and params[k] < 0:
+                params[k] = abs(params[k])
+
+    def apply_columns(self, columns: Dict[str, np.ndarray]):
+        for k in self.keys:
+            if k in columns:
+                columns[k] = np.abs(columns[k])
+
+
+# ---------------------------------------------------------
+# PLAN COMPILADO POR PREGUNTA
+# ---------------------------------------------------------
+
+@dataclass(frozen=True)
+class CleaningPlan:
+    question_id: str
+    steps: Tuple[Union[_Normalize, _Order, _Clamp, _Positive], ...]
+    int_params: frozenset
+    float_params: frozenset
+
+    @property
+    def rules(self) -> List[str]:
+        return [s.describe() for s in self.steps]
+
+    def apply(self, params: Dict[str, Number]) -> Dict[str, Number]:
+        params = dict(params)
+        for step in self.steps:
+            step.apply(params)
+
+        # Type (int / float) definido en el JSON + redondeo final de floats
+        cleaned: Dict[str, Number] = {}
+        for name, value in params.items():
+            if name in self.int_params:
+                value = int(round(value))
+            elif name in self.float_params:
+                value = float(value)
+            if isinstance(value, float):
+                value = round(value, FLOAT_DECIMALS)
+            cleaned[name] = value
+        return cleaned
+
+    def apply_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        columns = {k: np.asarray(v) for k, v in columns.items()}
+        for step in self.steps:
+            step.apply_columns(columns)
+
+        cleaned: Dict[str, np.ndarray] = {}
+        for name, col in columns.items():
+            if name in self.int_params:
+                cleaned[name] = np.rint(col.astype(float)).astype(np.int64)
+            elif name in self.float_params or np.issubdtype(col.dtype, np.floating):
+                cleaned[name] = np.round(col.astype(float), FLOAT_DECIMALS)
+            else:
+                cleaned[name] = col
+        return cleaned
+
+
+def compile_cleaning_plan(q: QuestionDefinition) -> CleaningPlan:
+    steps: List[Union[_Normalize, _Order, _Clamp, _Positive]] = []
+
+    # 1. Restricciones declaradas (simplex antes que order, como antes)
+    for c in q.constraints:
+        if c.type == "simplex":
+            steps.append(_Normalize(tuple(c.params), c.total))
+    for c in q.constraints:
+        if c.type == "order":
+            steps.append(_Order(tuple(c.params)))
+
+    # 2. Límites que referencian otro param ("max": "n_muestra")
+    for name, cfg in q.params.items():
+        if isinstance(cfg.max, str) and cfg.max in q.params:
+            steps.append(_Clamp(name, cfg.max, upper=True))
+        if isinstance(cfg.min, str) and cfg.min in q.params:
+            steps.append(_Clamp(name, cfg.min, upper=False))
+
+    # 3. Positivos
+    positive = tuple(k for k in POSITIVE_PARAMS if k in q.params)
+    if positive:
+        steps.append(_Positive(positive))
+
+    return CleaningPlan(
+        question_id=q.id,
+        steps=tuple(steps),
+        int_params=frozenset(n for n, cfg in q.params.items() if cfg.type == "int"),
+        float_params=frozenset(n for n, cfg in q.params.items() if cfg.type != "int"),
+    )
+
+
+def cleaning_report(plans: Dict[str, CleaningPlan]) -> Dict[str, List[str]]:
+    """Tipo de regla -> ids de pregunta donde aplica ("type" = solo cast/redondeo)."""
+    report: Dict[str, List[str]] = {}
+    for qid, plan in plans.items():
+        kinds = dict.fromkeys(rule.split("(", 1)[0] for rule in plan.rules) or ["type"]
+        for kind in kinds:
+            report.setdefault(kind, []).append(qid)
+    return report
+
+
+# ---------------------------------------------------------
+# API: la etapa "clean_params_for_question" de /metrics
+# ---------------------------------------------------------
+
+def clean_params_for_question(
+    q: QuestionDefinition, params: Dict[str, Number], plan: CleaningPlan = None
+) -> Dict[str, Number]:
     """
-    Limpia y normaliza parámetros generados según la definición de la pregunta.
-    - Normaliza probabilidades
-    - Asegura relaciones lógicas
-    - Corrige límites dependientes
-    - Aplica type=int/float definido en el JSON
+    Limpia y normaliza parámetros según la definición de la pregunta
+    (restricciones declaradas, límites dependientes, positivos y type).
+    Sin `plan` lo compila al vuelo; main.py pasa el del snapshot.
     """
-    # =====================================================
-    # 1. NORMALIZACIÓN AUTOMÁTICA (probabilidades múltiples)
-    # =====================================================
-    
-    # Caso p_0, p_1, p_2 (resistores)
-    _normalize_probs(params, prefix="p_")
-
-    # Caso p1, p2, p3... (multinomial)
-    _normalize_probs(params, prefix="p")
-
-    # =====================================================
-    # 2. FIXES ESPECÍFICOS POR NOMBRE DE PARÁMETRO
-    # =====================================================
-
-    # Normal batería: garantizar t_min <= t_max
-    _fix_min_max_pair(params, "t_min", "t_max")
-
-    # Defectuosos: límites <= n_muestra
-    if {"n_muestra", "k_excede", "k_menor"} <= params.keys():
-        n = params["n_muestra"]
-        params["k_excede"] = min(params["k_excede"], n)
-        params["k_menor"] = min(params["k_menor"], n)
-
-    # Torneo: k_min <= n_partidos
-    if {"n_partidos", "k_min"} <= params.keys():
-        params["k_min"] = min(params["k_min"], params["n_partidos"])
-
-    # Variables que deben ser positivas siempre
-    for key in ["alpha", "desviacion_horas", "tasa", "anos"]:
-        if key in params and params[key] < 0:
-            params[key] = abs(params[key])
-
-    # =====================================================
-    # 3. APLICAR TYPE (int / float) DEFINIDO EN EL JSON
-    # =====================================================
-
-    cleaned: Dict[str, Number] = {}
-
-    for name, value in params.items():
-        if name not in q.params:
-            cleaned[name] = value
-            continue
-
-        cfg: ParamConfig = q.params[name]
-
-        if cfg.type == "int":
-            cleaned[name] = int(round(value))
-        else:
-            cleaned[name] = float(value)
-
-    # =====================================================
-    # 4. REDONDEO FINAL PARA FLOATS (solo si corresponde)
-    # =====================================================
-
-    for name, value in cleaned.items():
-        if isinstance(value, float):
-            cleaned[name] = round(value, 5)
-
-    return cleaned
\ No newline at end of file
+    return (plan or compile_cleaning_plan(q)).apply(params)
\ No newline at end of file
@@ -0,0 +1,177 @@
+# utils/distributions.py
+
+"""
+Kernels de distribuciones para expression_symbolic.
+
+Todos aceptan escalares o arreglos NumPy (se usan tanto en el modo escalar
+de utils/render.py como en el modo batch de utils/vectorized.py) y están
+respaldados por scipy.special / scipy.stats o por log-gamma, así que el
+costo no depende de n y no hay overflow para n grandes.
+
+Colas binomiales: bdtr/bdtrc (cephes) son rápidas pero pierden precisión
+cerca de la media para n grandes (scipy 1.11: n=1e7, k=5e6-1 da 0.4985 en
+vez de 0.49987). Por encima de BDTR_MAX_N se usa scipy.stats.binom (Boost
+ibeta), ~40x más lenta por llamada escalar pero exacta.
+"""
+
+import numpy as np
+from scipy import special, stats
+
+# Hasta este n el error de bdtr/bdtrc es < 1e-10 (medido en mu ± 4 sigma)
+BDTR_MAX_N = 100_000
+
+
+def _out(value):
+    """Escalar -> float de Python; arreglo -> ndarray."""
+    value = np.asarray(value, dtype=float)
+    return float(value) if value.ndim == 0 else value
+
+
+def _as_int(n):
+    # bdtr/bdtrc solo aceptan n entero (loop 'dld' de scipy)
+    return np.rint(np.asarray(n, dtype=float)).astype(np.int64)
+
+
+# ---------------------------------------------------------
+# BINOMIAL  X ~ Bin(n, p)
+# ---------------------------------------------------------
+
+def binom_logpmf(k, n, p):
+    k, n, p = np.asarray(k, dtype=float), np.asarray(n, dtype=float), np.asarray(p, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logpmf = (
+            special.gammaln(n + 1) - special.gammaln(k + 1) - special.gammaln(n - k + 1)
+            + special.xlogy(k, p) + special.xlog1py(n - k, -p)
+        )
+    return _out(np.where((k < 0) | (k > n), -np.inf, logpmf))
+
+
+def binom_pmf(k, n, p):
+    """P(X = k)"""
+    return _out(np.exp(binom_logpmf(k, n, p)))
+
+
+def _binom_tail(k, n, p, fast, accurate):
+    """fast (bdtr/bdtrc) para n <= BDTR_MAX_N, accurate (stats.binom) para el resto."""
+    k, n, p = np.broadcast_arrays(np.clip(k, 0, n), n, np.asarray(p, dtype=float))
+    inner = np.array(fast(k, n, p), dtype=float)
+    big = n > BDTR_MAX_N
+    if big.any():
+        inner[big] = accurate(k[big], n[big], p[big])
+    return inner
+
+
+def binom_cdf(k, n, p):
+    """P(X <= k)"""
+    k, n = np.floor(np.asarray(k, dtype=float)), _as_int(n)
+    inner = _binom_tail(k, n, p, special.bdtr, stats.binom.cdf)
+    return _out(np.where(k < 0, 0.0, np.where(k >= n, 1.0, inner)))
+
+
+def binom_sf(k, n, p):
+    """P(X > k)"""
+    k, n = np.floor(np.asarray(k, dtype=float)), _as_int(n)
+    inner = _binom_tail(k, n, p, special.bdtrc, stats.binom.sf)
+    return _out(np.where(k < 0, 1.0, np.where(k >= n, 0.0, inner)))
+
+
+# ---------------------------------------------------------
+# POISSON  X ~ Poisson(lam)
+# ---------------------------------------------------------
+
+def poisson_pmf(k, lam):
+    """P(X = k)"""
+    k, lam = np.asarray(k, dtype=float), np.asarray(lam, dtype=float)
+    logpmf = special.xlogy(k, lam) - lam - special.gammaln(k + 1)
+    return _out(np.where(k < 0, 0.0, np.exp(logpmf)))
+
+
+def poisson_cdf(k, lam):
+    """P(X <= k)"""
+    k = np.floor(np.asarray(k, dtype=float))
+    return _out(np.where(k < 0, 0.0, special.pdtr(np.maximum(k, 0), lam)))
+
+
+def poisson_sf(k, lam):
+    """P(X > k)"""
+    k = np.floor(np.asarray(k, dtype=float))
+    return _out(np.where(k < 0, 1.0, special.pdtrc(np.maximum(k, 0), lam)))
+
+
+# ---------------------------------------------------------
+# HIPERGEOMÉTRICA  X = buenos en una muestra de n, lote N con K buenos
+# ---------------------------------------------------------
+
+def hypergeom_pmf(k, N, K, n):
+    """P(X = k)"""
+    return _out(stats.hypergeom.pmf(k, N, K, n))
+
+
+def hypergeom_cdf(k, N, K, n):
+    """P(X <= k)"""
+    return _out(stats.hypergeom.cdf(k, N, K, n))
+
+
+def hypergeom_sf(k, N, K, n):
+    """P(X > k)"""
+    return _out(stats.hypergeom.sf(k, N, K, n))
+
+
+def hypergeom_mean(N, K, n):
+    return _out(np.asarray(n, dtype=float) * K / N)
+
+
+def hypergeom_var(N, K, n):
+    N, K, n = np.asarray(N, dtype=float), np.asarray(K, dtype=float), np.asarray(n, dtype=float)
+    p = K / N
+    return _out(n * p * (1 - p) * (N - n) / (N - 1))
+
+
+# ---------------------------------------------------------
+# CONTINUAS
+# ---------------------------------------------------------
+
+def norm_cdf(x, mu=0.0, sigma=1.0):
+    """P(X <= x), X ~ N(mu, sigma)"""
+    return _out(special.ndtr((np.asarray(x, dtype=float) - mu) / sigma))
+
+
+def norm_sf(x, mu=0.0, sigma=1.0):
+    """P(X > x), X ~ N(mu, sigma). Estable en la cola derecha."""
+    return _out(special.ndtr((mu - np.asarray(x, dtype=float)) / sigma))
+
+
+def expon_cdf(x, rate):
+    """P(T <= x), T ~ Exp(rate)"""
+    return _out(-np.expm1(-np.asarray(rate, dtype=float) * x))
+
+
+def expon_sf(x, rate):
+    """P(T > x), T ~ Exp(rate)"""
+    return _out(np.exp(-np.asarray(rate, dtype=float) * x))
+
+
+def weibull_sf(x, alpha, beta):
+    """P(T > x), T ~ Weibull(escala=alpha, forma=beta)"""
+    return _out(np.exp(-(np.asarray(x, dtype=float) / alpha) ** beta))
+
+
+DISTRIBUTION_FUNCS = {
+    "binom_pmf": binom_pmf,
+    "binom_logpmf": binom_logpmf,
+    "binom_cdf": binom_cdf,
+    "binom_sf": binom_sf,
+    "poisson_pmf": poisson_pmf,
+    "poisson_cdf": poisson_cdf,
+    "poisson_sf": poisson_sf,
+    "hypergeom_pmf": hypergeom_pmf,
+    "hypergeom_cdf": hypergeom_cdf,
+    "hypergeom_sf": hypergeom_sf,
+    "hypergeom_mean": hypergeom_mean,
+    "hypergeom_var": hypergeom_var,
+    "norm_cdf": norm_cdf,
+    "norm_sf": norm_sf,
+    "expon_cdf": expon_cdf,
+    "expon_sf": expon_sf,
+    "weibull_sf": weibull_sf,
+}
@@ -0,0 +1,244 @@
+# utils/executor.py
+
+import asyncio
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from utils.expr_compiler import EvaluationBudgetExceeded
+from utils.metrics import METRICS
+from utils.render import DEFAULT_COST_BUDGET, QuestionTemplates, estimate_question_cost, render_math_result
+
+
+class EvaluationTimeout(Exception):
+    """La evaluación superó el deadline configurado."""
+
+
+class EvaluationUnavailable(Exception):
+    """El proceso de evaluación murió dos veces seguidas (OOM, kill)."""
+
+
+class _WorkerDied(Exception):
+    """El proceso terminó sin devolver resultado."""
+
+
+# ---------------------------------------------------------
+# FUNCIONES QUE CORREN EN EL PROCESO WORKER
+# ---------------------------------------------------------
+
+def _raise_timeout(signum, frame):
+    raise EvaluationTimeout()
+
+
+def render_results(
+    math_defs: List[Dict[str, Any]],
+    params: Dict[str, Any],
+    q: Any = None,
+    budget: Optional[float] = DEFAULT_COST_BUDGET,
+    templates: Optional[QuestionTemplates] = None,
+) -> List[Dict[str, Any]]:
+    """render_math_result para todos los resultados de una pregunta."""
+    return [
+        render_math_result(m, params, q, budget, templates.results.get(m["id"]) if templates else None)
+        for m in math_defs
+    ]
+
+
+def _render_results_worker(conn, math_defs, params, q_dict, timeout, budget, templates):
+    # Deadline dentro del worker: interrumpe bucles Python (sum/range).
+    # Llamadas C largas no se interrumpen; para eso el padre mata el proceso.
+    use_alarm = timeout and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        # Los tiempos por etapa vuelven al padre: el METRICS de este proceso no se exporta
+        with METRICS.capture_stages() as stages:
+            rendered = render_results(math_defs, params, q_dict, budget, templates)
+        conn.send((True, (rendered, stages)))
+    except Exception as e:  # noqa: BLE001 - se re-lanza en el padre
+        conn.send((False, e))
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        conn.close()
+
+
+# ---------------------------------------------------------
+# EXECUTOR
+# ---------------------------------------------------------
+
+class EvaluationExecutor:
+    """
+    Decide dónde evaluar los resultados de una pregunta:
+
+    - Camino rápido (en proceso) para preguntas baratas.
+    - Un proceso propio por evaluación para preguntas "pesadas", detectadas
+      por costo estimado antes de evaluar (>= heavy_cost_units, ver
+      utils/expr_compiler.py) o por costo medido (promedio móvil del tiempo
+      en proceso >= heavy_cost_ms). A lo sumo max_workers a la vez.
+    - Si el costo estimado supera cost_budget se rechaza sin evaluar
+      (EvaluationBudgetExceeded).
+
+    Cada evaluación pesada tiene un deadline; si su proceso no responde a
+    tiempo se mata solo ese proceso, sin tocar las demás evaluaciones en
+    curso. Si el proceso muere sin responder se reintenta una vez.
+
+    Los procesos salen de un forkserver que ya importó este módulo (numpy,
+    scipy y el compilador), así que arrancar uno cuesta milisegundos.
+    El camino rápido (estimación + evaluación en proceso) corre en un hilo
+    para no bloquear el event loop.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        timeout: float = 2.0,
+        heavy_cost_units: float = 50_000,
+        heavy_cost_ms: float = 50.0,
+        cost_budget: Optional[float] = DEFAULT_COST_BUDGET,
+        grace: float = 0.5,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.heavy_cost_units = heavy_cost_units
+        self.heavy_cost_ms = heavy_cost_ms
+        self.cost_budget = cost_budget
+        self.grace = grace
+
+        self._ctx: Any = None
+        self._ctx_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._procs: Set[Any] = set()
+        self._procs_lock = threading.Lock()
+        self._cost_ms: Dict[str, float] = {}
+
+    # -----------------------------------------------------
+    # CLASIFICACIÓN
+    # -----------------------------------------------------
+
+    def is_heavy(self, qid: str, estimated_cost: float) -> bool:
+        if self._cost_ms.get(qid, 0.0) >= self.heavy_cost_ms:
+            return True
+        return estimated_cost >= self.heavy_cost_units
+
+    def _record_cost(self, qid: str, elapsed_ms: float):
+        # Promedio móvil exponencial
+        prev = self._cost_ms.get(qid)
+        self._cost_ms[qid] = elapsed_ms if prev is None else 0.8 * prev + 0.2 * elapsed_ms
+
+    # -----------------------------------------------------
+    # EJECUCIÓN
+    # -----------------------------------------------------
+
+    def _get_context(self) -> Any:
+        with self._ctx_lock:
+            if self._ctx is None:
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    self._ctx = multiprocessing.get_context("forkserver")
+                    self._ctx.set_forkserver_preload([__name__])
+                else:
+                    self._ctx = multiprocessing.get_context("spawn")
+            return self._ctx
+
+    def _run_isolated(self, args: Tuple[Any, ...]) -> Tuple[List[Dict[str, Any]], List[Any]]:
+        """
+        Corre _render_results_worker en un proceso nuevo y espera su
+        respuesta. Al vencer el deadline mata ese proceso (SIGTERM y luego
+        SIGKILL) y lanza EvaluationTimeout.
+        """
+        ctx = self._get_context()
+        with self._slots:
+            reader, writer = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_render_results_worker, args=(writer, *args), daemon=True)
+            proc.start()
+            writer.close()
+            with self._procs_lock:
+                self._procs.add(proc)
+            try:
+                if not reader.poll(self.timeout + self.grace):
+                    raise EvaluationTimeout()
+                try:
+                    ok, payload = reader.recv()
+                except EOFError:
+                    raise _WorkerDied()
+            finally:
+                reader.close()
+                self._reap(proc)
+
+        if not ok:
+            raise payload
+        return payload
+
+    def _reap(self, proc: Any):
+        if proc.is_alive():
+            proc.terminate()
+        proc.join(self.grace)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+        with self._procs_lock:
+            self._procs.discard(proc)
+
+    def _render_inline(
+        self, q: Any, params: Dict[str, Any], templates: Optional[QuestionTemplates]
+    ) -> Tuple[Optional[List[Dict[str, Any]]], List[Dict[str, Any]], Optional[float]]:
+        """
+        Estima el costo y, si la pregunta es barata, la evalúa en este hilo.
+        Retorna (rendered o None si va a un proceso, math_defs, budget para el proceso).
+        """
+        math_defs = [r.model_dump() for r in q.math.results]
+
+        cost = estimate_question_cost(q, params)
+        # inf: una cota depende de una sentencia cara; se decide al ejecutar
+        if self.cost_budget is not None and math.isfinite(cost) and cost > self.cost_budget:
+            raise EvaluationBudgetExceeded(cost, self.cost_budget)
+
+        # Con una estimación finita ya revisada no hace falta re-chequear al evaluar
+        budget = None if math.isfinite(cost) else self.cost_budget
+
+        if self.is_heavy(q.id, cost):
+            return None, math_defs, budget
+
+        start = time.perf_counter()
+        rendered = render_results(math_defs, params, q, budget, templates)
+        self._record_cost(q.id, (time.perf_counter() - start) * 1000)
+        return rendered, math_defs, budget
+
+    async def render(
+        self, q: Any, params: Dict[str, Any], templates: Optional[QuestionTemplates] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Evalúa todos los resultados de q. Lanza EvaluationBudgetExceeded si
+        el costo estimado supera el presupuesto, EvaluationTimeout si una
+        evaluación pesada supera el deadline y EvaluationUnavailable si el
+        proceso muere también en el reintento.
+        """
+        rendered, math_defs, budget = await asyncio.to_thread(self._render_inline, q, params, templates)
+        if rendered is not None:
+            return rendered
+
+        # Solo el id y los tipos de params viajan al worker (suficiente para render_math_result)
+        q_dict = {"id": q.id, "params": {k: {"type": cfg.type} for k, cfg in q.params.items()}}
+        args = (math_defs, params, q_dict, self.timeout, budget, templates)
+
+        for _ in range(2):
+            try:
+                rendered, stages = await asyncio.to_thread(self._run_isolated, args)
+            except _WorkerDied:
+                continue
+            METRICS.record_stages(stages)
+            return rendered
+
+        raise EvaluationUnavailable()
+
+    def shutdown(self):
+        with self._procs_lock:
+            procs = list(self._procs)
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
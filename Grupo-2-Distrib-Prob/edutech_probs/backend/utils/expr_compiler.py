@@ -0,0 +1,611 @@
+# utils/expr_compiler.py
+#
+# Compilador de expression_symbolic a closures de Python.
+#
+# Solo se acepta un subconjunto del AST: números, nombres, aritmética,
+# comparaciones, llamadas a funciones de la lista blanca (sin keywords) y
+# comprehensions con `for x in range(...)`. Atributos, subíndices, lambdas,
+# strings, imports o nombres que empiezan con "_" se rechazan al compilar.
+#
+# Cada nodo compila a dos closures: su valor y su COSTO estimado en
+# unidades (~0.1 µs cada una). El costo solo depende de los params donde
+# hay bucles o aritmética de enteros grandes (range, factorial, comb/binom,
+# int ** int); en el resto es constante y se suma al compilar.
+#
+# Cada sentencia se ejecuta con un closure sobre el code object compilado
+# desde su AST ya validado: los closures por nodo cuestan ~2x más que el
+# bytecode en el camino caliente, así que solo se usan para estimar.
+#
+# Program.run(env, budget) revisa el costo de cada sentencia ANTES de
+# ejecutarla: una evaluación que excede el presupuesto se rechaza sin
+# haber corrido el bucle caro.
+#
+# El AST validado pasa por utils/expr_optimizer.py (plegado de constantes,
+# invariantes) antes de compilarse. Si tiene productos con factorial/comb
+# se compila además su variante en espacio log (Program.log_space): el
+# modo escalar la usa cuando el entero exacto desborda a float.
+
+import ast
+import math
+import operator
+from dataclasses import dataclass, replace
+from types import CodeType
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from utils.expr_optimizer import HOIST_PREFIX, optimize_module
+
+Env = Dict[str, Any]
+Cost = Union[float, Callable[[Env], float]]
+
+# Variable interna con el valor de la última expresión
+RESULT_VAR = "__result__"
+
+# Asignaciones que estimate() evalúa para conocer cotas de bucles posteriores
+ESTIMATE_EVAL_LIMIT = 10_000
+
+# Costo máximo de la variante exacta cuando hay log_space: más allá, el
+# entero exacto (comb(10**7, 5*10**6)) tarda segundos y el resultado es
+# el mismo con lgamma. Se aplica aunque run() no reciba presupuesto.
+EXACT_COST_LIMIT = 50_000
+
+# Builtins permitidos además de las funciones matemáticas
+ITERATION_BUILTINS = ("sum", "min", "max", "abs", "range")
+
+
+class ExpressionError(ValueError):
+    """La expresión usa construcciones fuera de la lista blanca."""
+
+
+class EvaluationBudgetExceeded(Exception):
+    """El costo estimado de la evaluación supera el presupuesto."""
+
+    def __init__(self, cost: float, budget: float):
+        super().__init__(f"costo estimado {cost:.3g} > presupuesto {budget:.3g}")
+        self.cost = cost
+        self.budget = budget
+
+    def __reduce__(self):
+        # Para viajar desde el proceso worker (utils/executor.py)
+        return type(self), (self.cost, self.budget)
+
+
+@dataclass(frozen=True)
+class _Node:
+    value: Callable[[Env], Any]
+    cost: Cost  # float (estático) o closure env -> float
+
+    @property
+    def static(self) -> bool:
+        return not callable(self.cost)
+
+
+def _cost_of(node: _Node, env: Env) -> float:
+    return node.cost(env) if callable(node.cost) else node.cost
+
+
+def _with_extra(base: Cost, extra: Callable[[Env], float]) -> Callable[[Env], float]:
+    if callable(base):
+        return lambda env: base(env) + extra(env)
+    return lambda env: base + extra(env)
+
+
+def _add_costs(base: float, nodes: List[_Node]) -> Cost:
+    static = base + sum(n.cost for n in nodes if n.static)
+    dynamic = [n.cost for n in nodes if not n.static]
+    if not dynamic:
+        return static
+    if len(dynamic) == 1:
+        (c0,) = dynamic
+        return lambda env: static + c0(env)
+    if len(dynamic) == 2:
+        c0, c1 = dynamic
+        return lambda env: static + c0(env) + c1(env)
+    return lambda env: static + sum(c(env) for c in dynamic)
+
+
+# ---------------------------------------------------------
+# MODELOS DE COSTO (enteros grandes)
+# ---------------------------------------------------------
+
+def _bigint_cost(bits: float, power: float, factor: float) -> float:
+    return 1.0 + factor * max(bits / 64.0, 1.0) ** power
+
+
+def _factorial_cost(n: Any) -> float:
+    if type(n) is not int or n < 20:  # 20! cabe en 64 bits
+        return 1.0
+    return _bigint_cost(math.lgamma(n + 1) / math.log(2), 1.6, 0.25)
+
+
+def _comb_cost(n: Any, k: Any) -> float:
+    if type(n) is not int or type(k) is not int or n <= 64 or not 0 < k < n:
+        return 1.0
+    bits = (math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)) / math.log(2)
+    return _bigint_cost(bits, 2.0, 0.6)
+
+
+def _pow_cost(base: Any, exp: Any) -> float:
+    if type(base) is not int or type(exp) is not int or exp <= 1 or -2 < base < 2:
+        return 1.0
+    return _bigint_cost(exp * math.log2(abs(base)), 1.6, 0.25)
+
+
+def _range_cost(*args: Any) -> float:
+    return 1.0 + len(range(*args))
+
+
+_DYNAMIC_CALL_COSTS: Dict[str, Callable[..., float]] = {
+    "factorial": _factorial_cost,
+    "comb": _comb_cost,
+    "binom": _comb_cost,
+    "range": _range_cost,
+}
+
+
+def _guarded(model: Callable[..., float], args: List[_Node]) -> Callable[[Env], float]:
+    """Costo del modelo con los valores de los args; si no se pueden evaluar, la llamada fallará igual."""
+    fns = [a.value for a in args]
+    if len(fns) == 1:
+        (f0,) = fns
+
+        def cost(env: Env) -> float:
+            try:
+                return model(f0(env))
+            except Exception:
+                return 1.0
+    elif len(fns) == 2:
+        f0, f1 = fns
+
+        def cost(env: Env) -> float:
+            try:
+                return model(f0(env), f1(env))
+            except Exception:
+                return 1.0
+    else:
+        def cost(env: Env) -> float:
+            try:
+                return model(*[f(env) for f in fns])
+            except Exception:
+                return 1.0
+    return cost
+
+
+# ---------------------------------------------------------
+# COMPILACIÓN DE NODOS
+# ---------------------------------------------------------
+
+_BINOPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARYOPS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+
+_CMPOPS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+
+class _Compiler:
+    def __init__(self, functions: Dict[str, float], internal: bool = False):
+        # nombre -> costo fijo por llamada (los de _DYNAMIC_CALL_COSTS se suman aparte)
+        self.functions = functions
+        # Árbol ya optimizado: se aceptan las variables __h<i> del optimizador
+        self.internal = internal
+
+    def check_name(self, name: str):
+        if name.startswith("_") and not (self.internal and name.startswith(HOIST_PREFIX)):
+            raise ExpressionError(f"nombre no permitido: {name}")
+
+    def compile(self, node: ast.AST) -> _Node:
+        method = getattr(self, f"_{type(node).__name__}", None)
+        if method is None:
+            raise ExpressionError(f"construcción no permitida: {type(node).__name__}")
+        return method(node)
+
+    def _Constant(self, node: ast.Constant) -> _Node:
+        v = node.value
+        if not isinstance(v, (int, float)):
+            raise ExpressionError(f"constante no permitida: {v!r}")
+        return _Node(lambda env: v, 1.0)
+
+    def _Name(self, node: ast.Name) -> _Node:
+        name = node.id
+        self.check_name(name)
+
+        def value(env: Env) -> Any:
+            try:
+                return env[name]
+            except KeyError:
+                raise NameError(f"name '{name}' is not defined") from None
+
+        return _Node(value, 1.0)
+
+    def _BinOp(self, node: ast.BinOp) -> _Node:
+        op = _BINOPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"operador no permitido: {type(node.op).__name__}")
+        left, right = self.compile(node.left), self.compile(node.right)
+        lv, rv = left.value, right.value
+
+        cost = _add_costs(1.0, [left, right])
+        # Exponente constante (EX**2): sin modelo de enteros grandes
+        small_exp = isinstance(node.right, ast.Constant) and abs(node.right.value) <= 64
+        if op is operator.pow and left.static and right.static and not small_exp:
+            cost = _with_extra(cost, _guarded(_pow_cost, [left, right]))
+
+        return _Node(lambda env: op(lv(env), rv(env)), cost)
+
+    def _UnaryOp(self, node: ast.UnaryOp) -> _Node:
+        op = _UNARYOPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"operador no permitido: {type(node.op).__name__}")
+        operand = self.compile(node.operand)
+        ov = operand.value
+        return _Node(lambda env: op(ov(env)), _add_costs(1.0, [operand]))
+
+    def _Compare(self, node: ast.Compare) -> _Node:
+        ops = [_CMPOPS.get(type(o)) for o in node.ops]
+        if None in ops:
+            raise ExpressionError("comparación no permitida")
+        left = self.compile(node.left)
+        rights = [self.compile(c) for c in node.comparators]
+        lv, rvs = left.value, [r.value for r in rights]
+
+        def value(env: Env) -> Any:
+            a = lv(env)
+            for op, rv in zip(ops, rvs):
+                b = rv(env)
+                if not op(a, b):
+                    return False
+                a = b
+            return True
+
+        return _Node(value, _add_costs(1.0, [left] + rights))
+
+    def _BoolOp(self, node: ast.BoolOp) -> _Node:
+        values = [self.compile(v) for v in node.values]
+        fns = [v.value for v in values]
+        if isinstance(node.op, ast.And):
+            def value(env: Env) -> Any:
+                result = True
+                for f in fns:
+                    result = f(env)
+                    if not result:
+                        return result
+                return result
+        else:
+            def value(env: Env) -> Any:
+                result = False
+                for f in fns:
+                    result = f(env)
+                    if result:
+                        return result
+                return result
+        return _Node(value, _add_costs(1.0, values))
+
+    def _IfExp(self, node: ast.IfExp) -> _Node:
+        test, body, orelse = self.compile(node.test), self.compile(node.body), self.compile(node.orelse)
+        tv, bv, ov = test.value, body.value, orelse.value
+        return _Node(lambda env: bv(env) if tv(env) else ov(env), _add_costs(1.0, [test, body, orelse]))
+
+    def _Call(self, node: ast.Call) -> _Node:
+        if not isinstance(node.func, ast.Name):
+            raise ExpressionError("solo se permiten llamadas a funciones por nombre")
+        fname = node.func.id
+        if fname not in self.functions and fname not in ITERATION_BUILTINS:
+            raise ExpressionError(f"función no permitida: {fname}")
+        if node.keywords or any(isinstance(a, ast.Starred) for a in node.args):
+            raise ExpressionError(f"{fname}: solo argumentos posicionales")
+
+        args = [self.compile(a) for a in node.args]
+        fns = [a.value for a in args]
+
+        if len(fns) == 1:
+            (a0,) = fns
+            value = lambda env: env[fname](a0(env))
+        elif len(fns) == 2:
+            a0, a1 = fns
+            value = lambda env: env[fname](a0(env), a1(env))
+        else:
+            value = lambda env: env[fname](*[f(env) for f in fns])
+
+        cost = _add_costs(1.0 + self.functions.get(fname, 0.0), args)
+        model = _DYNAMIC_CALL_COSTS.get(fname)
+        if model is not None:
+            # El modelo evalúa los args para estimar: deben ser baratos
+            if not all(a.static for a in args):
+                raise ExpressionError(f"{fname}: los argumentos deben ser aritmética simple (sin bucles, factorial/comb ni potencias)")
+            cost = _with_extra(cost, _guarded(model, args))
+
+        return _Node(value, cost)
+
+    def _comprehension(self, node: Union[ast.GeneratorExp, ast.ListComp], as_list: bool) -> _Node:
+        levels: List[Tuple[str, List[_Node], List[_Node]]] = []
+        for gen in node.generators:
+            if gen.is_async or not isinstance(gen.target, ast.Name) or gen.target.id.startswith("_"):
+                raise ExpressionError("comprehension: el objetivo debe ser un nombre simple")
+            it = gen.iter
+            if not (isinstance(it, ast.Call) and isinstance(it.func, ast.Name) and it.func.id == "range"):
+                raise ExpressionError("comprehension: solo se puede iterar sobre range(...)")
+            if it.keywords or not 1 <= len(it.args) <= 3:
+                raise ExpressionError("comprehension: range(...) con 1 a 3 argumentos posicionales")
+            args = [self.compile(a) for a in it.args]
+            if not all(a.static for a in args):
+                raise ExpressionError("comprehension: los argumentos de range no pueden contener bucles")
+            levels.append((gen.target.id, args, [self.compile(c) for c in gen.ifs]))
+        elt = self.compile(node.elt)
+        ev = elt.value
+        last = len(levels) - 1
+
+        def iterate(inner: Env, level: int):
+            target, args, ifs = levels[level]
+            for x in range(*[a.value(inner) for a in args]):
+                inner[target] = x
+                if all(c.value(inner) for c in ifs):
+                    if level == last:
+                        yield ev(inner)
+                    else:
+                        yield from iterate(inner, level + 1)
+
+        if as_list:
+            value = lambda env: list(iterate(dict(env), 0))
+        else:
+            value = lambda env: iterate(dict(env), 0)
+
+        def cost(env: Env) -> float:
+            # Las cotas y el cuerpo se evalúan en tres "esquinas" (variables
+            # de bucle en su primer, medio y último valor) y se toma la más
+            # cara: comb(n, x) es máximo en el medio, no en los extremos.
+            corners = [dict(env), dict(env), dict(env)]
+            trips, total = 1.0, 1.0
+            for target, args, ifs in levels:
+                length = 0
+                for i, inner in enumerate(corners):
+                    try:
+                        r = range(*[a.value(inner) for a in args])
+                    except Exception:
+                        return total  # range fallará al evaluar
+                    length = max(length, len(r))
+                    if r:
+                        inner[target] = r[(len(r) - 1) * i // 2]
+                total += trips * sum(a.cost for a in args)
+                trips *= length
+                if trips == 0:
+                    return total
+                total += trips * sum(max(_cost_of(c, inner) for inner in corners) for c in ifs)
+            return total + trips * (1.0 + max(_cost_of(elt, inner) for inner in corners))
+
+        return _Node(value, cost)
+
+    def _GeneratorExp(self, node: ast.GeneratorExp) -> _Node:
+        return self._comprehension(node, as_list=False)
+
+    def _ListComp(self, node: ast.ListComp) -> _Node:
+        return self._comprehension(node, as_list=True)
+
+
+# ---------------------------------------------------------
+# PROGRAMA (secuencia de sentencias)
+# ---------------------------------------------------------
+
+@dataclass(frozen=True)
+class _Statement:
+    target: Optional[str]           # None: expresión suelta
+    op: Optional[Callable]          # AugAssign
+    node: _Node                     # costo (y valor nodo a nodo)
+    value: Callable[[Env], Any]     # ejecución
+
+
+@dataclass(frozen=True)
+class Program:
+    """
+    expression_symbolic compilada. `output` es la variable de env con el
+    resultado; `code` es el módulo completo, para cuando no hay nada que
+    revisar entre sentencias (programa estático o sin presupuesto).
+    `optimizations`: pasadas de utils/expr_optimizer que cambiaron algo.
+    `log_space`: variante con factorial/comb en espacio log, o None.
+    `rerunnable`: ninguna sentencia lee un nombre antes de asignarlo, así
+    que se puede reejecutar sobre el env ya modificado.
+    """
+    statements: Tuple[_Statement, ...]
+    output: str
+    code: CodeType
+    static: bool
+    rerunnable: bool = True
+    optimizations: Tuple[str, ...] = ()
+    log_space: Optional["Program"] = None
+
+    def _exec(self, st: _Statement, env: Env) -> Any:
+        v = st.value(env)
+        if st.target is not None:
+            env[st.target] = st.op(env[st.target], v) if st.op else v
+        return v
+
+    def run(self, env: Env, budget: Optional[float] = None) -> Any:
+        """
+        Ejecuta sobre env (se modifica con las asignaciones). Con `budget`,
+        el costo acumulado se revisa antes de cada sentencia.
+
+        Si hay variante log_space, la exacta corre con presupuesto
+        min(budget, EXACT_COST_LIMIT); si lo excede o desborda (OverflowError
+        o float no finito) se reevalúa con log_space y el presupuesto real.
+        """
+        if self.log_space is None:
+            return self._run(env, budget)
+
+        exact_budget = EXACT_COST_LIMIT if budget is None else min(budget, EXACT_COST_LIMIT)
+        base = None if self.rerunnable else dict(env)
+        try:
+            value = self._run(env, exact_budget)
+        except (OverflowError, EvaluationBudgetExceeded):
+            value = None
+        else:
+            if type(value) is not float or math.isfinite(value):
+                return value
+
+        if base is not None:
+            env.clear()
+            env.update(base)
+        try:
+            return self.log_space.run(env, budget)
+        except (ArithmeticError, ValueError):
+            if value is None:
+                raise
+            return value
+
+    def _run(self, env: Env, budget: Optional[float]) -> Any:
+        env.setdefault("__builtins__", {})
+        if budget is None or self.static:
+            exec(self.code, env, env)
+            return env.get(self.output)
+
+        spent = 0.0
+        for st in self.statements:
+            spent += _cost_of(st.node, env)
+            if spent > budget:
+                raise EvaluationBudgetExceeded(spent, budget)
+            self._exec(st, env)
+        return env.get(self.output)
+
+    def estimate(self, env: Env) -> float:
+        """
+        Costo total estimado sin ejecutar las partes caras (para decidir
+        dónde evaluar). Las asignaciones baratas se evalúan para conocer
+        las cotas de bucles posteriores; si una cara define una cota, inf.
+        Con variante log_space es el menor de los dos: run() cae a ella si
+        la exacta no entra en el presupuesto (o en EXACT_COST_LIMIT).
+        """
+        exact = self._estimate(env)
+        if self.log_space is None:
+            return exact
+        return min(exact, self.log_space._estimate(env))
+
+    def _estimate(self, env: Env) -> float:
+        if self.static:
+            return sum(s.node.cost for s in self.statements)
+
+        env = dict(env)
+        env.setdefault("__builtins__", {})
+        total = 0.0
+        for i, st in enumerate(self.statements):
+            c = _cost_of(st.node, env)
+            total += c
+            if st.target is None or st is self.statements[-1]:
+                continue
+            if c > ESTIMATE_EVAL_LIMIT:
+                rest = self.statements[i + 1:]
+                if any(not s.node.static for s in rest):
+                    return math.inf
+                return total + sum(s.node.cost for s in rest)
+            try:
+                self._exec(st, env)
+            except Exception:
+                return total
+        return total
+
+
+def _assigned_names(stmt: ast.stmt) -> List[str]:
+    """Nombres simples asignados por un statement (a = ..., a: T = ..., a += ...)."""
+    if isinstance(stmt, ast.Assign):
+        targets = stmt.targets
+    elif isinstance(stmt, (ast.AnnAssign, ast.AugAssign)):
+        targets = [stmt.target]
+    else:
+        return []
+    return [t.id for t in targets if isinstance(t, ast.Name)]
+
+
+def _statement_fn(value: ast.expr) -> Callable[[Env], Any]:
+    code = compile(ast.fix_missing_locations(ast.Expression(body=value)), "<expression_symbolic>", "eval")
+    return lambda env: eval(code, env)
+
+
+def compile_program(source: str, functions: Dict[str, float], optimize: bool = True) -> Program:
+    """
+    Compila `source` (sentencias separadas por ';') a un Program.
+    `functions`: funciones permitidas -> costo fijo por llamada (con
+    optimize=True deben incluir las de expr_optimizer.LOG_SPACE_FUNCS).
+    Lanza SyntaxError o ExpressionError.
+    """
+    tree = ast.parse(source, mode="exec")
+    if not tree.body:
+        raise ExpressionError("expression_symbolic vacío o inválido")
+
+    optimized, applied = optimize_module(tree) if optimize else (None, ())
+    logged, logged_applied = optimize_module(tree, log_space=True) if optimize else (None, ())
+
+    # La lista blanca se valida siempre sobre el texto original
+    program = _build_program(tree, _Compiler(functions))
+    if applied:
+        program = replace(_build_program(optimized, _Compiler(functions, internal=True)), optimizations=applied)
+    if "log_space" in logged_applied:
+        log_space = _build_program(logged, _Compiler(functions, internal=True))
+        program = replace(program, log_space=replace(log_space, optimizations=logged_applied))
+    return program
+
+
+def _rerunnable(tree: ast.Module) -> bool:
+    """Ningún nombre asignado se leyó antes con su valor previo del env."""
+    assigned, read_from_env = set(), set()
+    for stmt in tree.body:
+        targets = set(_assigned_names(stmt))
+        read = {n.id for n in ast.walk(stmt.value) if isinstance(n, ast.Name)}
+        if isinstance(stmt, ast.AugAssign):
+            read |= targets
+        read_from_env |= read - assigned
+        if targets & read_from_env:
+            return False
+        assigned |= targets
+    return True
+
+
+def _build_program(tree: ast.Module, compiler: _Compiler) -> Program:
+    statements: List[_Statement] = []
+    for stmt in tree.body:
+        if isinstance(stmt, ast.Expr):
+            target, op = None, None
+        elif isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+            target, op = stmt.targets[0].id, None
+        elif isinstance(stmt, ast.AugAssign) and isinstance(stmt.target, ast.Name):
+            target, op = stmt.target.id, _BINOPS.get(type(stmt.op))
+            if op is None:
+                raise ExpressionError("asignación aumentada no permitida")
+        else:
+            raise ExpressionError(f"sentencia no permitida: {type(stmt).__name__}")
+        if target is not None:
+            compiler.check_name(target)
+        statements.append(_Statement(target, op, compiler.compile(stmt.value), _statement_fn(stmt.value)))
+
+    last = tree.body[-1]
+    if isinstance(last, ast.Expr):
+        # Última sentencia es una expresión -> se guarda en RESULT_VAR
+        output = RESULT_VAR
+        statements[-1] = replace(statements[-1], target=RESULT_VAR)
+        tree.body[-1] = ast.copy_location(
+            ast.Assign(targets=[ast.Name(id=RESULT_VAR, ctx=ast.Store())], value=last.value),
+            last,
+        )
+    else:
+        # `result` tiene prioridad, si no la última variable asignada
+        assigned = [name for st in tree.body for name in _assigned_names(st)]
+        output = "result" if "result" in assigned else _assigned_names(last)[-1]
+
+    code = compile(ast.fix_missing_locations(tree), "<expression_symbolic>", "exec")
+    return Program(
+        tuple(statements), output, code, all(st.node.static for st in statements), _rerunnable(tree),
+    )
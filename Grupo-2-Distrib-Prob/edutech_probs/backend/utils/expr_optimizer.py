@@ -0,0 +1,393 @@
+# utils/expr_optimizer.py
+#
+# Pasada de optimización sobre el AST de expression_symbolic, antes de
+# compilarlo (ver utils/expr_compiler.py). Ninguna reescritura cambia el
+# resultado (salvo el redondeo de la última cifra en espacio log):
+#
+# 1. Plegado de constantes: 1 - 0.5, -(2), 2 ** 10 ...
+# 2. Log-gamma (variante aparte, log_space=True): los productos/cocientes
+#    que incluyen factorial/comb/binom se evalúan en espacio logarítmico,
+#        factorial(n) / factorial(k) * p ** k
+#     -> pow_sign(p, k) * exp(log_factorial(n) - log_factorial(k) + log_pow(p, k))
+#    sin enteros gigantes ni overflow intermedio. pow_sign conserva el
+#    signo de las potencias de base negativa. Con conteos chicos el
+#    entero exacto es más rápido (lgamma ~5x factorial), así que esta
+#    variante se usa en NumPy y como respaldo ante overflow.
+# 3. Invariantes y subexpresiones comunes: la aritmética que no depende de
+#    las variables de un bucle, o que se repite en la sentencia, se calcula
+#    una sola vez en una sentencia previa (__h0 = 1 - p). Solo + - * y
+#    divisiones por constante: una potencia sacada del bucle podría
+#    desbordar aunque el bucle no itere.
+
+import ast
+import copy
+import math
+import operator
+from collections import Counter
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+# Prefijo de las variables que agrega el optimizador (los usuarios no
+# pueden escribir nombres con "_", así que no hay colisiones)
+HOIST_PREFIX = "__h"
+
+# Funciones "grandes": su valor crece más rápido que un float
+_BIG_CALLS = {"factorial": 1, "comb": 2, "binom": 2}
+
+
+# ---------------------------------------------------------
+# FUNCIONES EN ESPACIO LOG (versión escalar; ver utils/vectorized.py)
+# ---------------------------------------------------------
+
+def log_factorial(n: Any) -> float:
+    """log(n!)."""
+    if type(n) is int and n >= 0:
+        return math.lgamma(n + 1)
+    return math.log(math.factorial(n))  # mismos errores que factorial(n)
+
+
+def log_comb(n: Any, k: Any) -> float:
+    """log(comb(n, k)); -inf si k > n (comb = 0)."""
+    if type(n) is int and type(k) is int and 0 <= k <= n:
+        return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+    c = math.comb(n, k)  # mismos errores que comb(n, k)
+    return math.log(c) if c else -math.inf
+
+
+def log_pow(a: Any, b: Any) -> float:
+    """log|a ** b| (el signo lo da pow_sign)."""
+    if b == 0:
+        return 0.0
+    if a == 0:
+        if b > 0:
+            return -math.inf
+        raise ZeroDivisionError("0.0 cannot be raised to a negative power")
+    return b * math.log(abs(a))
+
+
+def pow_sign(*pairs: Any) -> int:
+    """Signo de a1 ** b1 * a2 ** b2 * ... (args: a1, b1, a2, b2, ...)."""
+    sign = 1
+    for a, b in zip(pairs[::2], pairs[1::2]):
+        if a < 0:
+            if b % 1:
+                raise ValueError("potencia de base negativa con exponente no entero")
+            if b % 2:
+                sign = -sign
+    return sign
+
+
+LOG_SPACE_FUNCS = {
+    "log_factorial": log_factorial,
+    "log_comb": log_comb,
+    "log_pow": log_pow,
+    "pow_sign": pow_sign,
+}
+
+
+# ---------------------------------------------------------
+# HELPERS DE AST
+# ---------------------------------------------------------
+
+def _is_number(node: ast.AST) -> bool:
+    return isinstance(node, ast.Constant) and type(node.value) in (int, float, bool)
+
+
+def _call_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        return node.func.id
+    return None
+
+
+def _call(name: str, args: List[ast.expr]) -> ast.Call:
+    return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[])
+
+
+def _chain(nodes: List[ast.expr], op: ast.operator) -> ast.expr:
+    out = nodes[0]
+    for n in nodes[1:]:
+        out = ast.BinOp(left=out, op=op, right=n)
+    return out
+
+
+def _names(node: ast.AST) -> FrozenSet[str]:
+    return frozenset(n.id for n in ast.walk(node) if isinstance(n, ast.Name))
+
+
+# ---------------------------------------------------------
+# 1. PLEGADO DE CONSTANTES
+# ---------------------------------------------------------
+
+_FOLD_BINOPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_FOLD_UNARYOPS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+
+
+class _ConstantFolder(ast.NodeTransformer):
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.expr:
+        self.generic_visit(node)
+        op = _FOLD_BINOPS.get(type(node.op))
+        if op is None or not (_is_number(node.left) and _is_number(node.right)):
+            return node
+        if op is operator.pow and abs(node.right.value) > 64:
+            return node
+        try:
+            value = op(node.left.value, node.right.value)
+        except (ArithmeticError, ValueError):
+            return node  # el error se produce al evaluar, como antes
+        if isinstance(value, complex) or (isinstance(value, int) and value.bit_length() > 256):
+            return node
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.expr:
+        self.generic_visit(node)
+        op = _FOLD_UNARYOPS.get(type(node.op))
+        if op is None or not _is_number(node.operand):
+            return node
+        return ast.copy_location(ast.Constant(op(node.operand.value)), node)
+
+    def visit_IfExp(self, node: ast.IfExp) -> ast.expr:
+        self.generic_visit(node)
+        if _is_number(node.test):
+            return node.body if node.test.value else node.orelse
+        return node
+
+
+# ---------------------------------------------------------
+# 2. PRODUCTOS CON FACTORIAL/COMB EN ESPACIO LOG
+# ---------------------------------------------------------
+
+def _factors(node: ast.expr, sign: int, out: List[Tuple[ast.expr, int]]):
+    """a * b / c -> [(a, +1), (b, +1), (c, -1)]"""
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+        _factors(node.left, sign, out)
+        _factors(node.right, sign, out)
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div):
+        _factors(node.left, sign, out)
+        _factors(node.right, -sign, out)
+    else:
+        out.append((node, sign))
+
+
+def _is_big_call(node: ast.AST) -> bool:
+    name = _call_name(node)
+    return name in _BIG_CALLS and len(node.args) == _BIG_CALLS[name]
+
+
+def _is_exp_call(node: ast.AST) -> bool:
+    return _call_name(node) == "exp" and len(node.args) == 1
+
+
+def _is_pow(node: ast.AST) -> bool:
+    return isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow)
+
+
+class _LogSpaceRewriter(ast.NodeTransformer):
+    """
+    Reescribe una cadena de * y / si tiene al menos un factorial/comb y
+    además otro factor con logaritmo conocido (potencia, exp, otro
+    factorial) o un factorial/comb dividiendo. Un factorial(n) o
+    binom(n, k) suelto queda exacto (entero).
+    """
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.expr:
+        if not isinstance(node.op, (ast.Mult, ast.Div)):
+            return self.generic_visit(node)
+
+        factors: List[Tuple[ast.expr, int]] = []
+        _factors(node, 1, factors)
+
+        big = [s for f, s in factors if _is_big_call(f)]
+        logged = len(big) + sum(1 for f, _ in factors if _is_exp_call(f) or _is_pow(f))
+        if not big or (logged < 2 and min(big) > 0):
+            # Un factorial(n) o binom(n, k) suelto queda exacto (entero)
+            return self.generic_visit(node)
+
+        factors = [(self.visit(f), s) for f, s in factors]
+
+        logs: List[Tuple[ast.expr, int]] = []
+        pairs: List[ast.expr] = []
+        rest: List[Tuple[ast.expr, int]] = []
+
+        for f, s in factors:
+            name = _call_name(f)
+            if _is_big_call(f):
+                fn = "log_factorial" if name == "factorial" else "log_comb"
+                logs.append((_call(fn, f.args), s))
+            elif _is_exp_call(f):
+                logs.append((f.args[0], s))
+            elif _is_pow(f):
+                logs.append((_call("log_pow", [f.left, f.right]), s))
+                if not (_is_number(f.left) and f.left.value >= 0):
+                    pairs += [copy.deepcopy(f.left), copy.deepcopy(f.right)]
+            else:
+                rest.append((f, s))
+
+        # exp(+a +b -c ...)
+        first, first_sign = logs[0]
+        total = first if first_sign > 0 else ast.UnaryOp(op=ast.USub(), operand=first)
+        for term, s in logs[1:]:
+            total = ast.BinOp(left=total, op=ast.Add() if s > 0 else ast.Sub(), right=term)
+
+        out: ast.expr = _call("exp", [total])
+        if pairs:
+            out = ast.BinOp(left=_call("pow_sign", pairs), op=ast.Mult(), right=out)
+
+        num = [f for f, s in rest if s > 0]
+        den = [f for f, s in rest if s < 0]
+        if num:
+            out = ast.BinOp(left=_chain(num, ast.Mult()), op=ast.Mult(), right=out)
+        if den:
+            out = ast.BinOp(left=out, op=ast.Div(), right=_chain(den, ast.Mult()))
+
+        return ast.copy_location(out, node)
+
+
+# ---------------------------------------------------------
+# 3. INVARIANTES DE BUCLE Y SUBEXPRESIONES COMUNES
+# ---------------------------------------------------------
+
+def _is_total(node: ast.AST) -> bool:
+    """
+    Aritmética que no puede fallar con params numéricos: se puede calcular
+    antes aunque el bucle no itere o la rama no se tome.
+    """
+    if isinstance(node, ast.Name) or _is_number(node):
+        return True
+    if isinstance(node, ast.UnaryOp):
+        return isinstance(node.op, (ast.USub, ast.UAdd)) and _is_total(node.operand)
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, (ast.Add, ast.Sub, ast.Mult)):
+            return _is_total(node.left) and _is_total(node.right)
+        if isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)):
+            return _is_number(node.right) and node.right.value != 0 and _is_total(node.left)
+        # Pow no: x ** k desborda (OverflowError) o crece sin cota con floats
+    return False
+
+
+class _Hoister:
+    """
+    Saca de una sentencia las subexpresiones totales que (a) están dentro
+    de un bucle sin depender de sus variables o (b) aparecen más de una vez.
+    """
+
+    def __init__(self, counter: List[int]):
+        self.counter = counter
+        self.assignments: List[ast.Assign] = []
+        self._hoisted: Dict[str, str] = {}
+        self._counts: Counter = Counter()
+
+    def _candidate(self, node: ast.AST, bound: FrozenSet[str]) -> Optional[str]:
+        if isinstance(node, (ast.Name, ast.Constant)) or not isinstance(node, ast.expr):
+            return None
+        if not _is_total(node):
+            return None
+        names = _names(node)
+        if not names or names & bound:
+            return None
+        return ast.dump(node)
+
+    def _children(self, node: ast.AST, bound: FrozenSet[str], in_loop: bool):
+        """(campo, índice o None, hijo, bound, in_loop) respetando el alcance de las comprehensions."""
+        if isinstance(node, (ast.GeneratorExp, ast.ListComp)):
+            inner = bound | frozenset(
+                g.target.id for g in node.generators if isinstance(g.target, ast.Name)
+            )
+            for i, g in enumerate(node.generators):
+                # El iterable del primer for se evalúa una vez, fuera del bucle
+                yield g, "iter", None, g.iter, (bound, in_loop) if i == 0 else (inner, True)
+                for j, cond in enumerate(g.ifs):
+                    yield g, "ifs", j, cond, (inner, True)
+            yield node, "elt", None, node.elt, (inner, True)
+            return
+
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, ast.AST):
+                yield node, field, None, value, (bound, in_loop)
+            elif isinstance(value, list):
+                for j, item in enumerate(value):
+                    if isinstance(item, ast.AST):
+                        yield node, field, j, item, (bound, in_loop)
+
+    def _count(self, node: ast.AST, bound: FrozenSet[str], in_loop: bool):
+        key = self._candidate(node, bound)
+        if key is not None:
+            self._counts[key] += 1
+        for _, _, _, child, (b, loop) in self._children(node, bound, in_loop):
+            self._count(child, b, loop)
+
+    def _replace(self, node: ast.AST, bound: FrozenSet[str], in_loop: bool) -> ast.AST:
+        key = self._candidate(node, bound)
+        if key is not None and (in_loop or self._counts[key] > 1):
+            name = self._hoisted.get(key)
+            if name is None:
+                name = self._hoisted[key] = f"{HOIST_PREFIX}{self.counter[0]}"
+                self.counter[0] += 1
+                self.assignments.append(ast.Assign(
+                    targets=[ast.Name(id=name, ctx=ast.Store())], value=copy.deepcopy(node),
+                ))
+            return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+
+        for parent, field, index, child, (b, loop) in list(self._children(node, bound, in_loop)):
+            new = self._replace(child, b, loop)
+            if new is not child:
+                if index is None:
+                    setattr(parent, field, new)
+                else:
+                    getattr(parent, field)[index] = new
+        return node
+
+    def run(self, value: ast.expr) -> ast.expr:
+        self._count(value, frozenset(), False)
+        return self._replace(value, frozenset(), False)
+
+
+def _hoist(tree: ast.Module) -> ast.Module:
+    counter = [0]
+    body: List[ast.stmt] = []
+    for stmt in tree.body:
+        if isinstance(stmt, (ast.Expr, ast.Assign, ast.AugAssign)):
+            hoister = _Hoister(counter)
+            stmt.value = hoister.run(stmt.value)
+            body.extend(hoister.assignments)
+        body.append(stmt)
+    tree.body = body
+    return tree
+
+
+# ---------------------------------------------------------
+# API
+# ---------------------------------------------------------
+
+def optimize_module(tree: ast.Module, log_space: bool = False) -> Tuple[ast.Module, Tuple[str, ...]]:
+    """
+    Optimiza una copia de `tree`. Retorna (árbol optimizado, pasadas que
+    cambiaron algo: "fold", "log_space", "hoist").
+    """
+    applied: List[str] = []
+    current = copy.deepcopy(tree)
+
+    passes = [("fold", lambda t: _ConstantFolder().visit(t))]
+    if log_space:
+        passes.append(("log_space", lambda t: _LogSpaceRewriter().visit(t)))
+    passes.append(("hoist", _hoist))
+
+    for name, fn in passes:
+        before = ast.dump(current)
+        current = fn(current)
+        if ast.dump(current) != before:
+            applied.append(name)
+
+    return ast.fix_missing_locations(current), tuple(applied)
@@ -0,0 +1,181 @@
+# utils/grading.py
+
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+# Tolerancia para preguntas desconocidas (no están en el banco)
+DEFAULT_TOLERANCE = 1e-6
+
+# Fila plana: (student_id, question_id, selected, correct)
+GradeRow = Tuple[str, str, float, float]
+
+
+# ---------------------------------------------------------
+# TOLERANCIAS
+# ---------------------------------------------------------
+
+def tolerance_for_decimals(decimals: int) -> float:
+    """
+    Media unidad en el último decimal mostrado: 4 decimales -> 5e-5.
+    Los distractores de build_test_question (main.py) se formatean con los
+    mismos decimales y a una unidad o más de la respuesta, así que ninguno
+    cae dentro de la tolerancia.
+    """
+    return 0.5 * 10.0 ** (-decimals)
+
+
+def question_tolerance(questions: Dict[str, Any], qid: str) -> float:
+    """Tolerancia de una pregunta según numeric_format.decimals del primer resultado."""
+    q = questions.get(qid)
+    if q is None or not q.math.results:
+        return DEFAULT_TOLERANCE
+    return tolerance_for_decimals(q.math.results[0].numeric_format.decimals)
+
+
+def question_tolerances(questions: Dict[str, Any]) -> Dict[str, float]:
+    """question_tolerance de todo el banco (para BulkGrader)."""
+    return {qid: question_tolerance(questions, qid) for qid, q in questions.items() if q.math.results}
+
+
+# ---------------------------------------------------------
+# PARSERS (JSON anidado, CSV y NDJSON planos)
+# ---------------------------------------------------------
+
+def rows_from_submissions(submissions: Iterable[Any]) -> Iterator[GradeRow]:
+    for sub in submissions:
+        for a in sub.answers:
+            if a.correct is None:
+                raise ValueError(f"falta 'correct' en la respuesta a {a.id}")
+            yield sub.student_id, a.id, a.selected, a.correct
+
+
+def rows_from_csv(lines: Iterable[str]) -> Iterator[GradeRow]:
+    """CSV con encabezado: student_id,id,selected,correct"""
+    for row in csv.DictReader(lines):
+        yield row["student_id"], row["id"], float(row["selected"]), float(row["correct"])
+
+
+def rows_from_ndjson(lines: Iterable[str]) -> Iterator[GradeRow]:
+    """
+    Una línea por respuesta {"student_id", "id", "selected", "correct"}
+    o una por estudiante {"student_id", "answers": [...]}.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        obj = json.loads(line)
+        if "answers" in obj:
+            for a in obj["answers"]:
+                yield obj["student_id"], a["id"], float(a["selected"]), float(a["correct"])
+        else:
+            yield obj["student_id"], obj["id"], float(obj["selected"]), float(obj["correct"])
+
+
+async def aiter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Parte un stream de bytes en líneas de texto (UTF-8) sin cargarlo completo."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+async def add_stream(grader: "BulkGrader", lines: AsyncIterator[str], fmt: str, batch_size: int = 1000):
+    """Alimenta el grader desde un stream CSV o NDJSON, por lotes de líneas."""
+    header = None
+    batch: List[str] = []
+
+    def flush():
+        if batch:
+            rows = rows_from_csv([header] + batch) if fmt == "csv" else rows_from_ndjson(batch)
+            grader.add_rows(rows)
+            batch.clear()
+
+    async for line in lines:
+        if fmt == "csv" and header is None:
+            header = line
+            continue
+        if line.strip():
+            batch.append(line)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+
+# ---------------------------------------------------------
+# CALIFICACIÓN VECTORIZADA
+# ---------------------------------------------------------
+
+class BulkGrader:
+    """
+    Acumula respuestas en columnas (índices enteros + floats) y califica
+    todo junto con NumPy.
+    """
+
+    def __init__(self, tolerances: Dict[str, float]):
+        self.tolerances = tolerances
+        self._students: Dict[str, int] = {}
+        self._questions: Dict[str, int] = {}
+        self._student_idx: List[int] = []
+        self._question_idx: List[int] = []
+        self._selected: List[float] = []
+        self._correct: List[float] = []
+
+    def add(self, student_id: str, question_id: str, selected: float, correct: float):
+        self._student_idx.append(self._students.setdefault(str(student_id), len(self._students)))
+        self._question_idx.append(self._questions.setdefault(question_id, len(self._questions)))
+        self._selected.append(selected)
+        self._correct.append(correct)
+
+    def add_rows(self, rows: Iterable[GradeRow]):
+        for row in rows:
+            self.add(*row)
+
+    def __len__(self) -> int:
+        return len(self._selected)
+
+    def grade(self) -> Dict[str, Any]:
+        student_idx = np.asarray(self._student_idx, dtype=np.int64)
+        question_idx = np.asarray(self._question_idx, dtype=np.int64)
+        selected = np.asarray(self._selected, dtype=float)
+        correct = np.asarray(self._correct, dtype=float)
+
+        question_ids = list(self._questions)
+        tol_by_question = np.asarray(
+            [self.tolerances.get(qid, DEFAULT_TOLERANCE) for qid in question_ids], dtype=float
+        )
+
+        is_ok = np.abs(selected - correct) < tol_by_question[question_idx]
+
+        n_students = len(self._students)
+        n_questions = len(question_ids)
+
+        student_total = np.bincount(student_idx, minlength=n_students)
+        student_correct = np.bincount(student_idx, weights=is_ok, minlength=n_students)
+        scores = np.round(student_correct / np.maximum(student_total, 1) * 100, 2)
+
+        question_total = np.bincount(question_idx, minlength=n_questions)
+        question_correct = np.bincount(question_idx, weights=is_ok, minlength=n_questions)
+        rates = np.round(question_correct / np.maximum(question_total, 1), 4)
+
+        return {
+            "total_answers": len(self),
+            "students": [
+                {"student_id": sid, "score": score, "correct": int(c), "total": int(t)}
+                for sid, score, c, t in zip(
+                    self._students, scores.tolist(), student_correct.tolist(), student_total.tolist()
+                )
+            ],
+            "questions": [
+                {"id": qid, "attempts": int(t), "correct": int(c), "correct_rate": rate}
+                for qid, t, c, rate in zip(
+                    question_ids, question_total.tolist(), question_correct.tolist(), rates.tolist()
+                )
+            ],
+        }
@@ -0,0 +1,232 @@
+# utils/metrics.py
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# Límites de los buckets (segundos): de 10 µs a 2.5 s
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+LabelKey = Tuple[str, ...]
+
+# (etapa, id de pregunta, segundos)
+StageTiming = Tuple[str, str, float]
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)  # último = +Inf
+        self.total = 0.0
+        self.count = 0
+
+
+class _ThreadStore:
+    """Agregados de UN hilo: solo ese hilo escribe, así que no hay locks."""
+
+    def __init__(self):
+        self.stages: Dict[LabelKey, _Histogram] = {}
+        self.requests: Dict[LabelKey, _Histogram] = {}
+        self.errors: Dict[LabelKey, int] = {}
+
+
+class Metrics:
+    """
+    Métricas en memoria con exportación en formato texto de Prometheus.
+
+    - Histogramas de latencia por etapa y por id de pregunta.
+    - Conteo de requests (por endpoint, método y status) y de errores.
+
+    Cada hilo escribe en su propio store (threading.local), sin locks en el
+    camino caliente; /metrics suma los stores de todos los hilos al leer.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, prefix: str = "probs"):
+        self.buckets = buckets
+        self.prefix = prefix
+        self._local = threading.local()
+        self._stores: List[_ThreadStore] = []
+        self._stores_lock = threading.Lock()
+
+    def _store(self) -> _ThreadStore:
+        store = getattr(self._local, "store", None)
+        if store is None:
+            store = _ThreadStore()
+            self._local.store = store
+            with self._stores_lock:
+                self._stores.append(store)
+        return store
+
+    def _observe(self, table: Dict[LabelKey, _Histogram], key: LabelKey, seconds: float):
+        hist = table.get(key)
+        if hist is None:
+            hist = table[key] = _Histogram(len(self.buckets))
+        hist.counts[bisect_left(self.buckets, seconds)] += 1
+        hist.total += seconds
+        hist.count += 1
+
+    # -----------------------------------------------------
+    # REGISTRO
+    # -----------------------------------------------------
+
+    def observe_stage(self, stage: str, question_id: str, seconds: float):
+        captured = getattr(self._local, "captured", None)
+        if captured is not None:
+            captured.append((stage, question_id, seconds))
+            return
+        self._observe(self._store().stages, (stage, question_id), seconds)
+
+    @contextmanager
+    def capture_stages(self) -> Iterator[List[StageTiming]]:
+        """
+        Junta las etapas observadas en este hilo en una lista en vez de
+        registrarlas. Lo usa el worker de utils/executor.py para devolver
+        los tiempos al proceso padre (record_stages).
+        """
+        captured: List[StageTiming] = []
+        self._local.captured = captured
+        try:
+            yield captured
+        finally:
+            self._local.captured = None
+
+    def record_stages(self, timings: Iterable[StageTiming]):
+        for stage, question_id, seconds in timings:
+            self.observe_stage(stage, question_id, seconds)
+
+    def observe_request(self, endpoint: str, method: str, status: int, seconds: float):
+        self._observe(self._store().requests, (endpoint, method, str(status)), seconds)
+
+    def count_error(self, endpoint: str, method: str):
+        errors = self._store().errors
+        key = (endpoint, method)
+        errors[key] = errors.get(key, 0) + 1
+
+    # -----------------------------------------------------
+    # EXPORTACIÓN
+    # -----------------------------------------------------
+
+    def _merged(self) -> Tuple[Dict[LabelKey, _Histogram], Dict[LabelKey, _Histogram], Dict[LabelKey, int]]:
+        with self._stores_lock:
+            stores = list(self._stores)
+
+        stages: Dict[LabelKey, _Histogram] = {}
+        requests: Dict[LabelKey, _Histogram] = {}
+        errors: Dict[LabelKey, int] = {}
+
+        for store in stores:
+            for src, dst in ((store.stages, stages), (store.requests, requests)):
+                for key, hist in list(src.items()):
+                    acc = dst.get(key)
+                    if acc is None:
+                        acc = dst[key] = _Histogram(len(self.buckets))
+                    for i, c in enumerate(hist.counts):
+                        acc.counts[i] += c
+                    acc.total += hist.total
+                    acc.count += hist.count
+            for key, n in list(store.errors.items()):
+                errors[key] = errors.get(key, 0) + n
+
+        return stages, requests, errors
+
+    @staticmethod
+    def _labels(names: Tuple[str, ...], values: LabelKey, extra: str = "") -> str:
+        def esc(v: str) -> str:
+            return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        parts = [f'{n}="{esc(v)}"' for n, v in zip(names, values)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}"
+
+    def _histogram_lines(self, name: str, names: Tuple[str, ...], table: Dict[LabelKey, _Histogram]) -> List[str]:
+        les = ['le="%s"' % bound for bound in self.buckets] + ['le="+Inf"']
+        lines = []
+        for key in sorted(table):
+            hist = table[key]
+            cumulative = 0
+            for le, c in zip(les, hist.counts):
+                cumulative += c
+                lines.append(f"{name}_bucket{self._labels(names, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(names, key)} {hist.total}")
+            lines.append(f"{name}_count{self._labels(names, key)} {hist.count}")
+        return lines
+
+    def render_prometheus(self) -> str:
+        stages, requests, errors = self._merged()
+        p = self.prefix
+        lines: List[str] = []
+
+        lines.append(f"# HELP {p}_stage_duration_seconds Latencia por etapa del pipeline y por pregunta.")
+        lines.append(f"# TYPE {p}_stage_duration_seconds histogram")
+        lines += self._histogram_lines(f"{p}_stage_duration_seconds", ("stage", "question_id"), stages)
+
+        lines.append(f"# HELP {p}_http_request_duration_seconds Latencia de requests HTTP por endpoint.")
+        lines.append(f"# TYPE {p}_http_request_duration_seconds histogram")
+        lines += self._histogram_lines(
+            f"{p}_http_request_duration_seconds", ("endpoint", "method", "status"), requests
+        )
+
+        lines.append(f"# HELP {p}_http_requests_total Requests HTTP por endpoint, método y status.")
+        lines.append(f"# TYPE {p}_http_requests_total counter")
+        for key in sorted(requests):
+            lines.append(
+                f"{p}_http_requests_total{self._labels(('endpoint', 'method', 'status'), key)} {requests[key].count}"
+            )
+
+        lines.append(f"# HELP {p}_http_request_errors_total Requests que terminaron en excepción o status 5xx.")
+        lines.append(f"# TYPE {p}_http_request_errors_total counter")
+        for key in sorted(errors):
+            lines.append(f"{p}_http_request_errors_total{self._labels(('endpoint', 'method'), key)} {errors[key]}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Instancia global (una por proceso worker de uvicorn)
+METRICS = Metrics()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro (sin BaseHTTPMiddleware) que mide cada request.
+    El endpoint se etiqueta con la ruta declarada (/questions/{qid}), no
+    con el path real, para no disparar la cardinalidad.
+    """
+
+    def __init__(self, app: Any, metrics: Metrics = METRICS):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            self._record(scope, 500, start, error=True)
+            raise
+        self._record(scope, status_holder["status"], start, error=status_holder["status"] >= 500)
+
+    def _record(self, scope, status: int, start: float, error: bool):
+        route = scope.get("route")
+        endpoint = getattr(route, "path", None) or "<unmatched>"
+        method = scope.get("method", "")
+        self.metrics.observe_request(endpoint, method, status, time.perf_counter() - start)
+        if error:
+            self.metrics.count_error(endpoint, method)
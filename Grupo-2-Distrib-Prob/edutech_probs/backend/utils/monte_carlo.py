@@ -0,0 +1,251 @@
+# utils/monte_carlo.py
+
+import math
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.question_models import QuestionDefinition
+from utils.render import render_math_result
+
+# Muestras por result: ("prob", bool[]) | ("mean", float[]) | ("var", float[])
+Samples = Dict[str, Tuple[str, np.ndarray]]
+Simulator = Callable[[Dict[str, Any], int, np.random.Generator], Samples]
+
+# Tamaño máximo de cada bloque de muestras (acota la memoria por worker)
+CHUNK_SIZE = 1_000_000
+
+
+# ---------------------------------------------------------
+# SIMULADORES POR SOLVER
+# ---------------------------------------------------------
+# Cada simulador reproduce el MODELO que describe el enunciado (no la
+# fórmula) y devuelve muestras para cada result_id de la pregunta.
+
+def _binomial(params, size, rng):
+    x = rng.binomial(int(params["n"]), params["p"], size)
+    return {"prob_exact": ("prob", x == params["x"])}
+
+
+def _multinomial(params, size, rng):
+    counts = np.array([params["c1"], params["c2"], params["c3"]])
+    probs = np.array([params["p1"], params["p2"], params["p3"]], dtype=float)
+    draws = rng.multinomial(int(counts.sum()), probs / probs.sum(), size)
+    return {"prob_multinomial": ("prob", np.all(draws == counts, axis=1))}
+
+
+def _torneo(params, size, rng):
+    wins_second = rng.binomial(int(params["n_partidos"]), 1 - params["p"], size)
+    return {"prob_segundo_gana": ("prob", wins_second >= params["k_min"])}
+
+
+def _poisson_mas_de_un(params, size, rng):
+    x = rng.poisson(params["n"] * params["p"] * params["t"], size)
+    return {"prob_mas_de_un": ("prob", x > 1)}
+
+
+def _defectuosos(params, size, rng):
+    x = rng.binomial(int(params["n_muestra"]), params["p_defectuosos"], size)
+    return {
+        "prob_X_mayor_k_excede": ("prob", x > params["k_excede"]),
+        "prob_X_menor_k_menor": ("prob", x < params["k_menor"]),
+    }
+
+
+def _exponencial(params, size, rng):
+    t = rng.exponential(1.0 / params["tasa"], size)
+    return {"prob_falla_antes": ("prob", t < params["horas"])}
+
+
+def _weibull(params, size, rng):
+    t = params["alpha"] * rng.weibull(params["beta"], size)
+    return {"prob_sigue_operando": ("prob", t > params["anos"])}
+
+
+def _normal_entre(params, size, rng):
+    x = rng.normal(params["media_horas"], params["desviacion_horas"], size)
+    return {"prob_entre_tmin_tmax": ("prob", (x >= params["t_min"]) & (x <= params["t_max"]))}
+
+
+def _resistores(params, size, rng):
+    p0, p1 = params["p_0"], params["p_1"]
+    total = p0 + p1 + params["p_2"]
+    u = rng.random(size) * total
+    x = (u >= p0).astype(float) + (u >= p0 + p1)
+    return {"media_resistores": ("mean", x), "var_resistores": ("var", x)}
+
+
+def _comisiones(params, size, rng):
+    x = (
+        params["comision_1"] * (rng.random(size) < params["p_exito_1"])
+        + params["comision_2"] * (rng.random(size) < params["p_exito_2"])
+    )
+    return {"valor_esperado_comisiones": ("mean", x)}
+
+
+def _esferas(params, size, rng):
+    x = rng.normal(params["media"], params["desviacion"], size)
+    lo, hi = params["centro"] - params["tolerancia"], params["centro"] + params["tolerancia"]
+    return {"proporcion_en_especificacion": ("prob", (x >= lo) & (x <= hi))}
+
+
+def _hipergeometrica(params, size, rng):
+    n_buenos = int(params["n_buenos"])
+    x = rng.hypergeometric(n_buenos, int(params["n_total"]) - n_buenos, int(params["n_muestra"]), size)
+    x = x.astype(float)
+    return {"media_hipergeometrica": ("mean", x), "var_hipergeometrica": ("var", x)}
+
+
+def _binomial_al_menos(params, size, rng):
+    x = rng.binomial(int(params["n"]), params["p"], size)
+    return {"prob_al_menos_k": ("prob", x >= params["k"])}
+
+
+def _poisson_exacto(params, size, rng):
+    x = rng.poisson(params["lambda_"], size)
+    return {"prob_poisson_exacto": ("prob", x == params["k"])}
+
+
+def _normal_mayor_que(params, size, rng):
+    x = rng.normal(params["mu"], params["sigma"], size)
+    return {"prob_mayor_que_limite": ("prob", x > params["limite"])}
+
+
+# utilidad_maxima es un óptimo determinista: no hay nada que simular
+MONTE_CARLO_SIMULATORS: Dict[str, Simulator] = {
+    "binomial_exact": _binomial,
+    "multinomial_prob": _multinomial,
+    "torneo_segundo_gana": _torneo,
+    "poisson_mas_de_un": _poisson_mas_de_un,
+    "probs_defectuosos": _defectuosos,
+    "prob_falla_antes": _exponencial,
+    "prob_bateria_operacion": _weibull,
+    "prob_bateria_entre": _normal_entre,
+    "media_var_resistores": _resistores,
+    "valor_esperado_comisiones": _comisiones,
+    "proporcion_esferas": _esferas,
+    "hiper_media_var": _hipergeometrica,
+    "binomial_al_menos": _binomial_al_menos,
+    "poisson_exacto": _poisson_exacto,
+    "normal_mayor_que": _normal_mayor_que,
+}
+
+
+# ---------------------------------------------------------
+# ESTIMACIÓN (acumulada por bloques)
+# ---------------------------------------------------------
+
+class _Moments:
+    """Sumas de potencias 1..4 para media, varianza y su error estándar."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.n = 0
+        self.s = np.zeros(4)
+
+    def add(self, x: np.ndarray):
+        x = x.astype(float, copy=False)
+        x2 = x * x
+        self.n += x.size
+        self.s += (x.sum(), x2.sum(), (x2 * x).sum(), (x2 * x2).sum())
+
+    def estimate(self, analytic: float) -> Tuple[float, float]:
+        n = self.n
+        e1, e2, e3, e4 = self.s / n
+        mean = e1
+        var = max(e2 - e1 * e1, 0.0)
+
+        if self.kind == "prob":
+            # Error estándar bajo H0 (p = valor analítico): no colapsa a 0
+            # cuando la muestra no tiene aciertos
+            pa = min(max(analytic, 0.0), 1.0)
+            return mean, math.sqrt(pa * (1 - pa) / n)
+
+        if self.kind == "mean":
+            return mean, math.sqrt(var / n)
+
+        # Varianza muestral; error estándar vía el 4º momento central
+        mu4 = e4 - 4 * mean * e3 + 6 * mean ** 2 * e2 - 3 * mean ** 4
+        return var * n / (n - 1), math.sqrt(max(mu4 - var * var, 0.0) / n)
+
+
+@dataclass
+class CheckResult:
+    question_id: str
+    result_id: str
+    status: str  # "ok" | "fail" | "skipped" | "error"
+    params: Dict[str, Any]
+    analytic: Optional[float] = None
+    estimate: Optional[float] = None
+    stderr: Optional[float] = None
+    z_score: Optional[float] = None
+    draws: int = 0
+    detail: Optional[str] = None
+
+
+def cross_check(
+    q: QuestionDefinition,
+    params: Dict[str, Any],
+    draws: int,
+    rng: np.random.Generator,
+    z: float = 5.0,
+    atol: float = 1e-12,
+) -> List[CheckResult]:
+    """
+    Compara raw_numeric de cada resultado contra una estimación Monte Carlo
+    con `draws` simulaciones. Falla si |analítico - estimado| > z·stderr + atol.
+    """
+    simulator = MONTE_CARLO_SIMULATORS.get(q.solver)
+    if simulator is None:
+        return [
+            CheckResult(q.id, r.id, "skipped", params, detail=f"sin simulador para '{q.solver}'")
+            for r in q.math.results
+        ]
+
+    analytic: Dict[str, float] = {}
+    out: List[CheckResult] = []
+    for r in q.math.results:
+        try:
+            analytic[r.id] = float(render_math_result(r.model_dump(), params, q)["raw_numeric"])
+        except Exception as e:
+            out.append(CheckResult(q.id, r.id, "error", params, detail=f"{type(e).__name__}: {e}"))
+
+    moments: Dict[str, _Moments] = {}
+    done = 0
+    while done < draws:
+        size = min(CHUNK_SIZE, draws - done)
+        for rid, (kind, samples) in simulator(params, size, rng).items():
+            moments.setdefault(rid, _Moments(kind)).add(samples)
+        done += size
+
+    for rid, value in analytic.items():
+        m = moments.get(rid)
+        if m is None:
+            out.append(CheckResult(q.id, rid, "skipped", params, analytic=value, detail="result no simulado"))
+            continue
+
+        estimate, stderr = m.estimate(value)
+        diff = abs(value - estimate)
+        ok = diff <= z * stderr + atol * max(1.0, abs(value))
+        out.append(CheckResult(
+            q.id, rid, "ok" if ok else "fail", params,
+            analytic=value,
+            estimate=estimate,
+            stderr=stderr,
+            z_score=round(diff / stderr, 3) if stderr > 0 else None,
+            draws=m.n,
+        ))
+    return out
+
+
+def check_question_worker(
+    q_dump: Dict[str, Any], params_list: List[Dict[str, Any]], draws: int, seed: List[int], z: float
+) -> List[Dict[str, Any]]:
+    """Punto de entrada para el ProcessPoolExecutor (argumentos picklables)."""
+    q = QuestionDefinition.model_validate(q_dump)
+    results = []
+    for i, params in enumerate(params_list):
+        rng = np.random.default_rng([*seed, i])
+        results.extend(vars(r) for r in cross_check(q, params, draws, rng, z))
+    return results
@@ -0,0 +1,165 @@
+# utils/param_sampler.py
+
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from models.question_models import QuestionDefinition
+
+Number = Union[int, float]
+
+# Decimales de los floats generados (mismo redondeo que clean_params)
+FLOAT_DECIMALS = 5
+
+
+@dataclass(frozen=True)
+class _ParamStep:
+    name: str
+    min: Union[float, str]
+    max: Union[float, str]
+    is_int: bool
+
+
+@dataclass(frozen=True)
+class _SimplexStep:
+    """Los k-1 primeros uniformes en su rango; el último = total - suma."""
+    names: Tuple[str, ...]
+    bounds: Tuple[Tuple[float, float], ...]
+    total: float
+
+
+class ParamSampler:
+    """
+    Muestreador de parámetros compilado una vez por pregunta.
+
+    - Cada parámetro se sortea uniforme en [min, max]; un límite que nombra
+      a otro parámetro ("max": "n") se resuelve fila a fila (param <= otro).
+    - "simplex": los parámetros del grupo suman `total` y cada uno respeta
+      su [min, max]. Es uniforme sobre la región factible.
+    - "order": los parámetros quedan en orden no decreciente.
+
+    Las filas que violan una restricción se descartan y se vuelve a
+    sortear (rechazo), así que no hay reparación a posteriori que sesgue
+    la distribución. Todo en lotes NumPy.
+    """
+
+    def __init__(self, q: QuestionDefinition, buffer_size: int = 1024, max_rounds: int = 50):
+        self.question = q
+        self.buffer_size = buffer_size
+        self.max_rounds = max_rounds
+
+        self.steps: List[Union[_ParamStep, _SimplexStep]] = []
+        self.orders: List[Tuple[str, ...]] = []
+        self._compile(q)
+
+        self._rows: List[Dict[str, Number]] = []
+        self._lock = threading.Lock()
+
+    # -----------------------------------------------------
+    # COMPILACIÓN
+    # -----------------------------------------------------
+
+    def _compile(self, q: QuestionDefinition):
+        simplex_of: Dict[str, Any] = {}
+        for c in q.constraints:
+            unknown = [p for p in c.params if p not in q.params]
+            if unknown:
+                raise ValueError(f"{q.id}: restricción '{c.type}' con params desconocidos: {unknown}")
+            if len(c.params) < 2:
+                raise ValueError(f"{q.id}: restricción '{c.type}' necesita al menos 2 params")
+
+            if c.type == "order":
+                self.orders.append(tuple(c.params))
+                continue
+
+            for p in c.params:
+                cfg = q.params[p]
+                if cfg.type != "float" or isinstance(cfg.max, str):
+                    raise ValueError(f"{q.id}: '{p}' en simplex debe ser float con límites numéricos")
+                if p in simplex_of:
+                    raise ValueError(f"{q.id}: '{p}' aparece en dos simplex")
+                simplex_of[p] = c
+
+        emitted = set()
+        for name, cfg in q.params.items():
+            c = simplex_of.get(name)
+            if c is None:
+                self.steps.append(_ParamStep(name, cfg.min, cfg.max, cfg.type == "int"))
+            elif id(c) not in emitted:
+                emitted.add(id(c))
+                self.steps.append(_SimplexStep(
+                    names=tuple(c.params),
+                    bounds=tuple((float(q.params[p].min), float(q.params[p].max)) for p in c.params),
+                    total=c.total,
+                ))
+
+    # -----------------------------------------------------
+    # MUESTREO EN LOTE
+    # -----------------------------------------------------
+
+    def _draw_batch(self, m: int, rng: np.random.Generator) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        cols: Dict[str, np.ndarray] = {}
+        valid = np.ones(m, dtype=bool)
+
+        def resolve(val):
+            if isinstance(val, str) and val in cols:
+                return cols[val]
+            return val
+
+        for step in self.steps:
+            if isinstance(step, _ParamStep):
+                low, high = resolve(step.min), resolve(step.max)
+                if step.is_int:
+                    low = np.asarray(low).astype(np.int64)
+                    high = np.maximum(np.asarray(high).astype(np.int64), low)  # como randint: min > max -> min
+                    cols[step.name] = rng.integers(low, high + 1, size=m)
+                else:
+                    cols[step.name] = np.round(rng.uniform(low, high, size=m), FLOAT_DECIMALS)
+                continue
+
+            partial = np.zeros(m)
+            for name, (lo, hi) in zip(step.names[:-1], step.bounds[:-1]):
+                cols[name] = np.round(rng.uniform(lo, hi, size=m), FLOAT_DECIMALS)
+                partial += cols[name]
+            lo, hi = step.bounds[-1]
+            last = np.round(step.total - partial, FLOAT_DECIMALS)
+            cols[step.names[-1]] = last
+            valid &= (last >= lo) & (last <= hi)
+
+        for names in self.orders:
+            for a, b in zip(names, names[1:]):
+                valid &= cols[a] <= cols[b]
+
+        return cols, valid
+
+    def sample(self, size: int, rng: Optional[np.random.Generator] = None) -> Dict[str, np.ndarray]:
+        """`size` juegos de parámetros válidos, en columnas."""
+        rng = rng or np.random.default_rng(random.getrandbits(64))
+        parts: List[Dict[str, np.ndarray]] = []
+        have = 0
+        acceptance = 1.0
+
+        for _ in range(self.max_rounds):
+            m = max(64, int((size - have) / max(acceptance, 0.01) * 1.2))
+            cols, valid = self._draw_batch(m, rng)
+            acceptance = max(valid.mean(), 0.001)
+            parts.append({k: v[valid] for k, v in cols.items()})
+            have += int(valid.sum())
+            if have >= size:
+                break
+        else:
+            raise ValueError(f"{self.question.id}: restricciones de params imposibles de satisfacer")
+
+        return {k: np.concatenate([p[k] for p in parts])[:size] for k in parts[0]}
+
+    def draw(self) -> Dict[str, Number]:
+        """Un juego de parámetros (del buffer; se rellena de a buffer_size)."""
+        with self._lock:
+            if not self._rows:
+                cols = self.sample(self.buffer_size)
+                names = list(cols)
+                self._rows = [dict(zip(names, row)) for row in zip(*(cols[n].tolist() for n in names))]
+            return self._rows.pop()
@@ -0,0 +1,205 @@
+# utils/param_sweep.py
+#
+# Barrido del espacio de parámetros de una pregunta (esquinas de los
+# ParamConfig + muestra del interior) midiendo render_math_result en cada
+# punto. Lo usa tools/profile_questions.py.
+#
+# Tipos de punto:
+#   - "corner":     cada param en su min o max (los límites que nombran otro
+#                   param se resuelven en el punto)
+#   - "mid":        todos los params en el centro de su rango
+#   - "interior":   muestras de ParamSampler (respetan las restricciones)
+#   - "degenerate": el punto medio con un param en 0 o 1 fuera de su rango,
+#                   como podría llegar en un params_override
+#
+# Las esquinas y los degenerados pasan por el plan de limpieza de la
+# pregunta, igual que un params_override en /generate-problem.
+
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.question_models import QuestionDefinition
+from utils.clean_params import compile_cleaning_plan
+from utils.param_sampler import ParamSampler
+from utils.render import estimate_question_cost, eval_symbolic_expression, render_math_result
+
+# Valores que se prueban como "degenerate" (si caen fuera del rango)
+DEGENERATE_VALUES = (0, 1)
+
+Point = Tuple[str, Dict[str, Any]]  # (tipo, params)
+
+
+# ---------------------------------------------------------
+# PUNTOS DEL BARRIDO
+# ---------------------------------------------------------
+
+def _resolve(q: QuestionDefinition, levels: Dict[str, str]) -> Dict[str, Any]:
+    """levels: param -> "min" | "max" | "mid"."""
+    params: Dict[str, Any] = {}
+    for name, cfg in q.params.items():
+        low = cfg.min
+        high = params.get(cfg.max, low) if isinstance(cfg.max, str) else cfg.max
+        high = max(high, low)  # como el sampler: min > max -> min
+
+        level = levels[name]
+        value = low if level == "min" else high if level == "max" else (low + high) / 2
+        params[name] = int(round(value)) if cfg.type == "int" else float(value)
+    return params
+
+
+def corner_points(q: QuestionDefinition, limit: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Todas las esquinas (2^k) o `limit` elegidas al azar si son más."""
+    names = list(q.params)
+    total = 2 ** len(names)
+    masks = range(total) if total <= limit else rng.sample(range(total), limit)
+
+    points, seen = [], set()
+    for mask in masks:
+        levels = {name: "max" if mask >> i & 1 else "min" for i, name in enumerate(names)}
+        params = _resolve(q, levels)
+        key = tuple(params.values())
+        if key not in seen:
+            seen.add(key)
+            points.append(params)
+    return points
+
+
+def degenerate_points(q: QuestionDefinition, mid: Dict[str, Any]) -> List[Dict[str, Any]]:
+    points = []
+    for name, cfg in q.params.items():
+        for value in DEGENERATE_VALUES:
+            inside = cfg.min <= value and (isinstance(cfg.max, str) or value <= cfg.max)
+            if not inside:
+                points.append({**mid, name: value if cfg.type == "int" else float(value)})
+    return points
+
+
+def sweep_points(
+    q: QuestionDefinition, max_corners: int, samples: int, seed: List[int], degenerate: bool
+) -> List[Point]:
+    rng = random.Random(str(seed))
+    plan = compile_cleaning_plan(q)
+
+    mid = _resolve(q, dict.fromkeys(q.params, "mid"))
+    points: List[Point] = [("corner", plan.apply(p)) for p in corner_points(q, max_corners, rng)]
+    points.append(("mid", plan.apply(mid)))
+
+    if samples:
+        cols = ParamSampler(q).sample(samples, np.random.default_rng(seed))
+        names = list(cols)
+        points += [("interior", dict(zip(names, row))) for row in zip(*(cols[n].tolist() for n in names))]
+
+    if degenerate:
+        points += [("degenerate", plan.apply(p)) for p in degenerate_points(q, mid)]
+
+    return points
+
+
+# ---------------------------------------------------------
+# MEDICIÓN
+# ---------------------------------------------------------
+
+def _failure_kind(q: QuestionDefinition, math_def: Dict[str, Any], params: Dict[str, Any], exc: Optional[Exception]) -> Optional[str]:
+    """None si el resultado es finito; "inf"/"nan" o el nombre de la excepción."""
+    if exc is None:
+        return None
+    try:
+        # format_numeric(inf) falla con InvalidOperation: se reporta como inf
+        value = eval_symbolic_expression(math_def["expression_symbolic"], params, q, budget=None)
+    except Exception:
+        return type(exc).__name__
+    if math.isnan(value):
+        return "nan"
+    if math.isinf(value):
+        return "inf"
+    return type(exc).__name__
+
+
+def measure_point(
+    q: QuestionDefinition, math_defs: List[Dict[str, Any]], params: Dict[str, Any], repeat: int
+) -> Tuple[float, List[Dict[str, Any]]]:
+    """(ms del render de todos los resultados, mejor de `repeat`; fallas por resultado)."""
+    best = math.inf
+    failures: List[Dict[str, Any]] = []
+
+    for attempt in range(repeat):
+        elapsed = 0.0
+        for math_def in math_defs:
+            t0 = time.perf_counter()
+            exc: Optional[Exception] = None
+            try:
+                rendered = render_math_result(math_def, params, q)
+            except Exception as e:
+                exc = e
+            elapsed += time.perf_counter() - t0
+
+            if attempt:
+                continue
+            if exc is None:
+                raw = rendered["raw_numeric"]
+                kind = "nan" if math.isnan(raw) else "inf" if math.isinf(raw) else None
+            else:
+                kind = _failure_kind(q, math_def, params, exc)
+            if kind is not None:
+                failures.append({"result_id": math_def["id"], "kind": kind, "detail": str(exc) if exc else None})
+        best = min(best, elapsed)
+
+    return best * 1000, failures
+
+
+def profile_question(
+    q: QuestionDefinition, points: List[Point], repeat: int, max_failures: int
+) -> Dict[str, Any]:
+    math_defs = [r.model_dump() for r in q.math.results]
+
+    latencies: List[float] = []
+    worst: Optional[Dict[str, Any]] = None
+    costliest: Optional[Dict[str, Any]] = None
+    failures: List[Dict[str, Any]] = []
+    failure_counts: Dict[str, int] = {}
+    points_by_kind: Dict[str, int] = {}
+
+    for kind, params in points:
+        points_by_kind[kind] = points_by_kind.get(kind, 0) + 1
+        ms, point_failures = measure_point(q, math_defs, params, repeat)
+        latencies.append(ms)
+
+        if worst is None or ms > worst["ms"]:
+            worst = {"ms": round(ms, 4), "point": kind, "params": params}
+
+        try:
+            cost = estimate_question_cost(q, params)
+        except Exception:
+            cost = None
+        if cost is not None and (costliest is None or cost > costliest["cost"]):
+            costliest = {"cost": cost, "point": kind, "params": params}
+
+        for f in point_failures:
+            key = f"{kind}:{f['kind']}"
+            failure_counts[key] = failure_counts.get(key, 0) + 1
+            if len(failures) < max_failures:
+                failures.append({"point": kind, "params": params, **f})
+
+    return {
+        "question_id": q.id,
+        "points": points_by_kind,
+        "p50_ms": round(float(np.median(latencies)), 4) if latencies else None,
+        "worst": worst,
+        "max_estimated_cost": costliest,
+        "failure_counts": failure_counts,
+        "failures": failures,
+    }
+
+
+def profile_question_worker(
+    q_dump: Dict[str, Any], max_corners: int, samples: int, seed: List[int],
+    degenerate: bool, repeat: int, max_failures: int,
+) -> Dict[str, Any]:
+    """Punto de entrada para el ProcessPoolExecutor (argumentos picklables)."""
+    q = QuestionDefinition.model_validate(q_dump)
+    points = sweep_points(q, max_corners, samples, seed, degenerate)
+    return profile_question(q, points, repeat, max_failures)
@@ -0,0 +1,206 @@
+# utils/problem_pool.py
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProblemPool:
+    """
+    Pool por pregunta de problemas ya generados (GeneratedProblemLatex).
+
+    - pop(qid) es O(1); si el pool está vacío devuelve None y el endpoint
+      genera en línea (miss).
+    - Una tarea asyncio en segundo plano rellena cada pool hasta
+      `high_watermark` cuando baja de `low_watermark` (o cuando se vacía,
+      si low_watermark=0). high_watermark=0 desactiva el pool.
+    - La generación corre en un hilo (asyncio.to_thread) para no bloquear
+      el event loop.
+    - Cada pool tiene una generación que invalidate() incrementa: lo que
+      un relleno en curso construyó con la definición anterior se descarta.
+    - Si build falla, la pregunta espera refill_interval * 2^fallas (hasta
+      max_backoff) antes de reintentar.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[str], Any],
+        low_watermark: int = 16,
+        high_watermark: int = 64,
+        refill_interval: float = 0.1,
+        refill_chunk: int = 16,
+        max_backoff: float = 60.0,
+    ):
+        if not 0 <= low_watermark <= high_watermark:
+            raise ValueError("Se requiere 0 <= low_watermark <= high_watermark")
+
+        self.build = build
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.refill_interval = refill_interval
+        self.refill_chunk = refill_chunk
+        self.max_backoff = max_backoff
+
+        self._pools: Dict[str, Deque[Any]] = {}
+        self._generations: Dict[str, int] = {}
+        self._failures: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # -----------------------------------------------------
+    # CONSUMO (request path)
+    # -----------------------------------------------------
+
+    def pop(self, qid: str) -> Optional[Any]:
+        pool = self._pools.get(qid)
+        try:
+            item = pool.popleft() if pool is not None else None
+        except IndexError:
+            item = None
+
+        with self._lock:
+            counter = self._hits if item is not None else self._misses
+            counter[qid] = counter.get(qid, 0) + 1
+
+        return item
+
+    # -----------------------------------------------------
+    # RELLENO
+    # -----------------------------------------------------
+
+    def sync_questions(self, question_ids: Iterable[str]):
+        """Crea pools para preguntas nuevas y descarta los de preguntas eliminadas."""
+        ids = set(question_ids)
+        with self._lock:
+            for qid in ids - self._pools.keys():
+                self._pools[qid] = deque()
+            for qid in self._pools.keys() - ids:
+                self._pools.pop(qid, None)
+                self._bump(qid)
+
+    def _bump(self, qid: str):
+        # Con self._lock tomado
+        self._generations[qid] = self._generations.get(qid, 0) + 1
+        self._failures.pop(qid, None)
+        self._retry_at.pop(qid, None)
+
+    def invalidate(self, qid: str):
+        """Vacía el pool de una pregunta (p.ej. si su definición cambió)."""
+        with self._lock:
+            pool = self._pools.get(qid)
+            if pool is not None:
+                pool.clear()
+            self._bump(qid)
+
+    def fill(self, qid: str, count: int) -> int:
+        """
+        Genera hasta `count` problemas para qid. Retorna cuántos agregó; se
+        detiene si la pregunta se invalida mientras tanto.
+        """
+        with self._lock:
+            pool = self._pools.get(qid)
+            generation = self._generations.get(qid, 0)
+        if pool is None:
+            return 0
+
+        added = 0
+        for _ in range(count):
+            if len(pool) >= self.high_watermark:
+                break
+            item = self.build(qid)
+            with self._lock:
+                if self._generations.get(qid, 0) != generation:
+                    break
+                pool.append(item)
+            added += 1
+        return added
+
+    def _record_failure(self, qid: str, generation: int):
+        with self._lock:
+            if self._generations.get(qid, 0) != generation:
+                return
+            failures = self._failures[qid] = self._failures.get(qid, 0) + 1
+            delay = min(self.refill_interval * 2 ** failures, self.max_backoff)
+            self._retry_at[qid] = time.monotonic() + delay
+        logger.warning(
+            "No se pudo pregenerar %s (falla %d, reintento en %.1f s)", qid, failures, delay, exc_info=True
+        )
+
+    def _record_success(self, qid: str):
+        with self._lock:
+            self._failures.pop(qid, None)
+            self._retry_at.pop(qid, None)
+
+    async def _refill_loop(self):
+        while True:
+            now = time.monotonic()
+            for qid, pool in list(self._pools.items()):
+                if self._retry_at.get(qid, 0.0) > now:
+                    continue
+                if len(pool) < max(self.low_watermark, 1):
+                    missing = self.high_watermark - len(pool)
+                    generation = self._generations.get(qid, 0)
+                    while missing > 0:
+                        try:
+                            added = await asyncio.to_thread(self.fill, qid, min(missing, self.refill_chunk))
+                        except Exception:
+                            # Una pregunta rota no debe detener el relleno del resto
+                            self._record_failure(qid, generation)
+                            break
+                        self._record_success(qid)
+                        if not added:
+                            break
+                        missing -= added
+            await asyncio.sleep(self.refill_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # -----------------------------------------------------
+    # STATS
+    # -----------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = dict(self._hits)
+            misses = dict(self._misses)
+            failures = dict(self._failures)
+
+        total_hits = sum(hits.values())
+        total_misses = sum(misses.values())
+        total = total_hits + total_misses
+
+        return {
+            "low_watermark": self.low_watermark,
+            "high_watermark": self.high_watermark,
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_ratio": round(total_hits / total, 4) if total else None,
+            "per_question": {
+                qid: {
+                    "size": len(pool),
+                    "hits": hits.get(qid, 0),
+                    "misses": misses.get(qid, 0),
+                    "failures": failures.get(qid, 0),
+                }
+                for qid, pool in sorted(self._pools.items())
+            },
+        }
@@ -0,0 +1,389 @@
+# utils/question_bank.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from models.question_models import QuestionDefinition
+from utils.catalog import Catalog
+from utils.clean_params import CleaningPlan, compile_cleaning_plan
+from utils.param_sampler import ParamSampler
+from utils.render import (
+    QuestionTemplates,
+    compile_question_expressions,
+    compile_question_templates,
+    forget_symbolic_expressions,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------
+# ÍNDICES (se construyen una vez por carga)
+# ---------------------------------------------------------
+
+def solver_is_numeric(q: QuestionDefinition) -> bool:
+    """Una pregunta sirve para test si tiene UN solo resultado matemático."""
+    return len(q.math.results) == 1
+
+
+@dataclass(frozen=True)
+class BankIndexes:
+    topics: Tuple[str, ...]
+    by_topic: Dict[str, Tuple[str, ...]]
+    by_solver: Dict[str, Tuple[str, ...]]
+    test_eligible: Tuple[str, ...]
+    eligible_by_topic: Dict[str, Tuple[str, ...]]
+    eligible_by_solver: Dict[str, Tuple[str, ...]]
+
+    @classmethod
+    def build(cls, questions: Dict[str, QuestionDefinition]) -> "BankIndexes":
+        by_topic: Dict[str, List[str]] = {}
+        by_solver: Dict[str, List[str]] = {}
+        eligible_by_topic: Dict[str, List[str]] = {}
+        eligible_by_solver: Dict[str, List[str]] = {}
+        eligible: List[str] = []
+
+        for qid, q in questions.items():
+            by_topic.setdefault(q.topic, []).append(qid)
+            by_solver.setdefault(q.solver, []).append(qid)
+            if solver_is_numeric(q):
+                eligible.append(qid)
+                eligible_by_topic.setdefault(q.topic, []).append(qid)
+                eligible_by_solver.setdefault(q.solver, []).append(qid)
+
+        def freeze(d: Dict[str, List[str]]) -> Dict[str, Tuple[str, ...]]:
+            return {k: tuple(v) for k, v in d.items()}
+
+        return cls(
+            topics=tuple(sorted(by_topic)),
+            by_topic=freeze(by_topic),
+            by_solver=freeze(by_solver),
+            test_eligible=tuple(eligible),
+            eligible_by_topic=freeze(eligible_by_topic),
+            eligible_by_solver=freeze(eligible_by_solver),
+        )
+
+    def eligible_ids(self, topics: Optional[List[str]] = None, solvers: Optional[List[str]] = None) -> List[str]:
+        """
+        Preguntas aptas para test filtradas por temas y/o solvers
+        (unión dentro de cada filtro, intersección entre filtros).
+        """
+        if not topics and not solvers:
+            return list(self.test_eligible)
+        if not topics:
+            return [qid for s in dict.fromkeys(solvers) for qid in self.eligible_by_solver.get(s, ())]
+
+        ids = [qid for t in dict.fromkeys(topics) for qid in self.eligible_by_topic.get(t, ())]
+        if solvers:
+            allowed = {qid for s in solvers for qid in self.eligible_by_solver.get(s, ())}
+            ids = [qid for qid in ids if qid in allowed]
+        return ids
+
+
+@dataclass(frozen=True)
+class BankSnapshot:
+    """
+    Estado inmutable del banco de preguntas para una carga.
+    Se reemplaza completo (una asignación) en cada recarga: los requests en
+    curso siguen usando el snapshot que leyeron.
+    """
+    questions: Dict[str, QuestionDefinition]
+    hashes: Dict[str, str]
+    indexes: BankIndexes
+    samplers: Dict[str, ParamSampler] = field(default_factory=dict)
+    cleaners: Dict[str, CleaningPlan] = field(default_factory=dict)
+    templates: Dict[str, QuestionTemplates] = field(default_factory=dict)
+    catalog: Optional[Catalog] = None  # respuestas de /questions y /topics ya serializadas
+    loaded_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class ReloadReport:
+    duration_ms: float
+    added: List[str]
+    changed: List[str]
+    removed: List[str]
+    unchanged: int
+    errors: List[str]
+    kept: List[str] = field(default_factory=list)  # fallaron: sigue su versión anterior
+
+    @property
+    def touched(self) -> List[str]:
+        return self.added + self.changed + self.removed
+
+
+def _content_hash(raw_q: Dict[str, Any]) -> str:
+    canonical = json.dumps(raw_q, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _expressions(questions: Dict[str, QuestionDefinition]) -> Set[str]:
+    """expression_symbolic que usa el banco (para limpiar el cache de programas)."""
+    return {r.expression_symbolic for q in questions.values() for r in q.math.results if r.expression_symbolic}
+
+
+def _raw_expressions(raw_q: Dict[str, Any]) -> Set[str]:
+    """Lo mismo sobre el JSON crudo de una pregunta que no validó."""
+    try:
+        results = raw_q["math"]["results"]
+        return {r["expression_symbolic"] for r in results if isinstance(r.get("expression_symbolic"), str)}
+    except (KeyError, TypeError, AttributeError):
+        return set()
+
+
+def _compile_question(q: QuestionDefinition) -> Tuple[QuestionTemplates, List[str]]:
+    """Precompila expresiones y templates; retorna (templates, errores). Las advertencias solo se loguean."""
+    templates, warnings = compile_question_templates(q)
+    for warn in warnings:
+        logger.warning("placeholder desconocido: %s", warn)
+    return templates, compile_question_expressions(q)
+
+
+def _build_question(
+    raw_q: Dict[str, Any], strict: bool
+) -> Tuple[QuestionDefinition, ParamSampler, CleaningPlan, QuestionTemplates, List[str]]:
+    """
+    Valida y precompila una pregunta. Cualquier falla lanza excepción, salvo
+    los errores de expression_symbolic con strict=True (carga inicial), que
+    solo se reportan como siempre.
+    """
+    q = QuestionDefinition.model_validate(raw_q)
+    templates, compile_errors = _compile_question(q)
+    if compile_errors and not strict:
+        raise ValueError("; ".join(compile_errors))
+    return q, ParamSampler(q), compile_cleaning_plan(q), templates, compile_errors
+
+
+class QuestionBank:
+    """
+    Banco de preguntas recargable en caliente.
+
+    - `path` puede ser un archivo JSON (lista de preguntas) o un directorio
+      con varios *.json.
+    - reload() solo re-valida y recompila las preguntas cuyo hash de
+      contenido cambió, y cambia el snapshot de forma atómica.
+    - Si una pregunta modificada no valida o no compila (expresiones,
+      sampler, plan de limpieza), se conserva su versión anterior y el error
+      se reporta. Lo mismo con un archivo que no es JSON válido: sus
+      preguntas quedan como estaban.
+    """
+
+    def __init__(self, path: Path, on_reload: Optional[Callable[["QuestionBank", ReloadReport], None]] = None):
+        self.path = Path(path)
+        self.on_reload = on_reload
+        self.snapshot = BankSnapshot(questions={}, hashes={}, indexes=BankIndexes.build({}))
+
+        self._lock = threading.Lock()
+        self._mtimes: Tuple[Tuple[str, int], ...] = ()
+        self._raw_by_file: Dict[str, List[Dict[str, Any]]] = {}  # último contenido bueno
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def questions(self) -> Dict[str, QuestionDefinition]:
+        return self.snapshot.questions
+
+    # -----------------------------------------------------
+    # LECTURA
+    # -----------------------------------------------------
+
+    def _files(self) -> List[Path]:
+        if self.path.is_dir():
+            return sorted(self.path.glob("*.json"))
+        return [self.path]
+
+    def _current_mtimes(self) -> Tuple[Tuple[str, int], ...]:
+        mtimes = []
+        for f in self._files():
+            try:
+                mtimes.append((str(f), f.stat().st_mtime_ns))
+            except FileNotFoundError:
+                pass
+        return tuple(mtimes)
+
+    @staticmethod
+    def _read_file(f: Path) -> List[Dict[str, Any]]:
+        with open(f, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        items = data if isinstance(data, list) else [data]
+        if not all(isinstance(item, dict) for item in items):
+            raise ValueError("se esperaba una pregunta (objeto) o una lista de preguntas")
+        return items
+
+    def _read_raw(self, strict: bool) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Lee todos los archivos. Si uno no se puede leer o no es JSON válido
+        se usa su último contenido bueno (sus preguntas siguen como estaban)
+        y el error se retorna para el reporte. strict=True lo propaga.
+        """
+        raw: List[Dict[str, Any]] = []
+        errors: List[str] = []
+        files = self._files()
+        for f in files:
+            try:
+                items = self._read_file(f)
+            except (OSError, ValueError) as e:  # json.JSONDecodeError es ValueError
+                if strict:
+                    raise
+                logger.error("archivo de preguntas %s no carga: %s", f, e)
+                errors.append(f"{f.name}: {e}")
+                items = self._raw_by_file.get(str(f), [])
+            else:
+                self._raw_by_file[str(f)] = items
+            raw.extend(items)
+
+        present = {str(f) for f in files}
+        for name in [name for name in self._raw_by_file if name not in present]:
+            del self._raw_by_file[name]
+        return raw, errors
+
+    # -----------------------------------------------------
+    # CARGA / RECARGA
+    # -----------------------------------------------------
+
+    def reload(self, strict: bool = False) -> ReloadReport:
+        """
+        Relee el banco. Con strict=True (carga inicial) cualquier error de
+        validación se propaga, igual que antes al importar main.py.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            mtimes = self._current_mtimes()
+            raw, file_errors = self._read_raw(strict)
+
+            old = self.snapshot
+            questions: Dict[str, QuestionDefinition] = {}
+            hashes: Dict[str, str] = {}
+            samplers: Dict[str, ParamSampler] = {}
+            cleaners: Dict[str, CleaningPlan] = {}
+            templates: Dict[str, QuestionTemplates] = {}
+            added, changed, kept = [], [], []
+            errors = list(file_errors)
+            rejected: Set[str] = set()  # expresiones de versiones que no cargaron
+            unchanged = 0
+
+            def keep_old(qid: str):
+                questions[qid] = old.questions[qid]
+                hashes[qid] = old.hashes[qid]
+                if qid in old.samplers:
+                    samplers[qid] = old.samplers[qid]
+                cleaners[qid] = old.cleaners[qid]
+                templates[qid] = old.templates[qid]
+
+            for raw_q in raw:
+                qid = raw_q.get("id")
+                h = _content_hash(raw_q)
+
+                if qid in old.hashes and old.hashes[qid] == h:
+                    keep_old(qid)
+                    unchanged += 1
+                    continue
+
+                try:
+                    q, sampler, cleaner, compiled_templates, compile_errors = _build_question(raw_q, strict)
+                except Exception as e:
+                    if strict:
+                        raise
+                    logger.error("pregunta %s no carga: %s", qid, e)
+                    errors.append(f"{qid}: {e}")
+                    rejected.update(_raw_expressions(raw_q))
+                    if qid in old.questions:
+                        keep_old(qid)
+                        kept.append(qid)
+                    continue
+
+                for err in compile_errors:
+                    logger.error("expression_symbolic no compila: %s", err)
+                    errors.append(err)
+
+                samplers[q.id] = sampler
+                cleaners[q.id] = cleaner
+                templates[q.id] = compiled_templates
+                questions[q.id] = q
+                hashes[q.id] = h
+                (changed if q.id in old.questions else added).append(q.id)
+
+            removed = [qid for qid in old.questions if qid not in questions]
+
+            indexes = BankIndexes.build(questions)
+            self.snapshot = BankSnapshot(
+                questions=questions,
+                hashes=hashes,
+                indexes=indexes,
+                samplers=samplers,
+                cleaners=cleaners,
+                templates=templates,
+                catalog=Catalog.build(questions, hashes, indexes.topics, old.catalog),
+            )
+            self._mtimes = mtimes
+
+            # Programas compilados de preguntas modificadas o eliminadas
+            if added or changed or removed or rejected:
+                stale = (_expressions(old.questions) | rejected) - _expressions(questions)
+                forget_symbolic_expressions(stale)
+
+            report = ReloadReport(
+                duration_ms=round((time.perf_counter() - start) * 1000, 3),
+                added=added,
+                changed=changed,
+                removed=removed,
+                unchanged=unchanged,
+                errors=errors,
+                kept=kept,
+            )
+
+        if self.on_reload is not None:
+            self.on_reload(self, report)
+        return report
+
+    def reload_if_changed(self) -> Optional[ReloadReport]:
+        if self._current_mtimes() == self._mtimes:
+            return None
+        return self.reload()
+
+    # -----------------------------------------------------
+    # WATCHER
+    # -----------------------------------------------------
+
+    async def _watch_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                report = await asyncio.to_thread(self.reload_if_changed)
+            except Exception:
+                logger.exception("Error recargando el banco de preguntas")
+                continue
+            if report is not None:
+                logger.info(
+                    "Banco recargado en %.1f ms (+%d ~%d -%d, %d errores)",
+                    report.duration_ms, len(report.added), len(report.changed),
+                    len(report.removed), len(report.errors),
+                )
+
+    def start_watching(self, interval: float):
+        if self._task is None and interval > 0:
+            self._task = asyncio.create_task(self._watch_loop(interval))
+
+    async def stop_watching(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def default_questions_path() -> Path:
+    """QUESTIONS_PATH o questions.json junto a main.py (no relativo al cwd)."""
+    env = os.getenv("QUESTIONS_PATH")
+    if env:
+        return Path(env)
+    return Path(__file__).resolve().parent.parent / "questions.json"
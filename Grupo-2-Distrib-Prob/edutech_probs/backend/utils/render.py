@@ -1,9 +1,18 @@
 # utils/render.py
 
-import ast
 import math
+import os
+import re
+import threading
+from dataclasses import dataclass
 from decimal import Decimal, ROUND_HALF_UP, ROUND_HALF_EVEN
-from typing import Any, Dict
+from time import perf_counter
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from utils.distributions import DISTRIBUTION_FUNCS
+from utils.expr_compiler import ExpressionError, Program, compile_program
+from utils.expr_optimizer import LOG_SPACE_FUNCS
+from utils.metrics import METRICS
 
 
 # ---------------------------------------------------------
@@ -21,23 +30,103 @@ def _to_string(value: Any) -> str:
 
 
 # ---------------------------------------------------------
-# TEMPLATE RENDERING (LATEX + PYTHON FORMAT SEGURO)
+# TEMPLATE RENDERING (LATEX + PLACEHOLDERS PRECOMPILADOS)
 # ---------------------------------------------------------
 
+# {nombre} con nombre tipo identificador; el resto de llaves es LaTeX literal
+_PLACEHOLDER_RE = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+# \operatorname{Var}, \text{...}: argumento de comando LaTeX, no placeholder
+_LATEX_COMMAND_RE = re.compile(r"\\[A-Za-z]+$")
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """
+    Template tokenizado: literals[0] key[0] literals[1] key[1] ... literals[-1].
+    Renderizar es un solo join; un {key} sin valor en params queda literal.
+    """
+    source: str
+    literals: Tuple[str, ...]
+    keys: Tuple[str, ...]
+
+    def render(self, params: Dict[str, Any]) -> str:
+        parts = [self.literals[0]]
+        for key, literal in zip(self.keys, self.literals[1:]):
+            if key in params:
+                parts.append(_to_string(params[key]))
+            else:
+                parts.append("{" + key + "}")
+            parts.append(literal)
+        return "".join(parts)
+
+
+@dataclass(frozen=True)
+class QuestionTemplates:
+    """
+    Enunciado y expression_latex_template de una pregunta ya tokenizados.
+    Vive en el snapshot del banco (BankSnapshot.templates), así que se
+    reemplaza y se libera junto con la pregunta en cada recarga.
+    """
+    statement: CompiledTemplate
+    results: Dict[str, CompiledTemplate]  # por id de resultado
+
+
+def compile_template(template: str) -> CompiledTemplate:
+    """Tokeniza un template en literales y placeholders."""
+    literals: List[str] = []
+    keys: List[str] = []
+    pos = 0
+
+    for m in _PLACEHOLDER_RE.finditer(template):
+        literals.append(template[pos:m.start()])
+        keys.append(m.group(1))
+        pos = m.end()
+
+    literals.append(template[pos:])
+    return CompiledTemplate(template, tuple(literals), tuple(keys))
+
+
+def unknown_placeholders(template: str, names: FrozenSet[str]) -> List[str]:
+    """{nombre} del template que no corresponden a ningún nombre declarado (sin repetir)."""
+    return list(dict.fromkeys(
+        m.group(1) for m in _PLACEHOLDER_RE.finditer(template)
+        if m.group(1) not in names and not _LATEX_COMMAND_RE.search(template, 0, m.start())
+    ))
+
+
 def render_template(template: str, params: Dict[str, Any]) -> str:
     """
-    Safe LaTeX + Python format renderer:
+    Safe LaTeX + placeholders renderer:
+
+    - Las llaves LaTeX se conservan tal cual.
+    - Solo {n}, {p}, etc. (claves presentes en params) se sustituyen.
+    - Tokeniza en cada llamada; el camino de requests usa los templates ya
+      compilados del snapshot (compile_question_templates).
+    """
+    return compile_template(template).render(params)
 
-    1. Escapa TODAS las llaves LaTeX ({ -> {{, } -> }})
-    2. Restaura ONLY placeholders reales {n}, {p}, etc.
+
+def compile_question_templates(q: Any) -> Tuple[QuestionTemplates, List[str]]:
+    """
+    Tokeniza el enunciado y los expression_latex_template de una pregunta.
+    Retorna (templates, advertencias por placeholders que no son ni un param
+    ni un resultado declarado de la pregunta).
     """
-    safe = template.replace("{", "{{").replace("}", "}}")
+    names = frozenset(q.params) | frozenset(r.id for r in q.math.results)
+    warnings = []
 
-    for key in params.keys():
-        safe = safe.replace("{{" + key + "}}", "{" + key + "}")
+    statement = compile_template(q.template)
+    for name in unknown_placeholders(q.template, names):
+        warnings.append(f"{q.id}.template: {{{name}}} no es un param ni un resultado declarado")
 
-    safe_params = {k: _to_string(v) for k, v in params.items()}
-    return safe.format(**safe_params)
+    results: Dict[str, CompiledTemplate] = {}
+    for r in q.math.results:
+        results[r.id] = compile_template(r.expression_latex_template)
+        for name in unknown_placeholders(r.expression_latex_template, names):
+            warnings.append(f"{q.id}.{r.id}: {{{name}}} no es un param ni un resultado declarado")
+
+    return QuestionTemplates(statement, results), warnings
 
 
 # ---------------------------------------------------------
@@ -57,6 +146,10 @@ SAFE_MATH_FUNCS = {
     "pi": math.pi,
     "e": math.e,
     "Phi": lambda z: 0.5 * (1 + math.erf(z / math.sqrt(2))),  # Normal CDF
+    # binom_cdf, binom_sf, poisson_pmf, hypergeom_*, norm_sf, ... (scipy / log-gamma)
+    **DISTRIBUTION_FUNCS,
+    # log_factorial, log_comb, log_pow, pow_sign (los emite el optimizador)
+    **LOG_SPACE_FUNCS,
 }
 
 # Necesarios para tus expression_symbolic: sum(... for x in range(...))
@@ -99,28 +192,127 @@ def _get_param_type(q: Any, k: str) -> Any:
 
 
 # ---------------------------------------------------------
-# SYMBOLIC EXPRESSION EVALUATOR (statements + expressions)
+# COMPILACIÓN DE expression_symbolic (una sola vez por expresión)
 # ---------------------------------------------------------
 
-def eval_symbolic_expression(expr: str, params: Dict[str, Any], q: Any = None) -> float:
+# Presupuesto de costo por evaluación (unidades de utils/expr_compiler, ~0.1 µs)
+DEFAULT_COST_BUDGET = 10_000_000
+
+# Costo fijo por llamada: las de scipy tienen overhead de ~20 µs
+SAFE_FUNCTION_COSTS: Dict[str, float] = {
+    **{name: 1.0 for name, f in SAFE_MATH_FUNCS.items() if callable(f)},
+    **{name: 200.0 for name in DISTRIBUTION_FUNCS},
+    **{name: 1.0 for name in SAFE_BUILTINS},
+}
+
+
+@dataclass(frozen=True)
+class CompiledExpression:
     """
-    Evalúa expression_symbolic con múltiples statements separados por ';'
-    y soporta genexpr/comprehensions (sum/range) sin NameError.
+    expression_symbolic ya compilada a closures (ver utils/expr_compiler.py).
 
-    CLAVE:
-      - Usa UN SOLO dict `env` como globals y locals: eval(st, env, env)
-        (esto evita el bug de scopes en comprehensions con eval()).
+    - `program`: Program listo para program.run(env, budget)
+    - `error`: mensaje si la expresión no compila (se reporta al arrancar)
     """
-    statements = [s.strip() for s in (expr or "").split(";") if s.strip()]
-    if not statements:
-        raise ValueError("expression_symbolic vacío o inválido")
+    source: str
+    program: Optional[Program]
+    error: Optional[str] = None
 
-    # Env único (globals=locals) para que comprehensions vean params
-    env: Dict[str, Any] = {
-        "__builtins__": {},
-        **SAFE_MATH_FUNCS,
-        **SAFE_BUILTINS,
-    }
+
+def _build_compiled_expression(expr: str) -> CompiledExpression:
+    source = (expr or "").strip()
+    if not source:
+        return CompiledExpression(source, None, "expression_symbolic vacío o inválido")
+
+    try:
+        program = compile_program(source, SAFE_FUNCTION_COSTS)
+    except SyntaxError as e:
+        return CompiledExpression(source, None, f"Error de sintaxis: {e.msg} (col {e.offset})")
+    except ExpressionError as e:
+        return CompiledExpression(source, None, str(e))
+
+    return CompiledExpression(source, program)
+
+
+# Cache por texto, acotado: el banco recarga en caliente y las herramientas
+# (param_sweep, tests) compilan expresiones sueltas. Al recargar, el banco
+# descarta las expresiones que ya no usa (forget_symbolic_expressions); si
+# aun así se llena, sale la entrada más vieja.
+COMPILED_CACHE_MAXSIZE = int(os.getenv("EXPR_CACHE_MAXSIZE", "4096"))
+_COMPILED_CACHE: Dict[str, CompiledExpression] = {}
+_COMPILED_CACHE_LOCK = threading.Lock()
+
+
+def compile_symbolic_expression(expr: str) -> CompiledExpression:
+    """
+    Compila (y cachea por texto) una expression_symbolic.
+    Nunca lanza: los errores quedan en CompiledExpression.error.
+    """
+    compiled = _COMPILED_CACHE.get(expr)
+    if compiled is None:
+        compiled = _build_compiled_expression(expr)
+        with _COMPILED_CACHE_LOCK:
+            _COMPILED_CACHE[expr] = compiled
+            while len(_COMPILED_CACHE) > COMPILED_CACHE_MAXSIZE:
+                del _COMPILED_CACHE[next(iter(_COMPILED_CACHE))]
+    return compiled
+
+
+def forget_symbolic_expressions(exprs: Iterable[str]):
+    """Descarta del cache expresiones que ya no usa ninguna pregunta."""
+    with _COMPILED_CACHE_LOCK:
+        for expr in exprs:
+            _COMPILED_CACHE.pop(expr, None)
+
+
+def compiled_cache_size() -> int:
+    return len(_COMPILED_CACHE)
+
+
+def optimization_report(questions: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Pasada del optimizador -> "qid.result_id" donde cambió la expresión."""
+    report: Dict[str, List[str]] = {}
+    for qid, q in questions.items():
+        for r in q.math.results:
+            program = compile_symbolic_expression(r.expression_symbolic).program
+            if program is None:
+                continue
+            applied = program.optimizations + (program.log_space.optimizations if program.log_space else ())
+            for name in dict.fromkeys(applied):
+                report.setdefault(name, []).append(f"{qid}.{r.id}")
+    return report
+
+
+def compile_question_expressions(q: Any) -> List[str]:
+    """
+    Precompila todas las expression_symbolic de una pregunta.
+    Retorna la lista de errores (vacía si todo compila) para reportarlos al arrancar.
+    """
+    errors = []
+    for r in q.math.results:
+        if not r.expression_symbolic:
+            errors.append(f"{q.id}.{r.id}: no tiene expression_symbolic")
+            continue
+        compiled = compile_symbolic_expression(r.expression_symbolic)
+        if compiled.error:
+            errors.append(f"{q.id}.{r.id}: {compiled.error}")
+    return errors
+
+
+# ---------------------------------------------------------
+# SYMBOLIC EXPRESSION EVALUATOR (statements + expressions)
+# ---------------------------------------------------------
+
+# Env base (sin params); se copia en cada evaluación
+_BASE_ENV: Dict[str, Any] = {
+    "__builtins__": {},
+    **SAFE_MATH_FUNCS,
+    **SAFE_BUILTINS,
+}
+
+
+def _typed_env(params: Dict[str, Any], q: Any) -> Dict[str, Any]:
+    env: Dict[str, Any] = dict(_BASE_ENV)
 
     # Cargar params tipados en env
     for k, v in params.items():
@@ -134,39 +326,40 @@ def eval_symbolic_expression(expr: str, params: Dict[str, Any], q: Any = None) -
             else:
                 env[k] = float(v)
 
-    last_value = None
-
-    for i, st in enumerate(statements):
-        is_last = (i == len(statements) - 1)
-
-        try:
-            # Expresión (incluye sum(... for x in range(...)))
-            last_value = eval(st, env, env)
-
-        except SyntaxError:
-            # Statement (asignación, etc.)
-            exec(st, env, env)
-            last_value = None
-
-            # Si el último statement fue asignación, intenta devolver algo útil
-            if is_last:
-                if "result" in env:
-                    last_value = env["result"]
-                else:
-                    # intenta identificar variable asignada (n=..., z=..., etc.)
-                    try:
-                        node = ast.parse(st)
-                        assigns = [
-                            n for n in node.body
-                            if isinstance(n, (ast.Assign, ast.AnnAssign))
-                        ]
-                        if assigns:
-                            a = assigns[-1]
-                            target = a.targets[0] if isinstance(a, ast.Assign) else a.target
-                            if isinstance(target, ast.Name) and target.id in env:
-                                last_value = env[target.id]
-                    except Exception:
-                        pass
+    return env
+
+
+def _program_for(expr: str) -> Program:
+    compiled = compile_symbolic_expression(expr)
+    if compiled.error:
+        raise ValueError(f"expression_symbolic inválido ({compiled.error}): {expr}")
+    return compiled.program
+
+
+def estimate_expression_cost(expr: str, params: Dict[str, Any], q: Any = None) -> float:
+    """Costo estimado (sin correr bucles) de evaluar expr con estos params."""
+    return _program_for(expr).estimate(_typed_env(params, q))
+
+
+def estimate_question_cost(q: Any, params: Dict[str, Any]) -> float:
+    """Suma del costo estimado de todos los resultados de la pregunta."""
+    return sum(estimate_expression_cost(r.expression_symbolic, params, q) for r in q.math.results)
+
+
+def eval_symbolic_expression(
+    expr: str, params: Dict[str, Any], q: Any = None, budget: Optional[float] = DEFAULT_COST_BUDGET
+) -> float:
+    """
+    Evalúa expression_symbolic con múltiples statements separados por ';'
+    y soporta genexpr/comprehensions (sum/range).
+
+    La expresión se compila una sola vez a closures (ver
+    compile_symbolic_expression). Antes de cada sentencia se estima su
+    costo con los params reales; si el acumulado supera `budget` se lanza
+    EvaluationBudgetExceeded sin ejecutarla (budget=None: sin límite).
+    """
+    program = _program_for(expr)
+    last_value = program.run(_typed_env(params, q), budget)
 
     if not isinstance(last_value, (int, float)):
         raise ValueError(f"Expresión no produjo un número: {expr} -> got={type(last_value)}")
@@ -204,17 +397,44 @@ def format_numeric(value: float, spec: Dict[str, Any]) -> str:
 # MASTER RENDER FOR EACH MATH RESULT
 # ---------------------------------------------------------
 
-def render_math_result(math_def: Dict[str, Any], params: Dict[str, Any], q: Any = None) -> Dict[str, Any]:
-    expr_latex = render_template(math_def["expression_latex_template"], params)
+def _question_id(q: Any) -> str:
+    if isinstance(q, dict):
+        return q.get("id") or "unknown"
+    return getattr(q, "id", None) or "unknown"
+
+
+def render_math_result(
+    math_def: Dict[str, Any],
+    params: Dict[str, Any],
+    q: Any = None,
+    budget: Optional[float] = DEFAULT_COST_BUDGET,
+    template: Optional[CompiledTemplate] = None,
+) -> Dict[str, Any]:
+    """
+    Instancia el LaTeX, evalúa y formatea un resultado. `template` es el
+    expression_latex_template ya tokenizado (QuestionTemplates.results);
+    sin él se tokeniza al vuelo.
+    """
+    qid = _question_id(q)
+
+    t0 = perf_counter()
+    if template is None:
+        template = compile_template(math_def["expression_latex_template"])
+    expr_latex = template.render(params)
+    t1 = perf_counter()
+    METRICS.observe_stage("render_template", qid, t1 - t0)
 
     expr_sym = math_def.get("expression_symbolic")
     if not expr_sym:
         raise ValueError(f"math result '{math_def.get('id')}' no tiene expression_symbolic")
 
-    raw_value = eval_symbolic_expression(expr_sym, params, q)
+    raw_value = eval_symbolic_expression(expr_sym, params, q, budget)
+    t2 = perf_counter()
+    METRICS.observe_stage("eval_symbolic_expression", qid, t2 - t1)
 
     numeric_fmt = math_def.get("numeric_format", {"type": "decimal", "decimals": 4})
     formatted = format_numeric(raw_value, numeric_fmt)
+    METRICS.observe_stage("format_numeric", qid, perf_counter() - t2)
 
     return {
         "id": math_def["id"],
@@ -0,0 +1,93 @@
+# utils/result_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ResultCache:
+    """
+    Cache LRU acotado (tamaño + TTL) de resultados ya evaluados y formateados.
+
+    Clave: (id de pregunta, version, params limpios canonicalizados).
+    Al subir `version` en questions.json las claves cambian, así que las
+    entradas viejas dejan de usarse y salen por LRU/TTL.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl if ttl and ttl > 0 else None
+
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(q: Any, params: Dict[str, Any]) -> Optional[Hashable]:
+        """Clave canónica; None si algún param no es hashable (no se cachea)."""
+        try:
+            key = (q.id, q.version, tuple(sorted(params.items())))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key: Optional[Hashable]) -> Optional[Any]:
+        if key is None or self.maxsize <= 0:
+            return None
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Optional[Hashable], value: Any):
+        if key is None or self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_question(self, qid: str):
+        """Descarta todas las entradas de una pregunta (p.ej. tras recargar el banco)."""
+        with self._lock:
+            for key in [k for k in self._data if k[0] == qid]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
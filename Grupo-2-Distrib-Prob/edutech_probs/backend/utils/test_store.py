@@ -0,0 +1,345 @@
+# utils/test_store.py
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto la tarea de escritura borra los tests vencidos
+PURGE_INTERVAL_SECONDS = 300.0
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (
+    test_id       TEXT PRIMARY KEY,
+    created_at    REAL NOT NULL,
+    num_questions INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS test_items (
+    test_id     TEXT NOT NULL,
+    idx         INTEGER NOT NULL,
+    question_id TEXT NOT NULL,
+    version     INTEGER NOT NULL,
+    params      TEXT NOT NULL,
+    options     TEXT NOT NULL,
+    correct     TEXT NOT NULL,
+    PRIMARY KEY (test_id, idx)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS test_items_question ON test_items (question_id);
+CREATE INDEX IF NOT EXISTS tests_created_at ON tests (created_at);
+"""
+
+
+@dataclass(frozen=True)
+class StoredItem:
+    index: int
+    question_id: str
+    version: int
+    params: Dict[str, Any]
+    options: List[str]
+    correct: str  # valor formateado, el mismo que aparece en options
+
+
+@dataclass(frozen=True)
+class StoredTest:
+    test_id: str
+    created_at: float
+    items: Tuple[StoredItem, ...]
+
+
+class TestStore:
+    """
+    Tests emitidos por /generate-test y su clave de respuestas, en SQLite (WAL).
+
+    - put() solo encola (write-behind): la latencia de generación no
+      depende del disco. Una tarea asyncio vacía la cola en lotes, un
+      INSERT por tabla y una transacción por lote (en un hilo).
+    - get() busca primero en la cola pendiente y luego por clave primaria
+      (test_id), así que un test se puede calificar apenas se emitió.
+    - Si la cola pasa de `max_pending`, put() escribe el lote en línea
+      (contrapresión en vez de memoria sin límite).
+    - stop() escribe lo que quede antes de cerrar.
+    - El archivo se abre en start()/open(), no al construir: importar
+      main no crea la base.
+    - Con `retention` (segundos) los tests más viejos se borran cada
+      PURGE_INTERVAL_SECONDS; None los guarda para siempre.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        batch_size: int = 256,
+        flush_interval: float = 0.05,
+        max_pending: int = 10000,
+        retention: Optional[float] = None,
+    ):
+        if batch_size < 1 or max_pending < batch_size:
+            raise ValueError("Se requiere 1 <= batch_size <= max_pending")
+
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retention = retention
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        self._readers = threading.local()
+
+        self._queue: Deque[StoredTest] = deque()
+        self._pending: Dict[str, StoredTest] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self._written = 0
+        self._batches = 0
+        self._errors = 0
+        self._purged = 0
+        self._last_flush_ms: Optional[float] = None
+        self._last_purge = 0.0
+
+    def open(self):
+        with self._write_lock:
+            if self._writer is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                writer = self._connect()
+                writer.executescript(_SCHEMA)
+                self._writer = writer
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # En WAL, NORMAL no pierde consistencia: a lo sumo los últimos commits ante un corte de luz
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    # -----------------------------------------------------
+    # ESCRITURA (request path: solo encola)
+    # -----------------------------------------------------
+
+    def put(self, test_id: str, questions: List[Dict[str, Any]], versions: Dict[str, int]):
+        """Encola un test generado (las preguntas tal como las devuelve build_test_question)."""
+        test = StoredTest(
+            test_id=test_id,
+            created_at=time.time(),
+            items=tuple(
+                StoredItem(
+                    index=i,
+                    question_id=item["id"],
+                    version=versions.get(item["id"], 0),
+                    params=item["params"],
+                    options=[str(o) for o in item["options"]],
+                    correct=str(item["correct"]),
+                )
+                for i, item in enumerate(questions)
+            ),
+        )
+
+        with self._lock:
+            self._pending[test_id] = test
+            self._queue.append(test)
+            overflow = len(self._queue) > self.max_pending
+
+        if overflow:
+            self.flush()
+
+    def flush(self) -> int:
+        """Escribe un lote de la cola. Retorna cuántos tests escribió."""
+        with self._write_lock:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not batch:
+                return 0
+
+            t0 = time.perf_counter()
+            try:
+                self._write(batch)
+            except sqlite3.Error:
+                # Se devuelven a la cola (al frente) para el siguiente intento
+                with self._lock:
+                    self._queue.extendleft(reversed(batch))
+                    self._errors += 1
+                raise
+
+            with self._lock:
+                for test in batch:
+                    self._pending.pop(test.test_id, None)
+                self._written += len(batch)
+                self._batches += 1
+                self._last_flush_ms = (time.perf_counter() - t0) * 1000
+            return len(batch)
+
+    def flush_all(self):
+        while self.flush():
+            pass
+
+    def _write(self, batch: List[StoredTest]):
+        conn = self._require_writer()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO tests (test_id, created_at, num_questions) VALUES (?, ?, ?)",
+                [(t.test_id, t.created_at, len(t.items)) for t in batch],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO test_items"
+                " (test_id, idx, question_id, version, params, options, correct)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        t.test_id, item.index, item.question_id, item.version,
+                        json.dumps(item.params, ensure_ascii=False),
+                        json.dumps(item.options, ensure_ascii=False),
+                        item.correct,
+                    )
+                    for t in batch
+                    for item in t.items
+                ],
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _require_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            raise RuntimeError("TestStore no está abierto (falta start() u open())")
+        return self._writer
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """Borra los tests escritos hace más de `retention`. Retorna cuántos."""
+        if self.retention is None:
+            return 0
+        cutoff = (now if now is not None else time.time()) - self.retention
+
+        with self._write_lock:
+            conn = self._require_writer()
+            conn.execute("BEGIN")
+            try:
+                conn.execute(
+                    "DELETE FROM test_items WHERE test_id IN"
+                    " (SELECT test_id FROM tests WHERE created_at < ?)",
+                    (cutoff,),
+                )
+                deleted = conn.execute("DELETE FROM tests WHERE created_at < ?", (cutoff,)).rowcount
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+        with self._lock:
+            self._purged += deleted
+        return deleted
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            while self._queue:
+                try:
+                    await asyncio.to_thread(self.flush)
+                except sqlite3.Error:
+                    logger.exception("Error escribiendo tests en %s", self.path)
+                    break
+
+            if self.retention is not None and time.monotonic() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+                self._last_purge = time.monotonic()
+                try:
+                    deleted = await asyncio.to_thread(self.purge)
+                except sqlite3.Error:
+                    logger.exception("Error borrando tests vencidos en %s", self.path)
+                else:
+                    if deleted:
+                        logger.info("Tests vencidos borrados: %d", deleted)
+
+    def start(self):
+        self.open()
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush_all)
+
+    def close(self):
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    # -----------------------------------------------------
+    # LECTURA
+    # -----------------------------------------------------
+
+    def _reader(self) -> sqlite3.Connection:
+        # Una conexión por hilo: en WAL los lectores no bloquean al escritor
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = self._connect()
+        return conn
+
+    def get(self, test_id: str) -> Optional[StoredTest]:
+        with self._lock:
+            test = self._pending.get(test_id)
+        if test is not None:
+            return test
+
+        self._require_writer()
+        conn = self._reader()
+        row = conn.execute("SELECT created_at FROM tests WHERE test_id = ?", (test_id,)).fetchone()
+        if row is None:
+            return None
+
+        items = conn.execute(
+            "SELECT idx, question_id, version, params, options, correct"
+            " FROM test_items WHERE test_id = ? ORDER BY idx",
+            (test_id,),
+        ).fetchall()
+        return StoredTest(
+            test_id=test_id,
+            created_at=row[0],
+            items=tuple(
+                StoredItem(idx, qid, version, json.loads(params), json.loads(options), correct)
+                for idx, qid, version, params, options, correct in items
+            ),
+        )
+
+    # -----------------------------------------------------
+    # STATS
+    # -----------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._queue),
+                "written": self._written,
+                "batches": self._batches,
+                "errors": self._errors,
+                "purged": self._purged,
+                "last_flush_ms": round(self._last_flush_ms, 3) if self._last_flush_ms is not None else None,
+            }
+
+
+def default_test_store_path() -> Path:
+    """TEST_STORE_PATH o .cache/tests.sqlite3 junto a main.py."""
+    env = os.getenv("TEST_STORE_PATH")
+    if env:
+        return Path(env)
+    return Path(__file__).resolve().parent.parent / ".cache" / "tests.sqlite3"
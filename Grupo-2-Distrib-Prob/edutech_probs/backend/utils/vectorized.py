@@ -0,0 +1,192 @@
+# utils/vectorized.py
+
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy import special
+
+from utils.distributions import DISTRIBUTION_FUNCS
+from utils.expr_compiler import EvaluationBudgetExceeded
+from utils.render import (
+    DEFAULT_COST_BUDGET,
+    compile_symbolic_expression,
+    estimate_expression_cost,
+    eval_symbolic_expression,
+    format_numeric,
+)
+
+
+# ---------------------------------------------------------
+# SAFE MATH ENVIRONMENT (versión NumPy, opera sobre columnas)
+# ---------------------------------------------------------
+
+def _factorial(n):
+    return np.exp(special.gammaln(np.asarray(n, dtype=float) + 1))
+
+
+def _binom(n, k):
+    # math.comb devuelve 0 si k > n; special.comb(exact=False) hace lo mismo
+    return special.comb(n, k, exact=False)
+
+
+# Versiones NumPy de expr_optimizer.LOG_SPACE_FUNCS
+def _log_factorial(n):
+    return special.gammaln(np.asarray(n, dtype=float) + 1)
+
+
+def _log_comb(n, k):
+    n, k = np.asarray(n, dtype=float), np.asarray(k, dtype=float)
+    with np.errstate(invalid="ignore"):
+        inner = special.gammaln(n + 1) - special.gammaln(k + 1) - special.gammaln(n - k + 1)
+    return np.where((k < 0) | (k > n), -np.inf, inner)
+
+
+def _log_pow(a, b):
+    # xlogy(0, 0) = 0 (a**0 == 1); con b < 0 y a == 0 da inf, como 0.0 ** -1 en NumPy
+    return special.xlogy(b, np.abs(a))
+
+
+def _pow_sign(*pairs):
+    sign = np.ones(())
+    for a, b in zip(pairs[::2], pairs[1::2]):
+        a, b = np.asarray(a), np.asarray(b, dtype=float)
+        odd = np.where(b % 1, np.nan, np.where(b % 2, -1.0, 1.0))
+        sign = sign * np.where(a < 0, odd, 1.0)
+    return sign
+
+
+VECTOR_MATH_FUNCS = {
+    "exp": np.exp,
+    "log": np.log,
+    "sqrt": np.sqrt,
+    "factorial": _factorial,
+    "binom": _binom,
+    "comb": _binom,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "pi": math.pi,
+    "e": math.e,
+    "Phi": special.ndtr,  # Normal CDF
+    # Ya aceptan arreglos
+    **DISTRIBUTION_FUNCS,
+    "log_factorial": _log_factorial,
+    "log_comb": _log_comb,
+    "log_pow": _log_pow,
+    "pow_sign": _pow_sign,
+}
+
+# min/max/abs elemento a elemento. `sum`/`range` se dejan como builtins:
+# con columnas fallan (TypeError) y la expresión cae al modo escalar.
+VECTOR_BUILTINS = {
+    "sum": sum,
+    "range": range,
+    "min": np.minimum,
+    "max": np.maximum,
+    "abs": np.abs,
+}
+
+_VECTOR_BASE_ENV: Dict[str, Any] = {
+    "__builtins__": {},
+    **VECTOR_MATH_FUNCS,
+    **VECTOR_BUILTINS,
+}
+
+
+# ---------------------------------------------------------
+# FILAS <-> COLUMNAS
+# ---------------------------------------------------------
+
+def rows_to_columns(rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Convierte una lista de dicts de parámetros (ya limpios) en columnas."""
+    keys = list(rows[0].keys()) if rows else []
+    return {k: np.asarray([row[k] for row in rows]) for k in keys}
+
+
+def columns_to_rows(columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Inverso de rows_to_columns, con tipos nativos de Python."""
+    lists = {k: v.tolist() for k, v in columns.items()}
+    size = len(next(iter(lists.values()))) if lists else 0
+    return [{k: col[i] for k, col in lists.items()} for i in range(size)]
+
+
+# ---------------------------------------------------------
+# EVALUACIÓN VECTORIZADA
+# ---------------------------------------------------------
+
+def _typed_columns(columns: Dict[str, np.ndarray], q: Any) -> Dict[str, np.ndarray]:
+    typed = {}
+    for k, col in columns.items():
+        cfg = q.params.get(k) if q is not None else None
+        if cfg is not None and cfg.type == "int":
+            typed[k] = np.rint(np.asarray(col, dtype=float)).astype(np.int64)
+        elif np.issubdtype(np.asarray(col).dtype, np.integer):
+            typed[k] = np.asarray(col)
+        else:
+            typed[k] = np.asarray(col, dtype=float)
+    return typed
+
+
+def _eval_rows(expr: str, columns: Dict[str, np.ndarray], size: int, q: Any, budget: Optional[float]) -> np.ndarray:
+    """
+    Fallback escalar: evalúa fila a fila; los errores quedan como NaN.
+    El presupuesto es para el lote completo y se revisa antes de empezar.
+    """
+    rows = columns_to_rows(columns)
+    if budget is not None:
+        cost = sum(estimate_expression_cost(expr, row, q) for row in rows)
+        if cost > budget:
+            raise EvaluationBudgetExceeded(cost, budget)
+
+    out = np.full(size, np.nan)
+    for i, row in enumerate(rows):
+        try:
+            out[i] = eval_symbolic_expression(expr, row, q, budget=None)
+        except (ArithmeticError, ValueError, TypeError):
+            pass
+    return out
+
+
+def eval_symbolic_batch(
+    expr: str, columns: Dict[str, np.ndarray], q: Any = None, budget: Optional[float] = DEFAULT_COST_BUDGET
+) -> np.ndarray:
+    """
+    Evalúa expression_symbolic sobre columnas de parámetros en una sola pasada
+    NumPy (mismo programa compilado que el modo escalar, con VECTOR_MATH_FUNCS).
+
+    Si la expresión no es vectorizable (p.ej. sum(... for x in range(n)))
+    se evalúa fila a fila. Los valores inválidos (inf, división por cero)
+    se devuelven como NaN. Lanza EvaluationBudgetExceeded si el costo
+    estimado del fallback fila a fila supera `budget`.
+    """
+    compiled = compile_symbolic_expression(expr)
+    if compiled.error:
+        raise ValueError(f"expression_symbolic inválido ({compiled.error}): {expr}")
+
+    size = len(next(iter(columns.values()))) if columns else 0
+    typed = _typed_columns(columns, q)
+
+    # Columnas enteras en float64: en int64 `**` y los productos desbordan
+    # sin aviso. Los enteros exactos solo importan en el fallback fila a fila
+    env: Dict[str, Any] = dict(_VECTOR_BASE_ENV)
+    env.update({k: col.astype(float) for k, col in typed.items()})
+
+    # Con arreglos no hay enteros exactos que conservar: directo a la
+    # variante en espacio log (factorial/comb vía gammaln), si la hay
+    program = compiled.program.log_space or compiled.program
+
+    try:
+        with np.errstate(all="ignore"):
+            result = program.run(env)
+        values = np.broadcast_to(np.asarray(result, dtype=float), (size,)).copy()
+    except (ArithmeticError, ValueError, TypeError):
+        values = _eval_rows(expr, typed, size, q, budget)
+
+    values[~np.isfinite(values)] = np.nan
+    return values
+
+
+def format_numeric_batch(values: np.ndarray, spec: Dict[str, Any]) -> List[Optional[str]]:
+    """format_numeric sobre un arreglo; NaN -> None."""
+    return [None if math.isnan(v) else format_numeric(v, spec) for v in values.tolist()]